@@ -0,0 +1,428 @@
+"""
+Módulo de almacenamiento de períodos procesados
+Guarda las marcaciones y los resultados de cada período en una base SQLite
+local para consultarlos y volver a cargarlos sin reprocesar los archivos
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# Base de datos local (se puede cambiar con la variable de entorno SUELDOS_DB)
+RUTA_BASE = Path(os.environ.get("SUELDOS_DB", Path(__file__).with_name("sueldos.db")))
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS periodos (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL UNIQUE,
+    fecha_inicio TEXT,
+    fecha_fin TEXT,
+    valor_por_hora REAL,
+    feriados TEXT NOT NULL DEFAULT '[]',
+    creado TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS marcaciones (
+    periodo_id INTEGER NOT NULL REFERENCES periodos(id) ON DELETE CASCADE,
+    sucursal TEXT,
+    empleado TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    entrada TEXT,
+    salida TEXT,
+    descuento_inventario REAL,
+    descuento_caja REAL,
+    retiro REAL
+);
+
+CREATE TABLE IF NOT EXISTS resultados (
+    periodo_id INTEGER NOT NULL REFERENCES periodos(id) ON DELETE CASCADE,
+    sucursal TEXT,
+    empleado TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    feriado INTEGER NOT NULL,
+    entrada_minutos INTEGER,
+    salida_minutos INTEGER,
+    minutos_trabajados INTEGER,
+    minutos_normales INTEGER,
+    minutos_especiales INTEGER,
+    descuento_inventario_centavos INTEGER,
+    descuento_caja_centavos INTEGER,
+    retiro_centavos INTEGER,
+    sueldo_final_centavos INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS archivos (
+    huella TEXT PRIMARY KEY,
+    nombre TEXT,
+    registros INTEGER NOT NULL,
+    lineas_omitidas INTEGER NOT NULL DEFAULT 0,
+    creado TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS marcaciones_archivo (
+    huella TEXT NOT NULL REFERENCES archivos(huella) ON DELETE CASCADE,
+    sucursal TEXT,
+    empleado TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    entrada TEXT,
+    salida TEXT,
+    descuento_inventario REAL,
+    descuento_caja REAL,
+    retiro REAL,
+    registros_originales INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS marcaciones_brutas_archivo (
+    huella TEXT NOT NULL REFERENCES archivos(huella) ON DELETE CASCADE,
+    empleado TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    hora TEXT NOT NULL,
+    confianza REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_marcaciones_empleado_fecha ON marcaciones (empleado, fecha);
+CREATE INDEX IF NOT EXISTS idx_marcaciones_periodo ON marcaciones (periodo_id);
+CREATE INDEX IF NOT EXISTS idx_resultados_empleado_fecha ON resultados (empleado, fecha);
+CREATE INDEX IF NOT EXISTS idx_resultados_periodo ON resultados (periodo_id);
+CREATE INDEX IF NOT EXISTS idx_marcaciones_archivo_huella ON marcaciones_archivo (huella);
+CREATE INDEX IF NOT EXISTS idx_marcaciones_brutas_archivo_huella ON marcaciones_brutas_archivo (huella);
+"""
+
+COLUMNAS_MARCACIONES = {
+    "Sucursal": "sucursal",
+    "Empleado": "empleado",
+    "Fecha": "fecha",
+    "Entrada": "entrada",
+    "Salida": "salida",
+    "Descuento Inventario": "descuento_inventario",
+    "Descuento Caja": "descuento_caja",
+    "Retiro": "retiro",
+}
+
+# Marcaciones de un archivo procesado: las de un período más los registros agrupados por el parser
+COLUMNAS_MARCACIONES_ARCHIVO = {**COLUMNAS_MARCACIONES, "Registros_Originales": "registros_originales"}
+
+COLUMNAS_RESULTADOS = [
+    "sucursal", "empleado", "fecha", "feriado",
+    "entrada_minutos", "salida_minutos",
+    "minutos_trabajados", "minutos_normales", "minutos_especiales",
+    "descuento_inventario_centavos", "descuento_caja_centavos", "retiro_centavos", "sueldo_final_centavos",
+]
+
+@contextmanager
+def conectar(ruta: Union[str, Path, None] = None):
+    """
+    Abre la base (creando el esquema si hace falta), confirma los cambios al
+    salir del bloque sin errores y siempre cierra la conexión
+
+    Uso:
+        with conectar() as conexion:
+            conexion.execute(...)
+    """
+    conexion = sqlite3.connect(str(ruta or RUTA_BASE))
+    try:
+        conexion.execute("PRAGMA foreign_keys = ON")
+        conexion.execute("PRAGMA journal_mode = WAL")
+        conexion.executescript(ESQUEMA)
+        yield conexion
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        conexion.close()
+
+def guardar_periodo(nombre: str, df_marcaciones, df_result, valor_por_hora: Optional[float] = None,
+                    fechas_feriados: Iterable = (), ruta=None, tipadas=None) -> int:
+    """
+    Guarda (o reemplaza, si ya existe con ese nombre) un período con sus
+    marcaciones y resultados, en una sola transacción
+
+    Args:
+        nombre: Nombre del período (por ejemplo "2024-10 Q1")
+        df_marcaciones (DataFrame): Marcaciones usadas en el cálculo (con correcciones)
+        df_result (DataFrame): Resultados del cálculo
+        valor_por_hora: Valor por hora usado
+        fechas_feriados: Fechas de feriados usadas
+        ruta: Ruta de la base (por defecto RUTA_BASE)
+        tipadas: Valores numéricos de los resultados según calcular_lote (opcional,
+            ver data_processor.resultados_tipados)
+
+    Returns:
+        int: Id del período
+    """
+    import pandas as pd
+    from data_processor import resultados_tipados
+
+    marcaciones = _marcaciones_a_filas(df_marcaciones)
+    tipado = resultados_tipados(df_result, tipadas)
+    resultados = _resultados_a_filas(tipado)
+
+    fechas = [fila[2] for fila in marcaciones if fila[2]]
+    feriados = sorted(pd.Timestamp(fecha).strftime("%Y-%m-%d") for fecha in fechas_feriados)
+
+    with conectar(ruta) as conexion:
+        conexion.execute("DELETE FROM periodos WHERE nombre = ?", (nombre,))
+        cursor = conexion.execute(
+            "INSERT INTO periodos (nombre, fecha_inicio, fecha_fin, valor_por_hora, feriados, creado) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (nombre, min(fechas, default=None), max(fechas, default=None), valor_por_hora,
+             json.dumps(feriados), datetime.now().isoformat(timespec="seconds")),
+        )
+        periodo_id = cursor.lastrowid
+        conexion.executemany(
+            "INSERT INTO marcaciones (periodo_id, sucursal, empleado, fecha, entrada, salida, "
+            "descuento_inventario, descuento_caja, retiro) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((periodo_id, *fila) for fila in marcaciones),
+        )
+        conexion.executemany(
+            f"INSERT INTO resultados (periodo_id, {', '.join(COLUMNAS_RESULTADOS)}) "
+            f"VALUES (?, {', '.join('?' for _ in COLUMNAS_RESULTADOS)})",
+            ((periodo_id, *fila) for fila in resultados),
+        )
+
+    return periodo_id
+
+def listar_periodos(ruta=None):
+    """
+    Lista los períodos guardados, del más reciente al más antiguo
+
+    Returns:
+        DataFrame: id, nombre, fechas, valor por hora, feriados y cantidad de empleados y registros
+    """
+    import pandas as pd
+
+    with conectar(ruta) as conexion:
+        return pd.read_sql_query(
+            """
+            SELECT p.id, p.nombre, p.fecha_inicio, p.fecha_fin, p.valor_por_hora, p.feriados, p.creado,
+                   COUNT(DISTINCT r.empleado) AS empleados, COUNT(r.periodo_id) AS registros
+            FROM periodos p LEFT JOIN resultados r ON r.periodo_id = p.id
+            GROUP BY p.id
+            ORDER BY p.fecha_inicio DESC, p.id DESC
+            """,
+            conexion,
+        )
+
+def totales_por_empleado(periodos: Optional[List[int]] = None, empleado: Optional[str] = None, ruta=None):
+    """
+    Totales por empleado y período calculados en la base (usa los índices por
+    período y por empleado)
+
+    Args:
+        periodos: Ids de período a incluir (por defecto, todos)
+        empleado: Filtrar un empleado (opcional)
+        ruta: Ruta de la base
+
+    Returns:
+        DataFrame: periodo, sucursal, empleado, registros, días feriados distintos,
+        minutos por categoría y montos en pesos (el mismo nombre en dos sucursales
+        son dos empleados)
+    """
+    import pandas as pd
+
+    condiciones, parametros = [], []
+    if periodos:
+        condiciones.append(f"r.periodo_id IN ({', '.join('?' for _ in periodos)})")
+        parametros.extend(int(periodo) for periodo in periodos)
+    if empleado:
+        condiciones.append("r.empleado = ?")
+        parametros.append(empleado)
+    donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    with conectar(ruta) as conexion:
+        return pd.read_sql_query(
+            f"""
+            SELECT p.nombre AS periodo, r.sucursal, r.empleado,
+                   COUNT(*) AS registros,
+                   COUNT(DISTINCT CASE WHEN r.feriado THEN r.fecha END) AS dias_feriados,
+                   SUM(r.minutos_trabajados) AS minutos_trabajados,
+                   SUM(r.minutos_normales) AS minutos_normales,
+                   SUM(r.minutos_especiales) AS minutos_especiales,
+                   SUM(COALESCE(r.descuento_inventario_centavos, 0) + COALESCE(r.descuento_caja_centavos, 0)
+                       + COALESCE(r.retiro_centavos, 0)) / 100.0 AS descuentos,
+                   SUM(r.sueldo_final_centavos) / 100.0 AS sueldo_final
+            FROM resultados r JOIN periodos p ON p.id = r.periodo_id
+            {donde}
+            GROUP BY r.periodo_id, r.sucursal, r.empleado
+            ORDER BY p.fecha_inicio, r.sucursal, r.empleado
+            """,
+            conexion,
+            params=parametros,
+        )
+
+def cargar_periodo(periodo: Union[int, str], ruta=None) -> Tuple:
+    """
+    Vuelve a cargar un período guardado sin reprocesar sus archivos
+
+    Args:
+        periodo: Id o nombre del período
+        ruta: Ruta de la base
+
+    Returns:
+        tuple: (df_marcaciones, df_result en el formato de la vista de resultados,
+               datos del período con sus totales de horas y sueldos)
+    """
+    import pandas as pd
+    from data_processor import resultados_desde_tipados
+
+    campo = "id" if isinstance(periodo, int) else "nombre"
+    with conectar(ruta) as conexion:
+        conexion.row_factory = sqlite3.Row
+        fila = conexion.execute(f"SELECT * FROM periodos WHERE {campo} = ?", (periodo,)).fetchone()
+        if fila is None:
+            raise ValueError(f"No existe el período {periodo!r}")
+        datos_periodo: Dict = dict(fila)
+        datos_periodo["feriados"] = [date.fromisoformat(fecha) for fecha in json.loads(datos_periodo["feriados"])]
+
+        marcaciones = pd.read_sql_query(
+            f"SELECT {', '.join(COLUMNAS_MARCACIONES.values())} FROM marcaciones WHERE periodo_id = ? ORDER BY rowid",
+            conexion, params=(datos_periodo["id"],),
+        )
+        tipado = pd.read_sql_query(
+            f"SELECT {', '.join(COLUMNAS_RESULTADOS)} FROM resultados WHERE periodo_id = ? ORDER BY rowid",
+            conexion, params=(datos_periodo["id"],),
+        )
+
+    marcaciones = marcaciones.rename(columns={columna: nombre for nombre, columna in COLUMNAS_MARCACIONES.items()})
+    marcaciones["Fecha"] = pd.to_datetime(marcaciones["Fecha"])
+    tipado["fecha"] = pd.to_datetime(tipado["fecha"])
+    tipado["feriado"] = tipado["feriado"].astype(bool)
+
+    datos_periodo["total_horas"] = tipado["minutos_trabajados"].sum() / 60
+    datos_periodo["total_sueldos"] = tipado["sueldo_final_centavos"].sum() / 100
+
+    # La sucursal solo existe en libros con una hoja por sucursal
+    if marcaciones["Sucursal"].isna().all():
+        marcaciones = marcaciones.drop(columns="Sucursal")
+    if tipado["sucursal"].isna().all():
+        tipado = tipado.drop(columns="sucursal")
+
+    return marcaciones, resultados_desde_tipados(tipado), datos_periodo
+
+def eliminar_periodo(periodo_id: int, ruta=None):
+    """Elimina un período con sus marcaciones y resultados"""
+    with conectar(ruta) as conexion:
+        conexion.execute("DELETE FROM periodos WHERE id = ?", (int(periodo_id),))
+
+def huella_contenido(contenido: bytes) -> str:
+    """Huella SHA-256 del contenido de un archivo: identifica el mismo archivo aunque cambie su nombre"""
+    return hashlib.sha256(contenido).hexdigest()
+
+def guardar_archivo(huella: str, nombre: str, df_marcaciones, ruta=None):
+    """
+    Guarda las marcaciones extraídas de un archivo para no volver a procesarlo,
+    agrupadas y sin agrupar (df_marcaciones.attrs['marcaciones'])
+
+    Args:
+        huella: Clave del archivo (huella del contenido, ver huella_contenido)
+        nombre: Nombre del archivo
+        df_marcaciones (DataFrame): Marcaciones extraídas del archivo
+        ruta: Ruta de la base
+    """
+    filas = _marcaciones_a_filas(df_marcaciones, COLUMNAS_MARCACIONES_ARCHIVO)
+
+    with conectar(ruta) as conexion:
+        conexion.execute("DELETE FROM archivos WHERE huella = ?", (huella,))
+        conexion.execute(
+            "INSERT INTO archivos (huella, nombre, registros, lineas_omitidas, creado) VALUES (?, ?, ?, ?, ?)",
+            (huella, nombre, len(filas), int(df_marcaciones.attrs.get("lineas_omitidas", 0)),
+             datetime.now().isoformat(timespec="seconds")),
+        )
+        conexion.executemany(
+            f"INSERT INTO marcaciones_archivo (huella, {', '.join(COLUMNAS_MARCACIONES_ARCHIVO.values())}) "
+            f"VALUES (?, {', '.join('?' for _ in COLUMNAS_MARCACIONES_ARCHIVO)})",
+            ((huella, *fila) for fila in filas),
+        )
+        conexion.executemany(
+            "INSERT INTO marcaciones_brutas_archivo (huella, empleado, fecha, hora, confianza) VALUES (?, ?, ?, ?, ?)",
+            ((huella, *marcacion) for marcacion in df_marcaciones.attrs.get("marcaciones", [])),
+        )
+
+def cargar_archivos(huellas: Iterable[str], ruta=None) -> Dict:
+    """
+    Carga las marcaciones de los archivos ya procesados entre las huellas dadas
+
+    Args:
+        huellas: Huellas de contenido de los archivos subidos
+        ruta: Ruta de la base
+
+    Returns:
+        Dict: Huella -> DataFrame de marcaciones (en el formato y el orden del
+        procesamiento de PDF, con las marcaciones sin agrupar en
+        attrs['marcaciones']), solo para los archivos encontrados
+    """
+    import pandas as pd
+
+    huellas = list(dict.fromkeys(huellas))
+    if not huellas:
+        return {}
+
+    marcadores = ", ".join("?" for _ in huellas)
+    with conectar(ruta) as conexion:
+        archivos = dict(conexion.execute(
+            f"SELECT huella, lineas_omitidas FROM archivos WHERE huella IN ({marcadores})", huellas
+        ).fetchall())
+        marcaciones = pd.read_sql_query(
+            f"SELECT huella, {', '.join(COLUMNAS_MARCACIONES_ARCHIVO.values())} FROM marcaciones_archivo "
+            f"WHERE huella IN ({marcadores}) ORDER BY fecha, empleado, rowid",
+            conexion, params=huellas,
+        )
+        brutas = {}
+        for huella, *marcacion in conexion.execute(
+            f"SELECT huella, empleado, fecha, hora, confianza FROM marcaciones_brutas_archivo "
+            f"WHERE huella IN ({marcadores}) ORDER BY rowid", huellas
+        ):
+            brutas.setdefault(huella, []).append(tuple(marcacion))
+
+    marcaciones = marcaciones.rename(columns={columna: nombre for nombre, columna in COLUMNAS_MARCACIONES_ARCHIVO.items()})
+    marcaciones["Fecha"] = pd.to_datetime(marcaciones["Fecha"])
+
+    cargados = {}
+    for huella, lineas_omitidas in archivos.items():
+        df = marcaciones[marcaciones["huella"] == huella].drop(columns="huella").reset_index(drop=True)
+        if df["Sucursal"].isna().all():
+            df = df.drop(columns="Sucursal")
+        df.attrs["lineas_omitidas"] = lineas_omitidas
+        df.attrs["marcaciones"] = brutas.get(huella, [])
+        cargados[huella] = df
+    return cargados
+
+def _marcaciones_a_filas(df, columnas_base: Dict = COLUMNAS_MARCACIONES) -> List[Tuple]:
+    """Filas de marcaciones en el orden de las columnas dadas, con fechas ISO y None en lugar de NaN"""
+    import pandas as pd
+
+    columnas = []
+    for nombre in columnas_base:
+        serie = df[nombre] if nombre in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if nombre == "Fecha":
+            serie = pd.to_datetime(serie, errors="coerce").dt.strftime("%Y-%m-%d")
+        elif nombre in ("Sucursal", "Empleado", "Entrada", "Salida"):
+            serie = serie.where(serie.isna(), serie.astype(str))
+        columnas.append(_valores_sql(serie))
+    return list(zip(*columnas))
+
+def _resultados_a_filas(tipado) -> List[Tuple]:
+    """Filas de resultados tipados en el orden de COLUMNAS_RESULTADOS"""
+    import pandas as pd
+
+    if tipado.empty:
+        return []
+
+    columnas = []
+    for nombre in COLUMNAS_RESULTADOS:
+        serie = tipado[nombre] if nombre in tipado.columns else pd.Series(None, index=tipado.index, dtype=object)
+        if nombre == "fecha":
+            serie = serie.dt.strftime("%Y-%m-%d")
+        elif nombre == "feriado":
+            serie = serie.astype(int)
+        columnas.append(_valores_sql(serie))
+    return list(zip(*columnas))
+
+def _valores_sql(serie) -> List:
+    """Valores de una columna como tipos nativos de Python (sqlite3 no acepta enteros de numpy), None si faltan"""
+    return serie.astype(object).where(serie.notna(), None).tolist()
@@ -0,0 +1,124 @@
+"""
+Módulo de arranque de la aplicación
+Precalienta en segundo plano los módulos pesados y mide su tiempo de importación
+
+Uso como script (reporte de tiempos de importación en procesos limpios):
+    python arranque.py
+    python arranque.py --json
+"""
+import importlib
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Módulos que la primera pantalla no necesita, en orden de importación
+MODULOS_PESADOS = [
+    "pandas",
+    "openpyxl",
+    "pdfplumber",
+    "data_processor",
+    "pdf_processor",
+    "smart_parser",
+]
+
+_lock = threading.Lock()
+_hilo_precalentamiento: Optional[threading.Thread] = None
+_tiempos_precalentamiento: Dict[str, float] = {}
+
+def precalentar_modulos(modulos: List[str] = None) -> threading.Thread:
+    """
+    Importa los módulos pesados en un hilo en segundo plano, una sola vez por
+    proceso, para que la primera subida de archivo no pague ese costo.
+    Se llama después de dibujar la primera pantalla.
+
+    Args:
+        modulos: Módulos a importar (por defecto MODULOS_PESADOS)
+
+    Returns:
+        threading.Thread: Hilo de precalentamiento (el mismo en llamadas posteriores)
+    """
+    global _hilo_precalentamiento
+
+    with _lock:
+        if _hilo_precalentamiento is None:
+            _hilo_precalentamiento = threading.Thread(
+                target=_importar_modulos,
+                args=(modulos or MODULOS_PESADOS,),
+                name="precalentamiento",
+                daemon=True,
+            )
+            _hilo_precalentamiento.start()
+        return _hilo_precalentamiento
+
+def tiempos_precalentamiento() -> Dict[str, float]:
+    """Segundos que tomó importar cada módulo durante el precalentamiento"""
+    with _lock:
+        return dict(_tiempos_precalentamiento)
+
+def _importar_modulos(modulos: List[str]):
+    for modulo in modulos:
+        inicio = time.perf_counter()
+        try:
+            importlib.import_module(modulo)
+        except ImportError:
+            continue
+        with _lock:
+            _tiempos_precalentamiento[modulo] = time.perf_counter() - inicio
+
+def reporte_importaciones(modulos: List[str] = None) -> List[Dict]:
+    """
+    Mide el tiempo de importación de cada módulo en un proceso limpio con
+    `python -X importtime`, para seguir regresiones en el arranque
+
+    Args:
+        modulos: Módulos a medir (por defecto streamlit, la interfaz y MODULOS_PESADOS)
+
+    Returns:
+        List[Dict]: Por módulo, segundos acumulados y los submódulos más costosos
+    """
+    modulos = modulos or ["streamlit", "ui_components", "loading_components"] + MODULOS_PESADOS
+    reporte = []
+
+    for modulo in modulos:
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            capture_output=True,
+            text=True,
+        )
+        # Formato: "import time: self [us] | cumulative | imported package",
+        # con dos espacios más de sangría por cada nivel de anidamiento
+        tiempos = []
+        for linea in proceso.stderr.splitlines():
+            coincidencia = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", linea)
+            if coincidencia:
+                tiempos.append((int(coincidencia.group(2)), len(coincidencia.group(3)), coincidencia.group(4)))
+
+        propios = [t for t in tiempos if t[2] == modulo and t[1] == 1]
+        acumulado = propios[-1][0] if propios else None
+        mas_costosos = sorted((t for t in tiempos if t[1] == 3), reverse=True)[:5]
+
+        reporte.append({
+            "modulo": modulo,
+            "segundos": round(acumulado / 1e6, 3) if acumulado is not None else None,
+            "error": proceso.stderr.strip().splitlines()[-1] if proceso.returncode else None,
+            "submodulos": [{"modulo": nombre, "segundos": round(us / 1e6, 3)} for us, _, nombre in mas_costosos],
+        })
+
+    return reporte
+
+if __name__ == "__main__":
+    reporte = reporte_importaciones()
+    if "--json" in sys.argv:
+        print(json.dumps(reporte, ensure_ascii=False, indent=2))
+    else:
+        for fila in reporte:
+            if fila["error"]:
+                print(f"{fila['modulo']:<20} ERROR: {fila['error']}")
+                continue
+            print(f"{fila['modulo']:<20} {fila['segundos']:.3f} s")
+            for submodulo in fila["submodulos"]:
+                print(f"    {submodulo['modulo']:<30} {submodulo['segundos']:.3f} s")
@@ -0,0 +1,161 @@
+"""
+Benchmark y verificación del parser inteligente
+Compara SmartTimeParser, EntradaSalidaDetector y DataGrouper contra el corpus
+de referencia (corpus_parser.json) y mide líneas/s y marcaciones/s por clase.
+
+Uso:
+    python benchmark_parser.py                  # verificar y medir
+    python benchmark_parser.py --repeticiones 50
+    python benchmark_parser.py --actualizar     # regenerar las salidas esperadas
+
+Termina con código 1 si alguna salida difiere de la esperada, para usarlo
+como control antes de aceptar una reescritura del parser.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from smart_parser import SmartTimeParser, EntradaSalidaDetector, DataGrouper
+
+RUTA_CORPUS = Path(__file__).with_name("corpus_parser.json")
+
+def calcular_salidas(corpus: Dict) -> Dict:
+    """
+    Ejecuta las tres clases sobre el corpus
+
+    Args:
+        corpus: Corpus con "lineas" (texto y contexto) y "marcaciones"
+
+    Returns:
+        Dict: Salidas por línea ("lineas") y de la agrupación ("agrupacion")
+    """
+    parser = SmartTimeParser()
+    detector = EntradaSalidaDetector()
+    grouper = DataGrouper()
+
+    salidas_lineas = []
+    for caso in corpus["lineas"]:
+        fechas_horas = parser.extraer_fecha_hora(caso["texto"])
+        tipos = [detector.detectar_tipo(caso["texto"], fh["hora"], caso.get("contexto")) for fh in fechas_horas]
+        salidas_lineas.append({"fechas_horas": fechas_horas, "tipos": tipos})
+
+    return {
+        "lineas": salidas_lineas,
+        "agrupacion": grouper.agrupar_por_empleado_fecha(corpus["marcaciones"]),
+    }
+
+def comparar(corpus: Dict, salidas: Dict) -> List[str]:
+    """Devuelve la lista de diferencias entre las salidas y las esperadas"""
+    diferencias = []
+
+    for caso, salida in zip(corpus["lineas"], salidas["lineas"]):
+        if caso.get("esperado") != salida:
+            diferencias.append(
+                f"Línea {caso['texto']!r}: esperado {caso.get('esperado')}, obtenido {salida}"
+            )
+
+    if corpus.get("agrupacion_esperada") != salidas["agrupacion"]:
+        diferencias.append(
+            f"Agrupación: esperado {corpus.get('agrupacion_esperada')}, obtenido {salidas['agrupacion']}"
+        )
+
+    return diferencias
+
+def medir(corpus: Dict, repeticiones: int) -> Dict[str, Dict[str, float]]:
+    """
+    Mide el rendimiento de cada clase repitiendo el corpus
+
+    Args:
+        corpus: Corpus de referencia
+        repeticiones: Veces que se procesa el corpus completo
+
+    Returns:
+        Dict: Por clase, segundos y unidades procesadas por segundo
+    """
+    parser = SmartTimeParser()
+    detector = EntradaSalidaDetector()
+    grouper = DataGrouper()
+    lineas = [caso["texto"] for caso in corpus["lineas"]] * repeticiones
+
+    inicio = time.perf_counter()
+    encontradas = [parser.extraer_fecha_hora(linea) for linea in lineas]
+    segundos_parser = time.perf_counter() - inicio
+    cantidad_marcaciones = sum(len(fechas_horas) for fechas_horas in encontradas)
+
+    casos = [
+        (caso["texto"], fh["hora"], caso.get("contexto"))
+        for caso, fechas_horas in zip(corpus["lineas"] * repeticiones, encontradas)
+        for fh in fechas_horas
+    ]
+    inicio = time.perf_counter()
+    for texto, hora, contexto in casos:
+        detector.detectar_tipo(texto, hora, contexto)
+    segundos_detector = time.perf_counter() - inicio
+
+    marcaciones = corpus["marcaciones"] * repeticiones
+    inicio = time.perf_counter()
+    grouper.agrupar_por_empleado_fecha(marcaciones)
+    segundos_grouper = time.perf_counter() - inicio
+
+    return {
+        "SmartTimeParser": {
+            "segundos": segundos_parser,
+            "lineas_por_segundo": len(lineas) / segundos_parser,
+            "marcaciones_por_segundo": cantidad_marcaciones / segundos_parser,
+        },
+        "EntradaSalidaDetector": {
+            "segundos": segundos_detector,
+            "marcaciones_por_segundo": len(casos) / segundos_detector if segundos_detector else 0.0,
+        },
+        "DataGrouper": {
+            "segundos": segundos_grouper,
+            "marcaciones_por_segundo": len(marcaciones) / segundos_grouper if segundos_grouper else 0.0,
+        },
+    }
+
+def main(argumentos: List[str] = None) -> int:
+    opciones = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    opciones.add_argument("--repeticiones", type=int, default=200, help="Repeticiones del corpus en el benchmark")
+    opciones.add_argument("--actualizar", action="store_true", help="Regenerar las salidas esperadas del corpus")
+    opciones.add_argument("--json", action="store_true", help="Imprimir los resultados del benchmark en JSON")
+    args = opciones.parse_args(argumentos)
+
+    corpus = json.loads(RUTA_CORPUS.read_text(encoding="utf-8"))
+    salidas = calcular_salidas(corpus)
+
+    if args.actualizar:
+        for caso, salida in zip(corpus["lineas"], salidas["lineas"]):
+            caso["esperado"] = salida
+        corpus["agrupacion_esperada"] = salidas["agrupacion"]
+        RUTA_CORPUS.write_text(json.dumps(corpus, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Salidas esperadas actualizadas en {RUTA_CORPUS.name}")
+        return 0
+
+    diferencias = comparar(corpus, salidas)
+    resultados = medir(corpus, args.repeticiones)
+
+    if args.json:
+        print(json.dumps({"diferencias": diferencias, "benchmark": resultados}, ensure_ascii=False, indent=2))
+    else:
+        print(f"Corpus: {len(corpus['lineas'])} líneas, {len(corpus['marcaciones'])} marcaciones, "
+              f"{args.repeticiones} repeticiones")
+        for clase, medidas in resultados.items():
+            detalle = ", ".join(
+                f"{clave.replace('_', ' ')}: {valor:,.0f}" for clave, valor in medidas.items() if clave != "segundos"
+            )
+            print(f"  {clase:<22} {medidas['segundos']:.3f} s  ({detalle})")
+
+        if diferencias:
+            print(f"\n{len(diferencias)} diferencia(s) con las salidas esperadas:")
+            for diferencia in diferencias:
+                print(f"  - {diferencia}")
+        else:
+            print("\nTodas las salidas coinciden con las esperadas.")
+
+    return 1 if diferencias else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
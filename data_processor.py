@@ -6,7 +6,69 @@ import pandas as pd
 import streamlit as st
 import io
 from datetime import datetime, timedelta
-from calculations import calcular_horas_especiales, horas_a_horasminutos
+from calculations import horas_a_horasminutos
+from instrumentacion import medido, medir_etapa
+from paralelo import mapear_en_paralelo
+
+# Esquema declarado de los archivos de asistencia (Excel, CSV y Parquet)
+COLUMNAS_REQUERIDAS = ["Empleado", "Fecha", "Entrada", "Salida", "Descuento Inventario", "Descuento Caja", "Retiro"]
+COLUMNAS_DESCUENTO = ["Descuento Inventario", "Descuento Caja", "Retiro"]
+TIPOS_CSV = {
+    "Empleado": str,
+    "Fecha": str,
+    "Entrada": str,
+    "Salida": str,
+    "Descuento Inventario": "float64",
+    "Descuento Caja": "float64",
+    "Retiro": "float64",
+}
+FORMATOS_FECHA = ["%Y-%m-%d", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S"]
+FORMATOS_HORA = ["%H:%M", "%H:%M:%S"]
+
+# Texto de una hora 00:00 real (celda de hora o "00:00:00"): "00:00" y "0:00"
+# como texto son la marca de hora faltante (ver detectar_registros_incompletos)
+HORA_MEDIANOCHE = "00:00:00"
+
+# Filas por lote en el procesamiento de archivos muy grandes
+TAMANO_LOTE = 5000
+
+# Formatos del reporte final: nombre -> (extensión, tipo MIME)
+FORMATOS_EXPORTACION = {
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "JSON Lines": ("jsonl", "application/x-ndjson"),
+    "Recibos HTML (zip)": ("zip", "application/zip"),
+}
+
+# Columnas de los resultados exportadas como minutos y como centavos enteros
+COLUMNAS_MINUTOS = {
+    "Entrada": "entrada_minutos",
+    "Salida": "salida_minutos",
+    "Horas Trabajadas (h:mm)": "minutos_trabajados",
+    "Horas Normales": "minutos_normales",
+    "Horas Especiales": "minutos_especiales",
+}
+COLUMNAS_CENTAVOS = {
+    "Descuento Inventario": "descuento_inventario_centavos",
+    "Descuento Caja": "descuento_caja_centavos",
+    "Retiro": "retiro_centavos",
+    "Sueldo Final": "sueldo_final_centavos",
+}
+
+# Valores numéricos de cada resultado que devuelve el motor de cálculo (ver
+# calcular_lote): el día de la fecha en ns, el feriado y las columnas tipadas
+CAMPOS_TIPADOS = ["fecha", "feriado", *COLUMNAS_MINUTOS.values(), *COLUMNAS_CENTAVOS.values()]
+
+# Columnas de horas sumadas en las hojas de resumen del libro de nómina
+COLUMNAS_HORAS_RESUMEN = ["Horas Trabajadas (h:mm)", "Horas Normales", "Horas Especiales"]
+
+# Opciones de filas por página en el detalle de resultados
+FILAS_POR_PAGINA = [25, 50, 100, 250]
+
+# A partir de esta cantidad de filas (y con más de una CPU) las sucursales se
+# calculan en procesos; por debajo, una tras otra en el mismo hilo
+UMBRAL_PROCESOS = 20000
 
 def validar_archivo_excel(df):
     """
@@ -18,10 +80,272 @@ def validar_archivo_excel(df):
     Returns:
         tuple: (es_valido, columnas_faltantes)
     """
-    required_cols = ["Empleado", "Fecha", "Entrada", "Salida", "Descuento Inventario", "Descuento Caja", "Retiro"]
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = [col for col in COLUMNAS_REQUERIDAS if col not in df.columns]
     return len(missing_cols) == 0, missing_cols
 
+@medido("datos.leer_archivo", contar=lambda df: {"filas": len(df)})
+def leer_archivo_asistencia(archivo):
+    """
+    Lee un archivo de asistencia (Excel, CSV o Parquet) según su extensión
+    
+    Args:
+        archivo: Archivo subido
+        
+    Returns:
+        DataFrame: Solo las columnas requeridas presentes, con tipos normalizados
+    """
+    nombre = getattr(archivo, "name", str(archivo)).lower()
+    
+    if nombre.endswith(".csv"):
+        return leer_csv_asistencia(archivo)
+    if nombre.endswith(".parquet"):
+        return leer_parquet_asistencia(archivo)
+    return leer_libro_excel(archivo)
+
+def leer_libro_excel(archivo):
+    """
+    Lee todas las hojas del libro que tengan las columnas requeridas.
+    Con más de una hoja válida (una por sucursal), cada fila se etiqueta con el
+    nombre de su hoja en la columna "Sucursal".
+    
+    El libro se abre una sola vez y sus hojas se recorren en orden: leerlas en
+    paralelo obligaba a cada tarea a volver a abrir el libro completo (zip,
+    estilos y cadenas compartidas), y openpyxl no libera el GIL.
+    
+    Args:
+        archivo: Archivo Excel subido (o ruta)
+        
+    Returns:
+        DataFrame: Datos combinados; df.attrs["hojas_omitidas"] lista las hojas
+        descartadas por no tener las columnas requeridas
+    """
+    from openpyxl import load_workbook
+    
+    if hasattr(archivo, "getvalue"):
+        archivo = io.BytesIO(archivo.getvalue())
+    
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        nombres_hojas = libro.sheetnames
+        hoja_activa = libro.active.title
+        hojas = [list(_leer_lotes_hoja(libro[nombre], None))[0] for nombre in nombres_hojas]
+    finally:
+        libro.close()
+    
+    hojas_validas = [(nombre, df) for nombre, df in zip(nombres_hojas, hojas) if validar_archivo_excel(df)[0]]
+    
+    # Sin hojas válidas se devuelve la hoja activa para informar las columnas faltantes
+    if not hojas_validas:
+        return hojas[nombres_hojas.index(hoja_activa)]
+    
+    if len(hojas_validas) == 1:
+        df = hojas_validas[0][1]
+    else:
+        for nombre, df_hoja in hojas_validas:
+            df_hoja.insert(0, "Sucursal", nombre)
+        df = pd.concat([df_hoja for _, df_hoja in hojas_validas], ignore_index=True)
+    
+    nombres_validos = {nombre for nombre, _ in hojas_validas}
+    df.attrs["hojas_omitidas"] = [nombre for nombre in nombres_hojas if nombre not in nombres_validos]
+    return df
+
+def leer_excel_asistencia(archivo, hoja=None):
+    """
+    Lee un Excel en modo de solo lectura y solo valores, cargando únicamente
+    las columnas requeridas fila por fila
+    
+    Args:
+        archivo: Archivo Excel subido
+        hoja (str): Nombre de la hoja (por defecto la activa)
+        
+    Returns:
+        DataFrame: Datos con tipos normalizados
+    """
+    return list(leer_excel_por_lotes(archivo, None, hoja))[0]
+
+def leer_excel_por_lotes(archivo, tamano_lote=TAMANO_LOTE, hoja=None):
+    """
+    Lee un Excel en lotes de filas sin cargar el libro completo en memoria
+    
+    Args:
+        archivo: Archivo Excel subido
+        tamano_lote (int): Filas por lote (None para un único lote)
+        hoja (str): Nombre de la hoja (por defecto la activa)
+        
+    Yields:
+        DataFrame: Cada lote con tipos normalizados; el índice continúa entre lotes
+    """
+    from openpyxl import load_workbook
+    
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from _leer_lotes_hoja(libro[hoja] if hoja else libro.active, tamano_lote)
+    finally:
+        libro.close()
+
+def _leer_lotes_hoja(hoja_excel, tamano_lote):
+    """Lotes de una hoja de un libro ya abierto en modo de solo lectura (ver leer_excel_por_lotes)"""
+    filas = hoja_excel.iter_rows(values_only=True)
+    
+    encabezado = next(filas, None) or ()
+    posiciones = {nombre: i for i, nombre in enumerate(encabezado) if nombre in COLUMNAS_REQUERIDAS}
+    columnas = [col for col in COLUMNAS_REQUERIDAS if col in posiciones]
+    indices = [posiciones[col] for col in columnas]
+    
+    registros = []
+    inicio = 0
+    for fila in filas:
+        valores = [fila[i] if i < len(fila) else None for i in indices]
+        # Saltar filas completamente vacías
+        if not any(valor is not None for valor in valores):
+            continue
+        registros.append(valores)
+        
+        if tamano_lote and len(registros) >= tamano_lote:
+            yield _registros_a_dataframe(registros, columnas, inicio)
+            inicio += len(registros)
+            registros = []
+    
+    if registros or inicio == 0:
+        yield _registros_a_dataframe(registros, columnas, inicio)
+
+def _registros_a_dataframe(registros, columnas, inicio):
+    """Construye un lote con índice global a partir de filas leídas del Excel"""
+    df = pd.DataFrame(registros, columns=columnas)
+    df.index = pd.RangeIndex(inicio, inicio + len(df))
+    return aplicar_esquema_asistencia(df)
+
+def leer_csv_asistencia(archivo):
+    """
+    Lee un CSV con tipos fijos para las columnas requeridas
+    
+    Args:
+        archivo: Archivo CSV subido (separado por coma o punto y coma)
+        
+    Returns:
+        DataFrame: Datos con tipos normalizados
+    """
+    # Detectar el separador a partir del encabezado
+    inicio = archivo.read(4096)
+    archivo.seek(0)
+    if isinstance(inicio, bytes):
+        inicio = inicio.decode("utf-8", errors="ignore")
+    encabezado = inicio.splitlines()[0] if inicio else ""
+    separador = ";" if encabezado.count(";") > encabezado.count(",") else ","
+    
+    df = pd.read_csv(
+        archivo,
+        sep=separador,
+        usecols=lambda col: col in COLUMNAS_REQUERIDAS,
+        dtype=TIPOS_CSV,
+        skipinitialspace=True,
+    )
+    return aplicar_esquema_asistencia(df)
+
+def leer_parquet_asistencia(archivo):
+    """
+    Lee un Parquet cargando solo las columnas requeridas
+    
+    Args:
+        archivo: Archivo Parquet subido
+        
+    Returns:
+        DataFrame: Datos con tipos normalizados
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("pyarrow no está instalado. No se pueden leer archivos Parquet.")
+    
+    columnas_archivo = pq.ParquetFile(archivo).schema_arrow.names
+    archivo.seek(0)
+    columnas = [col for col in COLUMNAS_REQUERIDAS if col in columnas_archivo]
+    
+    df = pd.read_parquet(archivo, columns=columnas)
+    return aplicar_esquema_asistencia(df)
+
+def aplicar_esquema_asistencia(df):
+    """
+    Normaliza los tipos de las columnas requeridas presentes:
+    Fecha a datetime, Entrada/Salida a texto "HH:MM" y descuentos a float
+    
+    Args:
+        df (DataFrame): Datos leídos del archivo
+        
+    Returns:
+        DataFrame: Datos con tipos normalizados
+    """
+    if "Fecha" in df.columns:
+        df["Fecha"] = _convertir_fechas(df["Fecha"])
+    
+    for col in ("Entrada", "Salida"):
+        if col in df.columns:
+            df[col] = _normalizar_horas(df[col])
+    
+    for col in COLUMNAS_DESCUENTO:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    
+    return df
+
+def _convertir_fechas(serie):
+    """
+    Convierte una columna de fechas probando los formatos declarados en orden;
+    las que no tienen ninguno pasan por el intérprete general de pandas (una
+    vez por valor distinto) y solo las que tampoco así se entienden quedan NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    
+    texto = serie.astype(str).str.strip()
+    fechas = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    for formato in FORMATOS_FECHA:
+        pendientes = fechas.isna()
+        if not pendientes.any():
+            break
+        fechas[pendientes] = pd.to_datetime(texto[pendientes], format=formato, errors="coerce")
+    
+    pendientes = fechas.isna() & serie.notna() & (texto != "")
+    if pendientes.any():
+        convertidas = {valor: _convertir_fecha_libre(valor) for valor in texto[pendientes].unique()}
+        fechas[pendientes] = pd.to_datetime(texto[pendientes].map(convertidas))
+    
+    return fechas
+
+def _convertir_fecha_libre(valor):
+    """Una fecha en cualquier formato que entienda pd.to_datetime, o NaT"""
+    try:
+        fecha = pd.to_datetime(valor)
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    return fecha.tz_localize(None) if getattr(fecha, "tzinfo", None) else fecha
+
+def _normalizar_horas(serie):
+    """
+    Convierte una columna de horas (time, datetime o texto) a texto "HH:MM".
+    Los valores vacíos quedan como NaN y los que no se pueden interpretar se
+    conservan tal cual para que el cálculo los informe como error. Una hora
+    00:00 real queda como HORA_MEDIANOCHE para no confundirla con la marca
+    de hora faltante ("00:00" o "0:00" escrito como texto).
+    """
+    serie = serie.map(lambda valor: valor.strftime("%H:%M:%S") if hasattr(valor, "strftime") else valor)
+    presentes = serie.notna()
+    texto = serie[presentes].astype(str).str.strip()
+    
+    horas = pd.Series(pd.NaT, index=texto.index, dtype="datetime64[ns]")
+    for formato in FORMATOS_HORA:
+        pendientes = horas.isna()
+        if not pendientes.any():
+            break
+        horas[pendientes] = pd.to_datetime(texto[pendientes], format=formato, errors="coerce")
+    
+    normalizadas = horas.dt.strftime("%H:%M").where(horas.notna(), texto)
+    medianoche = (normalizadas == "00:00") & ~texto.isin(["00:00", "0:00"])
+    normalizadas = normalizadas.where(~medianoche, HORA_MEDIANOCHE)
+    resultado = pd.Series(float("nan"), index=serie.index, dtype=object)
+    resultado[presentes] = normalizadas
+    return resultado
+
 def procesar_datos_excel(df, valor_por_hora, opcion_feriados, fechas_feriados, cantidad_feriados):
     """
     Procesa los datos del Excel y calcula los sueldos
@@ -36,40 +360,483 @@ def procesar_datos_excel(df, valor_por_hora, opcion_feriados, fechas_feriados, c
     Returns:
         tuple: (resultados, total_horas, total_sueldos)
     """
+    resultados, horas, sueldos, errores, *_ = calcular_lote(df, valor_por_hora, fechas_feriados)
+    
+    for error in errores:
+        st.error(error)
+
+    return resultados, sum(horas), sum(sueldos)
+
+@medido("datos.calcular_lote", contar=lambda resultado: {"filas": len(resultado[0])})
+def calcular_lote(df, valor_por_hora, fechas_feriados, progreso=None):
+    """
+    Motor de cálculo sin interfaz: calcula cada fila de un lote de datos
+    
+    Los recargos salen del plan de pago de la sucursal de cada fila (ver
+    reglas_pago.py) y se evalúan sobre columnas completas. Fechas y horas se
+    interpretan una vez por valor distinto; las filas con algún valor que no
+    se puede interpretar así se calculan de a una para informar su error.
+    
+    Args:
+        df (DataFrame): DataFrame con los datos
+        valor_por_hora (float): Valor por hora de trabajo
+        fechas_feriados (set): Fechas completas específicas de feriados
+        progreso: Callback opcional progreso(etapa, fraccion)
+        
+    Returns:
+        tuple: (resultados, horas_por_fila, sueldos_por_fila, errores, indices, tipadas),
+            donde indices es el índice en df de cada resultado y tipadas sus
+            valores numéricos (CAMPOS_TIPADOS), tomados de los arrays del
+            cálculo antes de formatearlos como texto (ver resultados_tipados)
+    """
+    import numpy as np
+    from reglas_pago import NS_POR_DIA, NS_POR_HORA
+
+    total_filas = len(df)
+    if progreso:
+        progreso("Calculando sueldos", 0.0)
+
+    dias, fechas, feriados, validas = _interpretar_fechas(df["Fecha"], fechas_feriados)
+    entradas, textos_entrada, entradas_validas = _interpretar_horas(df["Entrada"])
+    salidas, textos_salida, salidas_validas = _interpretar_horas(df["Salida"])
+    validas = validas & entradas_validas & salidas_validas
+    descuentos = {}
+    for columna in COLUMNAS_DESCUENTO:
+        valores, montos, montos_validos = _interpretar_descuentos(df[columna])
+        descuentos[columna] = (valores, montos)
+        validas &= montos_validos
+
+    minutos_entrada = entradas // (NS_POR_HORA // 60)
+    minutos_salida = salidas // (NS_POR_HORA // 60)
+    entradas = dias + entradas
+    salidas = dias + salidas
+    salidas = np.where(salidas < entradas, salidas + NS_POR_DIA, salidas)
+
+    # Cada plan de pago se evalúa de una vez sobre todas sus filas
+    codigos_plan, planes = _planes_por_fila(df)
+    horas = np.zeros(total_filas)
+    horas_normales = np.zeros(total_filas)
+    horas_especiales = np.zeros(total_filas)
+    sueldos = np.zeros(total_filas)
+    for codigo, plan in enumerate(planes):
+        filas = validas & (codigos_plan == codigo)
+        liquidacion = plan.liquidar(dias[filas], entradas[filas], salidas[filas], feriados[filas], valor_por_hora)
+        for destino, valores in zip((horas, horas_normales, horas_especiales, sueldos), liquidacion):
+            destino[filas] = valores
+    for columna in COLUMNAS_DESCUENTO:
+        sueldos = sueldos - descuentos[columna][1]
+
+    posiciones = np.flatnonzero(validas)
+    columnas = {}
+    if "Sucursal" in df.columns:
+        columnas["Sucursal"] = df["Sucursal"].to_numpy(dtype=object)[posiciones]
+    columnas["Empleado"] = df["Empleado"].to_numpy(dtype=object)[posiciones]
+    columnas["Fecha"] = fechas[posiciones]
+    columnas["Entrada"] = textos_entrada[posiciones]
+    columnas["Salida"] = textos_salida[posiciones]
+    columnas["Feriado"] = np.array(["No", "Sí"], dtype=object)[feriados[posiciones].astype(int)]
+    columnas["Horas Trabajadas (h:mm)"] = _textos_horas(horas[posiciones])
+    columnas["Horas Normales"] = _textos_horas(horas_normales[posiciones])
+    columnas["Horas Especiales"] = _textos_horas(horas_especiales[posiciones])
+    for columna in COLUMNAS_DESCUENTO:
+        columnas[columna] = descuentos[columna][0][posiciones]
+    columnas["Sueldo Final"] = [round(sueldo, 2) for sueldo in sueldos[posiciones].tolist()]
+
+    tipadas = [
+        dias[posiciones],
+        feriados[posiciones],
+        minutos_entrada[posiciones],
+        minutos_salida[posiciones],
+        *(_minutos_desde_horas_decimales(valores[posiciones]) for valores in (horas, horas_normales, horas_especiales)),
+        *(np.round(descuentos[columna][1][posiciones] * 100) for columna in COLUMNAS_DESCUENTO),
+        np.round(np.array(columnas["Sueldo Final"], dtype="float64") * 100),
+    ]
+
+    claves = list(columnas)
+    calculadas = dict(zip(
+        posiciones.tolist(),
+        zip(
+            [dict(zip(claves, fila)) for fila in zip(*(list(valores) for valores in columnas.values()))],
+            horas[posiciones].tolist(),
+            sueldos[posiciones].tolist(),
+            zip(*(valores.tolist() for valores in tipadas)),
+        ),
+    ))
+    
+    if progreso:
+        progreso("Calculando sueldos", len(posiciones) / max(total_filas, 1))
+
+    errores = []
+    pendientes = np.flatnonzero(~validas).tolist()
+    for n, (posicion, (idx, row)) in enumerate(zip(pendientes, df.iloc[pendientes].iterrows())):
+        if progreso and n % 200 == 0:
+            progreso("Calculando sueldos", (len(posiciones) + n) / total_filas)
+        try:
+            resultado_fila = _procesar_fila(row, idx, valor_por_hora, fechas_feriados,
+                                            planes[codigos_plan[posicion]])
+            calculadas[posicion] = (resultado_fila["datos"], resultado_fila["horas"], resultado_fila["sueldo"],
+                                    resultado_fila["tipada"])
+        except Exception as e:
+            errores.append(f"Error en la fila {idx+2}: {e}")
+
+    orden = sorted(calculadas) if pendientes else list(calculadas)
+    resultados = [calculadas[posicion][0] for posicion in orden]
+    horas_por_fila = [calculadas[posicion][1] for posicion in orden]
+    sueldos_por_fila = [calculadas[posicion][2] for posicion in orden]
+    tipadas_por_fila = [calculadas[posicion][3] for posicion in orden]
+    indices = df.index[orden].tolist()
+
+    return resultados, horas_por_fila, sueldos_por_fila, errores, indices, tipadas_por_fila
+
+def _interpretar_fechas(serie, fechas_feriados):
+    """
+    Interpreta una vez cada fecha distinta de la columna
+
+    Returns:
+        tuple: (inicio del día en ns, texto "YYYY-MM-DD", es feriado, es válida), arrays por fila
+    """
+    import numpy as np
+
+    codigos, unicos = pd.factorize(serie)
+    dias, textos, feriados, validas = [], [], [], []
+    for valor in unicos:
+        try:
+            fecha = pd.to_datetime(valor)
+            dia = fecha.date()
+            dias.append(pd.Timestamp(dia).value)
+            textos.append(fecha.strftime("%Y-%m-%d"))
+            feriados.append(dia in fechas_feriados)
+            validas.append(True)
+        except Exception:
+            dias.append(0)
+            textos.append(None)
+            feriados.append(False)
+            validas.append(False)
+    # El código -1 (valor faltante) toma el último elemento: una fecha inválida
+    dias.append(0)
+    textos.append(None)
+    feriados.append(False)
+    validas.append(False)
+    return (np.array(dias, dtype="int64")[codigos], np.array(textos, dtype=object)[codigos],
+            np.array(feriados)[codigos], np.array(validas)[codigos])
+
+def _interpretar_horas(serie):
+    """
+    Interpreta una vez cada hora distinta de la columna
+
+    Returns:
+        tuple: (ns desde el inicio del día, texto "HH:MM", es válida), arrays por fila
+    """
+    import numpy as np
+
+    codigos, unicos = pd.factorize(serie)
+    desplazamientos, textos, validas = [], [], []
+    for valor in unicos:
+        try:
+            # "HH:MM" (el formato de aplicar_esquema_asistencia) sin pasar por el intérprete general
+            if isinstance(valor, str) and len(valor) == 5 and valor[2] == ":" and valor.replace(":", "").isdigit():
+                hora = datetime.strptime(valor, "%H:%M").time()
+            else:
+                hora = pd.to_datetime(str(valor)).time()
+            segundos = (hora.hour * 60 + hora.minute) * 60 + hora.second
+            desplazamientos.append(segundos * 1_000_000_000 + hora.microsecond * 1000)
+            textos.append(hora.strftime("%H:%M"))
+            validas.append(True)
+        except Exception:
+            desplazamientos.append(0)
+            textos.append(None)
+            validas.append(False)
+    # El código -1 (valor faltante) toma el último elemento: una hora inválida
+    desplazamientos.append(0)
+    textos.append(None)
+    validas.append(False)
+    return (np.array(desplazamientos, dtype="int64")[codigos], np.array(textos, dtype=object)[codigos],
+            np.array(validas)[codigos])
+
+def _interpretar_descuentos(serie):
+    """
+    Descuentos tal como los usa el cálculo (los faltantes valen 0)
+
+    Returns:
+        tuple: (valores originales, montos float, es válido), arrays por fila
+    """
+    import numbers
+
+    valores = serie.astype(object).where(serie.notna(), 0)
+    if pd.api.types.is_numeric_dtype(serie):
+        validos = pd.Series(True, index=serie.index)
+    else:
+        validos = valores.map(lambda valor: isinstance(valor, numbers.Real)).astype(bool)
+    montos = valores.where(validos, 0).to_numpy(dtype="float64")
+    return valores.to_numpy(), montos, validos.to_numpy()
+
+def _planes_por_fila(df):
+    """
+    Plan de pago de cada fila según su sucursal
+
+    Returns:
+        tuple: (código del plan por fila, planes distintos)
+    """
+    import numpy as np
+    from reglas_pago import plan_para_sucursal
+
+    if "Sucursal" not in df.columns:
+        return np.zeros(len(df), dtype="intp"), [plan_para_sucursal()]
+
+    codigos, sucursales = pd.factorize(df["Sucursal"])
+    # El código -1 (sin sucursal) toma el último elemento: el plan general
+    planes = [plan_para_sucursal(sucursal) for sucursal in sucursales] + [plan_para_sucursal()]
+    distintos = list({id(plan): plan for plan in planes}.values())
+    codigo_plan = np.array([distintos.index(plan) for plan in planes], dtype="intp")
+    return codigo_plan[codigos], distintos
+
+def _minutos_desde_horas_decimales(horas):
+    """
+    Horas decimales a minutos enteros, redondeando como horas_a_horasminutos
+    (el texto "h:mm" de un resultado y sus minutos coinciden)
+    """
+    import numpy as np
+
+    enteras = np.trunc(horas)
+    return enteras * 60 + np.round((horas - enteras) * 60)
+
+def _textos_horas(horas):
+    """Horas decimales como texto "h:mm", formateando una sola vez cada valor distinto"""
+    import numpy as np
+
+    codigos, unicos = pd.factorize(horas)
+    textos = np.array([horas_a_horasminutos(valor) for valor in unicos.tolist()] + [None], dtype=object)
+    return textos[codigos]
+
+def calcular_lote_incremental(df, valor_por_hora, fechas_feriados, calculados, progreso=None):
+    """
+    Calcula un lote reutilizando las filas ya calculadas con la misma
+    configuración: solo se calculan las filas cuyo contenido no se vio antes
+    (por ejemplo, las de un archivo nuevo o los registros recién corregidos)
+    
+    Args:
+        df (DataFrame): DataFrame con los datos
+        valor_por_hora (float): Valor por hora de trabajo
+        fechas_feriados (set): Fechas completas específicas de feriados
+        calculados (dict): Huella de fila -> (datos, horas, sueldo, tipada) calculados con
+            este valor por hora y estos feriados; se completa con las filas nuevas y
+            se recorta a las filas de df, para que no crezca con cada archivo o corrección
+        progreso: Callback opcional progreso(etapa, fraccion)
+        
+    Returns:
+        tuple: (resultados, horas_por_fila, sueldos_por_fila, errores, indices, tipadas), como calcular_lote
+    """
+    # Solo las columnas que usa el cálculo, en orden fijo y con los montos como
+    # decimales: la misma fila leída de otra fuente tiene la misma huella
+    columnas = [columna for columna in ["Sucursal", *COLUMNAS_REQUERIDAS] if columna in df.columns]
+    filas = df[columnas].astype({
+        columna: "float64" for columna in COLUMNAS_DESCUENTO
+        if columna in df.columns and pd.api.types.is_numeric_dtype(df[columna])
+    })
+    huellas = pd.util.hash_pandas_object(filas, index=False)
+    nuevas = ~huellas.map(calculados.__contains__).astype(bool)
+    
+    with medir_etapa("datos.calcular_incremental", filas=len(df), nuevas=int(nuevas.sum())):
+        lote = calcular_lote(df[nuevas], valor_por_hora, fechas_feriados, progreso)
+    for datos, horas, sueldo, idx, tipada in zip(*lote[:3], lote[4], lote[5]):
+        calculados[huellas[idx]] = (datos, horas, sueldo, tipada)
+    vigentes = set(huellas.tolist())
+    for huella in [huella for huella in list(calculados) if huella not in vigentes]:
+        del calculados[huella]
+    
+    # Las filas con error no quedan en calculados y se informan con su número de fila
+    resultados, horas, sueldos, indices, tipadas = [], [], [], [], []
+    for idx, huella in huellas.items():
+        fila = calculados.get(huella)
+        if fila is not None:
+            resultados.append(fila[0])
+            horas.append(fila[1])
+            sueldos.append(fila[2])
+            indices.append(idx)
+            tipadas.append(fila[3])
+    
+    return resultados, horas, sueldos, lote[3], indices, tipadas
+
+def huella_dataframe(df):
+    """
+    Calcula una huella estable del contenido de un DataFrame
+    
+    Args:
+        df (DataFrame): Datos a identificar
+        
+    Returns:
+        str: Hash hexadecimal de columnas, índice y valores
+    """
+    import hashlib
+    
+    huella = hashlib.sha1(repr(list(df.columns)).encode("utf-8"))
+    huella.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return huella.hexdigest()
+
+@medido("datos.calcular_sucursales", contar=lambda resultado: {"filas": len(resultado[0])})
+def procesar_sucursales_en_paralelo(df, valor_por_hora, fechas_feriados, max_workers=None):
+    """
+    Calcula los sueldos de cada sucursal y arma los totales por sucursal y
+    consolidados
+    
+    Con UMBRAL_PROCESOS filas o más (y más de una CPU) cada sucursal se calcula
+    en un proceso del pool; por debajo se calculan en orden, porque el arranque
+    de los procesos cuesta más que el cálculo y un pool de hilos no acelera
+    la parte en Python puro del motor.
+    
+    Args:
+        df (DataFrame): Datos con la columna "Sucursal"
+        valor_por_hora (float): Valor por hora de trabajo
+        fechas_feriados (set): Fechas completas específicas de feriados
+        max_workers (int): Procesos del pool (por defecto según CPUs)
+        
+    Returns:
+        tuple: (resultados, total_horas, total_sueldos, errores, totales_sucursal, tipadas),
+            con errores prefijados por la sucursal y tipadas como en calcular_lote
+    """
+    import os
+    
+    grupos = list(df.groupby("Sucursal", sort=False))
+    tareas = [(grupo, valor_por_hora, fechas_feriados) for _, grupo in grupos]
+    if len(df) >= UMBRAL_PROCESOS and (os.cpu_count() or 1) > 1:
+        parciales = mapear_en_paralelo(_calcular_sucursal, tareas, usar_procesos=True, max_workers=max_workers)
+    else:
+        parciales = [_calcular_sucursal(tarea) for tarea in tareas]
+    
     resultados = []
+    tipadas = []
+    errores = []
     total_horas = 0
     total_sueldos = 0
+    filas_totales = []
+    
+    for (sucursal, _), (resultados_sucursal, horas, sueldos, errores_sucursal, _, tipadas_sucursal) in zip(grupos, parciales):
+        errores.extend(f"[{sucursal}] {error}" for error in errores_sucursal)
+        resultados.extend(resultados_sucursal)
+        tipadas.extend(tipadas_sucursal)
+        total_horas += sum(horas)
+        total_sueldos += sum(sueldos)
+        filas_totales.append({
+            "Sucursal": sucursal,
+            "Registros": len(resultados_sucursal),
+            "Horas Trabajadas (h:mm)": horas_a_horasminutos(sum(horas)),
+            "Sueldo Final": round(sum(sueldos), 2),
+        })
+    
+    filas_totales.append({
+        "Sucursal": "Total",
+        "Registros": len(resultados),
+        "Horas Trabajadas (h:mm)": horas_a_horasminutos(total_horas),
+        "Sueldo Final": round(total_sueldos, 2),
+    })
+    
+    return resultados, total_horas, total_sueldos, errores, pd.DataFrame(filas_totales), tipadas
 
-    for idx, row in df.iterrows():
-        try:
-            resultado_fila = _procesar_fila(row, idx, valor_por_hora, fechas_feriados)
-            
-            if resultado_fila:
-                resultados.append(resultado_fila["datos"])
-                total_horas += resultado_fila["horas"]
-                total_sueldos += resultado_fila["sueldo"]
-
-        except Exception as e:
-            st.error(f"Error en la fila {idx+2}: {e}")
+def _calcular_sucursal(tarea):
+    """Calcula el lote de una sucursal (tarea del pool)"""
+    df, valor_por_hora, fechas_feriados = tarea
+    return calcular_lote(df, valor_por_hora, fechas_feriados)
 
-    return resultados, total_horas, total_sueldos
+@medido("datos.procesar_por_lotes", contar=lambda resumen: {"filas": resumen["filas_calculadas"]})
+def procesar_excel_por_lotes(archivo, destino, valor_por_hora, fechas_feriados, tamano_lote=TAMANO_LOTE):
+    """
+    Procesa un Excel muy grande por lotes con memoria constante: cada lote se
+    calcula con el motor de cálculo, el detalle se escribe en CSV a medida que
+    se procesa y solo se conservan los totales por empleado.
+    Los registros sin asistencia o incompletos se excluyen y se cuentan.
+    
+    Args:
+        archivo: Archivo Excel subido
+        destino: Archivo de texto abierto donde se escribe el detalle en CSV
+        valor_por_hora (float): Valor por hora de trabajo
+        fechas_feriados (set): Fechas completas específicas de feriados
+        tamano_lote (int): Filas por lote
+        
+    Returns:
+        dict: resumen_empleados (DataFrame), total_horas, total_sueldos,
+        filas_calculadas, filas_excluidas, filas_incompletas, errores
+    """
+    import csv
+    from pdf_processor import detectar_registros_incompletos, filtrar_registros_sin_asistencia
+    
+    escritor = None
+    por_empleado = {}  # empleado -> [registros, horas, sueldo]
+    resumen = {
+        "total_horas": 0,
+        "total_sueldos": 0,
+        "filas_calculadas": 0,
+        "filas_excluidas": 0,
+        "filas_incompletas": 0,
+        "errores": [],
+        "cantidad_errores": 0,
+    }
+    
+    for lote in leer_excel_por_lotes(archivo, tamano_lote):
+        es_valido, columnas_faltantes = validar_archivo_excel(lote)
+        if not es_valido:
+            raise ValueError(f"El archivo no contiene las siguientes columnas necesarias: {', '.join(columnas_faltantes)}")
+        
+        df_con_asistencia, df_sin_asistencia = filtrar_registros_sin_asistencia(lote)
+        df_incompletos = detectar_registros_incompletos(df_con_asistencia)
+        df_completos = df_con_asistencia.drop(df_incompletos.index)
+        
+        resultados, horas, sueldos, errores, *_ = calcular_lote(df_completos, valor_por_hora, fechas_feriados)
+        
+        if resultados:
+            if escritor is None:
+                escritor = csv.DictWriter(destino, fieldnames=list(resultados[0].keys()))
+                escritor.writeheader()
+            escritor.writerows(resultados)
+        
+        for datos, horas_fila, sueldo_fila in zip(resultados, horas, sueldos):
+            acumulado = por_empleado.setdefault(datos["Empleado"], [0, 0, 0])
+            acumulado[0] += 1
+            acumulado[1] += horas_fila
+            acumulado[2] += sueldo_fila
+        
+        resumen["total_horas"] += sum(horas)
+        resumen["total_sueldos"] += sum(sueldos)
+        resumen["filas_calculadas"] += len(resultados)
+        resumen["filas_excluidas"] += len(df_sin_asistencia)
+        resumen["filas_incompletas"] += len(df_incompletos)
+        resumen["cantidad_errores"] += len(errores)
+        # Conservar solo los primeros errores para no crecer con el archivo
+        resumen["errores"].extend(errores[:max(0, 50 - len(resumen["errores"]))])
+    
+    resumen["resumen_empleados"] = pd.DataFrame(
+        [
+            {
+                "Empleado": empleado,
+                "Registros": registros,
+                "Horas Trabajadas (h:mm)": horas_a_horasminutos(horas),
+                "Sueldo Final": round(sueldo, 2),
+            }
+            for empleado, (registros, horas, sueldo) in por_empleado.items()
+        ],
+        columns=["Empleado", "Registros", "Horas Trabajadas (h:mm)", "Sueldo Final"],
+    )
+    
+    return resumen
 
-def _procesar_fila(row, idx, valor_por_hora, fechas_feriados):
+def _procesar_fila(row, idx, valor_por_hora, fechas_feriados, plan):
     """
-    Procesa una fila individual del Excel con lógica completa:
-    - Horas normales × tarifa
-    - Horas especiales (20:00-22:00) × tarifa × 1.3
-    - Factor de feriado ×2 si aplica
+    Procesa una fila individual con el plan de pago de su sucursal. calcular_lote
+    la usa para las filas que no puede interpretar en bloque: si la fila no se
+    puede calcular, la excepción se informa como error de esa fila.
     
     Args:
         row: Fila del DataFrame
         idx: Índice de la fila
         valor_por_hora: Valor por hora
         fechas_feriados: Fechas completas específicas de feriados
+        plan: Plan de pago (reglas_pago.PlanPago)
         
     Returns:
-        dict: Resultado del procesamiento de la fila
+        dict: Resultado del procesamiento de la fila (datos, horas, sueldo y
+        sus valores numéricos en tipada, como en calcular_lote)
     """
+    import numpy as np
+
     fecha = pd.to_datetime(row["Fecha"])
     entrada = pd.to_datetime(str(row["Entrada"])).time()
     salida = pd.to_datetime(str(row["Salida"])).time()
@@ -79,33 +846,33 @@ def _procesar_fila(row, idx, valor_por_hora, fechas_feriados):
     if salida_dt < entrada_dt:
         salida_dt += timedelta(days=1)
 
-    # Calcular horas trabajadas en decimal
-    horas_trabajadas_decimal = (salida_dt - entrada_dt).total_seconds() / 3600
-
-    # Calcular horas especiales (20:00-22:00 con 30% extra)
-    horas_normales, horas_especiales = calcular_horas_especiales(entrada_dt, salida_dt)
-    
     # Comparar la fecha completa (año-mes-día) con las fechas de feriados seleccionadas
     es_feriado = fecha.date() in fechas_feriados
-    
-    # Factor de feriado: 2x si es feriado, 1x si no lo es
-    factor_feriado = 2 if es_feriado else 1
-
-    # Cálculo con horas normales y especiales
-    sueldo_normal = horas_normales * valor_por_hora
-    sueldo_especial = horas_especiales * valor_por_hora * 1.3  # 30% extra para horas especiales
-    sueldo_bruto = (sueldo_normal + sueldo_especial) * factor_feriado
 
     # Aplicar descuentos
     descuento_inventario = row["Descuento Inventario"] if not pd.isnull(row["Descuento Inventario"]) else 0
     descuento_caja = row["Descuento Caja"] if not pd.isnull(row["Descuento Caja"]) else 0
     retiro = row["Retiro"] if not pd.isnull(row["Retiro"]) else 0
 
+    # Una fecha faltante (NaT) falla aquí, antes de evaluar el plan
+    texto_fecha = fecha.strftime("%Y-%m-%d")
+
+    liquidacion = plan.liquidar(
+        np.array([pd.Timestamp(fecha.date()).value]),
+        np.array([pd.Timestamp(entrada_dt).value]),
+        np.array([pd.Timestamp(salida_dt).value]),
+        np.array([es_feriado]),
+        valor_por_hora,
+    )
+    horas_trabajadas_decimal, horas_normales, horas_especiales, sueldo_bruto = (
+        float(valores[0]) for valores in liquidacion
+    )
+
     sueldo_final = sueldo_bruto - descuento_inventario - descuento_caja - retiro
 
     datos_fila = {
         "Empleado": row["Empleado"],
-        "Fecha": fecha.strftime("%Y-%m-%d"),
+        "Fecha": texto_fecha,
         "Entrada": entrada.strftime("%H:%M"),
         "Salida": salida.strftime("%H:%M"),
         "Feriado": "Sí" if es_feriado else "No",
@@ -117,14 +884,30 @@ def _procesar_fila(row, idx, valor_por_hora, fechas_feriados):
         "Retiro": retiro,
         "Sueldo Final": round(sueldo_final, 2)
     }
+    
+    # En libros con una hoja por sucursal, conservar la sucursal de la fila
+    if "Sucursal" in row.index:
+        datos_fila = {"Sucursal": row["Sucursal"], **datos_fila}
+
+    tipada = (
+        pd.Timestamp(fecha.date()).value,
+        es_feriado,
+        entrada.hour * 60 + entrada.minute,
+        salida.hour * 60 + salida.minute,
+        *(float(_minutos_desde_horas_decimales(valor))
+          for valor in (horas_trabajadas_decimal, horas_normales, horas_especiales)),
+        *(round(float(descuento) * 100) for descuento in (descuento_inventario, descuento_caja, retiro)),
+        round(round(sueldo_final, 2) * 100),
+    )
 
     return {
         "datos": datos_fila,
         "horas": horas_trabajadas_decimal,
-        "sueldo": sueldo_final
+        "sueldo": sueldo_final,
+        "tipada": tipada
     }
 
-def mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora=None, fechas_feriados=None, nombre_archivo=None):
+def mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora=None, fechas_feriados=None, nombre_archivo=None, totales_sucursal=None, tipadas=None):
     """
     Muestra los resultados en la interfaz y proporciona descarga
     
@@ -135,6 +918,9 @@ def mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora=No
         valor_por_hora (float): Valor por hora utilizado en cálculos
         fechas_feriados (set): Fechas marcadas como feriados
         nombre_archivo (str): Nombre base para el archivo Excel (opcional)
+        totales_sucursal (DataFrame): Totales por sucursal y consolidados (opcional)
+        tipadas (list): Valores numéricos de los resultados, para exportarlos sin
+            interpretar los textos (opcional, ver resultados_tipados)
     """
     df_result = pd.DataFrame(resultados)
     
@@ -146,9 +932,16 @@ def mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora=No
     </div>
     """, unsafe_allow_html=True)
     
-    # Mostrar tabla con estilo
-    st.markdown("### Resultados del Cálculo")
-    st.dataframe(df_result, use_container_width=True)
+    # Resumen por empleado y detalle paginado: al navegador solo viaja lo visible
+    st.markdown("### Resultados por Empleado")
+    st.dataframe(resumir_por_empleado(df_result), use_container_width=True, hide_index=True)
+    
+    if not df_result.empty and st.toggle("Ver detalle por registro", key="detalle_visible"):
+        mostrar_detalle_paginado(df_result)
+    
+    if totales_sucursal is not None:
+        st.markdown("### Totales por Sucursal")
+        st.dataframe(totales_sucursal, use_container_width=True, hide_index=True)
 
     # Resumen visual final con métricas mejoradas
     st.markdown("### 📈 Resumen General")
@@ -178,22 +971,441 @@ def mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora=No
         </div>
         """, unsafe_allow_html=True)
 
-    # Descargar Excel final
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df_result.to_excel(writer, index=False)
-    
     # Generar nombre del archivo dinámico
     if nombre_archivo:
         # Limpiar nombre del archivo (remover extensión .pdf si existe)
         nombre_base = nombre_archivo.replace('.pdf', '').replace('.PDF', '')
-        nombre_excel = f"{nombre_base}_calculado.xlsx"
+        nombre_base = f"{nombre_base}_calculado"
     else:
-        nombre_excel = "sueldos_calculados.xlsx"
+        nombre_base = "sueldos_calculados"
+    
+    # Descargar reporte final: cada formato se genera solo cuando se pide y se
+    # reutiliza mientras no cambien los resultados
+    formato = st.radio("Formato del reporte:", list(FORMATOS_EXPORTACION), horizontal=True, key="formato_exportacion")
+    extension, mime = FORMATOS_EXPORTACION[formato]
+    
+    solicitud = (huella_dataframe(df_result), formato)
+    if st.session_state.get("exportacion_solicitada") != solicitud:
+        if not st.button(f" Preparar Reporte Final en {formato}"):
+            return
+        st.session_state.exportacion_solicitada = solicitud
     
     st.download_button(
-        " Descargar Reporte Final en Excel",
-        data=output.getvalue(),
-        file_name=nombre_excel,
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        f" Descargar Reporte Final en {formato}",
+        data=_exportacion_en_cache(*solicitud, valor_por_hora, df_result, tipadas),
+        file_name=f"{nombre_base}.{extension}",
+        mime=mime
+    )
+
+@st.cache_data(show_spinner="Generando reporte...", max_entries=8)
+def _exportacion_en_cache(huella, formato, valor_por_hora, _df_result, _tipadas=None):
+    """Reporte de unos resultados en un formato, cacheado por su huella"""
+    return generar_exportacion(_df_result, formato, valor_por_hora, _tipadas)
+
+def generar_exportacion(df_result, formato, valor_por_hora=None, tipadas=None):
+    """
+    Genera el reporte de los resultados en el formato pedido
+    
+    Args:
+        df_result (DataFrame): Resultados a exportar
+        formato (str): Clave de FORMATOS_EXPORTACION
+        valor_por_hora (float): Valor por hora usado (se muestra en los recibos)
+        tipadas (list): Valores numéricos de los resultados (ver resultados_tipados)
+        
+    Returns:
+        bytes: Contenido del archivo
+    """
+    if formato == "Excel":
+        return generar_excel(df_result)
+    
+    if formato == "Recibos HTML (zip)":
+        from recibos import generar_recibos
+        with medir_etapa("datos.generar_recibos", filas=len(df_result)):
+            return generar_recibos(df_result, valor_por_hora)
+    
+    exportadores = {"CSV": exportar_csv, "Parquet": exportar_parquet, "JSON Lines": exportar_jsonl}
+    output = io.BytesIO()
+    with medir_etapa(f"datos.exportar_{FORMATOS_EXPORTACION[formato][0]}", filas=len(df_result)):
+        exportadores[formato](resultados_tipados(df_result, tipadas), output)
+    return output.getvalue()
+
+def resultados_tipados(df_result, tipadas=None):
+    """
+    Convierte los resultados a columnas tipadas para otros sistemas: fechas
+    como fecha, horas y duraciones en minutos enteros, montos en centavos
+    enteros y el feriado como booleano
+    
+    Con los valores numéricos del motor de cálculo (tipadas) las columnas se
+    arman a partir de ellos; sin ellos (por ejemplo, resultados de un período
+    guardado) se interpretan los textos "h:mm" y "Sí"/"No" de df_result.
+    
+    Args:
+        df_result (DataFrame): Resultados tal como se muestran
+        tipadas (list): Valores de cada resultado (CAMPOS_TIPADOS), como los
+            devuelve calcular_lote (opcional)
+        
+    Returns:
+        DataFrame: Resultados tipados
+    """
+    if df_result.empty:
+        return pd.DataFrame()
+    
+    tipado = pd.DataFrame(index=df_result.index)
+    if "Sucursal" in df_result.columns:
+        tipado["sucursal"] = df_result["Sucursal"].astype("string")
+    tipado["empleado"] = df_result["Empleado"].astype("string")
+    
+    if tipadas is not None:
+        valores = pd.DataFrame.from_records(tipadas, columns=CAMPOS_TIPADOS, index=df_result.index)
+        tipado["fecha"] = pd.to_datetime(valores["fecha"], unit="ns").astype("datetime64[us]")
+        tipado["feriado"] = valores["feriado"].astype(bool)
+        for nombre in COLUMNAS_MINUTOS.values():
+            tipado[nombre] = valores[nombre].astype("Int32")
+        for nombre in COLUMNAS_CENTAVOS.values():
+            tipado[nombre] = valores[nombre].astype("Int64")
+        return tipado.reset_index(drop=True)
+    
+    tipado["fecha"] = pd.to_datetime(df_result["Fecha"], format="%Y-%m-%d")
+    tipado["feriado"] = df_result["Feriado"] == "Sí"
+    
+    for columna, nombre in COLUMNAS_MINUTOS.items():
+        tipado[nombre] = _minutos_desde_horas(df_result[columna]).astype("Int32")
+    for columna, nombre in COLUMNAS_CENTAVOS.items():
+        tipado[nombre] = (pd.to_numeric(df_result[columna], errors="coerce") * 100).round().astype("Int64")
+    
+    return tipado.reset_index(drop=True)
+
+def resultados_desde_tipados(tipado):
+    """
+    Inversa de resultados_tipados: vuelve a armar los resultados tal como se
+    muestran (horas como texto, montos en pesos y feriado como "Sí"/"No")
+
+    Args:
+        tipado (DataFrame): Resultados tipados
+
+    Returns:
+        DataFrame: Resultados en el formato de mostrar_resultados
+    """
+    if tipado.empty:
+        return pd.DataFrame()
+
+    df_result = pd.DataFrame(index=tipado.index)
+    if "sucursal" in tipado.columns:
+        df_result["Sucursal"] = tipado["sucursal"].astype(object)
+    df_result["Empleado"] = tipado["empleado"].astype(object)
+    df_result["Fecha"] = pd.to_datetime(tipado["fecha"]).dt.strftime("%Y-%m-%d")
+
+    for columna in ("Entrada", "Salida"):
+        df_result[columna] = _horas_desde_minutos(tipado[COLUMNAS_MINUTOS[columna]], ancho=2)
+    df_result["Feriado"] = tipado["feriado"].map({True: "Sí", False: "No"})
+    for columna in COLUMNAS_HORAS_RESUMEN:
+        df_result[columna] = _horas_desde_minutos(tipado[COLUMNAS_MINUTOS[columna]])
+    for columna, nombre in COLUMNAS_CENTAVOS.items():
+        df_result[columna] = tipado[nombre].astype("float64") / 100
+
+    return df_result
+
+def _horas_desde_minutos(serie, ancho=1):
+    """
+    Minutos enteros como texto "h:mm" (con ancho=2, "hh:mm"), formateando una
+    sola vez cada valor distinto
+    """
+    codigos, unicos = pd.factorize(serie)
+    textos = [f"{int(minutos) // 60:0{ancho}d}:{int(minutos) % 60:02d}" for minutos in unicos]
+    # El código -1 (valor faltante) toma el último elemento: None
+    return pd.Series(textos + [None], dtype=object).take(codigos).to_numpy()
+
+def exportar_csv(df_tipado, destino, tamano_lote=TAMANO_LOTE):
+    """Escribe resultados tipados en CSV (UTF-8) por lotes en un archivo binario"""
+    if df_tipado.empty:
+        df_tipado.to_csv(destino, index=False, encoding="utf-8")
+    for inicio in range(0, len(df_tipado), tamano_lote):
+        df_tipado.iloc[inicio:inicio + tamano_lote].to_csv(
+            destino, header=inicio == 0, index=False, date_format="%Y-%m-%d", encoding="utf-8"
+        )
+
+def exportar_jsonl(df_tipado, destino, tamano_lote=TAMANO_LOTE):
+    """Escribe resultados tipados en JSON Lines (un objeto por registro) por lotes en un archivo binario"""
+    for inicio in range(0, len(df_tipado), tamano_lote):
+        lote = df_tipado.iloc[inicio:inicio + tamano_lote]
+        if "fecha" in lote.columns:
+            lote = lote.assign(fecha=lote["fecha"].dt.strftime("%Y-%m-%d"))
+        texto = lote.to_json(orient="records", lines=True, force_ascii=False)
+        destino.write(texto.encode("utf-8"))
+        if not texto.endswith("\n"):
+            destino.write(b"\n")
+
+def exportar_parquet(df_tipado, destino):
+    """Escribe resultados tipados en Parquet, con la fecha como date32"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("pyarrow no está instalado. No se pueden generar archivos Parquet.")
+    
+    tabla = pa.Table.from_pandas(df_tipado, preserve_index=False)
+    if "fecha" in tabla.column_names:
+        posicion = tabla.column_names.index("fecha")
+        tabla = tabla.set_column(posicion, "fecha", tabla.column("fecha").cast(pa.date32()))
+    pq.write_table(tabla, destino)
+
+def generar_excel(df_result):
+    """
+    Genera el libro de nómina: la hoja de detalle y las hojas de resumen por
+    empleado, por fecha y de feriados, en una sola pasada con un escritor de
+    memoria constante (las filas se escriben en orden y no se mantiene la hoja
+    en memoria). Usa xlsxwriter si está instalado y, si no, openpyxl en modo
+    de solo escritura.
+    
+    Args:
+        df_result (DataFrame): Resultados a exportar
+        
+    Returns:
+        bytes: Contenido del archivo .xlsx
+    """
+    output = io.BytesIO()
+    
+    with medir_etapa("datos.exportar_excel", filas=len(df_result)):
+        hojas = {"Detalle": df_result, **resumenes_nomina(df_result)}
+        try:
+            _escribir_excel_xlsxwriter(hojas, output)
+        except ImportError:
+            _escribir_excel_openpyxl(hojas, output)
+    
+    return output.getvalue()
+
+def resumenes_nomina(df_result):
+    """
+    Calcula las hojas de resumen del libro de nómina con un solo groupby por
+    (empleado, fecha, feriado) sobre las columnas de resultados; los resúmenes
+    por empleado, por fecha y de feriados se obtienen agregando ese resultado.
+    El bruto es el sueldo final (neto) más los descuentos.
+    
+    Args:
+        df_result (DataFrame): Detalle de resultados
+        
+    Returns:
+        dict: Nombre de hoja -> DataFrame ("Por Empleado", "Por Fecha", "Feriados")
+    """
+    if df_result.empty:
+        return {}
+    
+    empleado = [columna for columna in ("Sucursal", "Empleado") if columna in df_result.columns]
+    montos = pd.DataFrame({
+        columna: pd.to_numeric(df_result[columna], errors="coerce").fillna(0)
+        for columna in COLUMNAS_DESCUENTO + ["Sueldo Final"]
+    })
+    datos = df_result[empleado + ["Fecha", "Feriado"]].assign(
+        Registros=1,
+        **{f"min_{columna}": _minutos_desde_horas(df_result[columna]).fillna(0) for columna in COLUMNAS_HORAS_RESUMEN},
+        **montos,
     )
+    datos["Sueldo Bruto"] = montos["Sueldo Final"] + montos[COLUMNAS_DESCUENTO].sum(axis=1)
+    
+    base = datos.groupby(empleado + ["Fecha", "Feriado"], sort=True).sum().reset_index()
+    
+    return {
+        "Por Empleado": _formatear_resumen(base.groupby(empleado, sort=True).sum(numeric_only=True).reset_index()),
+        "Por Fecha": _formatear_resumen(base.groupby(["Fecha", "Feriado"], sort=True).sum(numeric_only=True).reset_index()),
+        "Feriados": _formatear_resumen(base[base["Feriado"] == "Sí"].drop(columns="Feriado")),
+    }
+
+def _formatear_resumen(resumen):
+    """Pasa los minutos a "h:mm", redondea los montos y ordena las columnas de un resumen"""
+    for columna in COLUMNAS_HORAS_RESUMEN:
+        resumen[columna] = (resumen.pop(f"min_{columna}") / 60).map(horas_a_horasminutos)
+    montos = COLUMNAS_DESCUENTO + ["Sueldo Bruto", "Sueldo Final"]
+    resumen[montos] = resumen[montos].round(2)
+    
+    claves = [columna for columna in resumen.columns if columna not in COLUMNAS_HORAS_RESUMEN + montos + ["Registros"]]
+    return resumen[claves + ["Registros"] + COLUMNAS_HORAS_RESUMEN + ["Sueldo Bruto"] + COLUMNAS_DESCUENTO + ["Sueldo Final"]]
+
+def _filas_para_excel(df, tamano_lote=TAMANO_LOTE):
+    """Recorre las filas en lotes, con celdas vacías (None) en lugar de NaN"""
+    for inicio in range(0, len(df), tamano_lote):
+        lote = df.iloc[inicio:inicio + tamano_lote].astype(object)
+        yield from lote.where(lote.notna(), None).itertuples(index=False, name=None)
+
+def _escribir_excel_xlsxwriter(hojas, output):
+    import xlsxwriter
+    
+    libro = xlsxwriter.Workbook(output, {"constant_memory": True})
+    negrita = libro.add_format({"bold": True})
+    
+    # Con constant_memory cada hoja se escribe completa y en orden antes de la siguiente
+    for nombre, df in hojas.items():
+        hoja = libro.add_worksheet(nombre)
+        hoja.write_row(0, 0, [str(columna) for columna in df.columns], negrita)
+        for fila, valores in enumerate(_filas_para_excel(df), start=1):
+            hoja.write_row(fila, 0, valores)
+    
+    libro.close()
+
+def _escribir_excel_openpyxl(hojas, output):
+    from openpyxl import Workbook
+    
+    libro = Workbook(write_only=True)
+    
+    for nombre, df in hojas.items():
+        hoja = libro.create_sheet(nombre)
+        hoja.append([str(columna) for columna in df.columns])
+        for valores in _filas_para_excel(df):
+            hoja.append(valores)
+    
+    libro.save(output)
+
+def resumir_por_empleado(df_result):
+    """
+    Agrega los resultados por empleado (y por sucursal, si la hay)
+    
+    Args:
+        df_result (DataFrame): Detalle de resultados
+        
+    Returns:
+        DataFrame: Registros, horas trabajadas y sueldo final por empleado
+    """
+    if df_result.empty:
+        return df_result
+    
+    claves = [columna for columna in ("Sucursal", "Empleado") if columna in df_result.columns]
+    resumen = (
+        df_result.assign(minutos=_minutos_desde_horas(df_result["Horas Trabajadas (h:mm)"]))
+        .groupby(claves, sort=True)
+        .agg(Registros=("Fecha", "size"), minutos=("minutos", "sum"), sueldo=("Sueldo Final", "sum"))
+        .reset_index()
+    )
+    resumen["Horas Trabajadas (h:mm)"] = (resumen["minutos"] / 60).map(horas_a_horasminutos)
+    resumen["Sueldo Final"] = resumen["sueldo"].round(2)
+    return resumen.drop(columns=["minutos", "sueldo"])
+
+def mostrar_detalle_paginado(df_result):
+    """
+    Muestra el detalle de resultados con filtro, orden y paginación hechos en
+    el servidor; solo la página visible se envía al navegador
+    
+    Args:
+        df_result (DataFrame): Detalle de resultados
+    """
+    col1, col2, col3, col4 = st.columns([2, 1, 2, 1])
+    with col1:
+        empleados = st.multiselect(
+            "Empleados:", sorted(df_result["Empleado"].astype(str).unique()),
+            key="detalle_empleados", placeholder="Todos"
+        )
+    with col2:
+        feriado = st.selectbox("Feriado:", ["Todos", "Sí", "No"], key="detalle_feriado")
+    with col3:
+        columna_orden = st.selectbox("Ordenar por:", list(df_result.columns), key="detalle_orden")
+    with col4:
+        descendente = st.selectbox("Sentido:", ["Ascendente", "Descendente"], key="detalle_sentido") == "Descendente"
+    
+    filtro = pd.Series(True, index=df_result.index)
+    if empleados:
+        filtro &= df_result["Empleado"].astype(str).isin(empleados)
+    if feriado != "Todos":
+        filtro &= df_result["Feriado"] == feriado
+    detalle = df_result[filtro]
+    
+    detalle = detalle.sort_values(
+        columna_orden,
+        ascending=not descendente,
+        kind="stable",
+        # Las horas "h:mm" se ordenan por duración, no como texto
+        key=_minutos_desde_horas if "(h:mm)" in columna_orden or columna_orden.startswith("Horas") else None,
+    )
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        filas_por_pagina = st.selectbox("Filas por página:", FILAS_POR_PAGINA, key="detalle_filas")
+    paginas = max(1, -(-len(detalle) // filas_por_pagina))
+    # Un filtro más estricto puede dejar la página elegida fuera de rango
+    if st.session_state.get("detalle_pagina", 1) > paginas:
+        st.session_state.detalle_pagina = paginas
+    with col2:
+        pagina = st.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, step=1, key="detalle_pagina")
+    
+    inicio = (pagina - 1) * filas_por_pagina
+    st.dataframe(detalle.iloc[inicio:inicio + filas_por_pagina], use_container_width=True)
+    st.caption(f"Registros {min(inicio + 1, len(detalle))}-{min(inicio + filas_por_pagina, len(detalle))} de {len(detalle)}")
+
+def _minutos_desde_horas(serie):
+    """Convierte duraciones "h:mm" a minutos (de forma vectorial)"""
+    # Hay pocas duraciones distintas: se convierten solo los valores únicos
+    codigos, unicos = pd.factorize(serie.astype(str))
+    partes = pd.Series(unicos).str.split(":", n=1, expand=True).reindex(columns=[0, 1])
+    minutos = pd.to_numeric(partes[0], errors="coerce") * 60 + pd.to_numeric(partes[1], errors="coerce")
+    # Los valores faltantes tienen código -1 y quedan como NaN
+    return pd.Series(minutos.reindex(codigos).to_numpy(), index=serie.index, name=serie.name)
+
+def mostrar_resultados_por_lotes(resumen, ruta_detalle, nombre_archivo=None):
+    """
+    Muestra los resultados del procesamiento por lotes y ofrece la descarga del detalle
+    
+    Args:
+        resumen (dict): Resultado de procesar_excel_por_lotes
+        ruta_detalle (str): Ruta del CSV con el detalle de cada fila
+        nombre_archivo (str): Nombre base para el archivo de descarga (opcional)
+    """
+    st.markdown("""
+    <div class="custom-alert alert-success">
+        <h3> Cálculo por lotes completado</h3>
+        <p>El detalle de cada registro está disponible para descargar en CSV.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if resumen["filas_excluidas"] or resumen["filas_incompletas"]:
+        st.markdown(f"""
+        <div class="custom-alert alert-info">
+            ℹ️ <strong>{resumen["filas_excluidas"]} registro(s) sin asistencia y {resumen["filas_incompletas"]} incompleto(s) excluidos</strong><br>
+            En el modo por lotes los registros con entrada o salida faltante no se corrigen manualmente.
+        </div>
+        """, unsafe_allow_html=True)
+    
+    for error in resumen["errores"]:
+        st.error(error)
+    if resumen["cantidad_errores"] > len(resumen["errores"]):
+        st.error(f"... y {resumen['cantidad_errores'] - len(resumen['errores'])} error(es) más")
+    
+    st.markdown("### Resumen por Empleado")
+    st.dataframe(resumen["resumen_empleados"], use_container_width=True)
+    
+    st.markdown("### 📈 Resumen General")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-label">Total Registros</div>
+            <div class="metric-value">{resumen["filas_calculadas"]}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-label">Total Horas</div>
+            <div class="metric-value">{horas_a_horasminutos(resumen["total_horas"])}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-label">Total Sueldos</div>
+            <div class="metric-value">${round(resumen["total_sueldos"], 2):,.0f}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if nombre_archivo:
+        nombre_base = nombre_archivo.rsplit('.', 1)[0]
+        nombre_csv = f"{nombre_base}_calculado.csv"
+    else:
+        nombre_csv = "sueldos_calculados.csv"
+    
+    with open(ruta_detalle, "rb") as f:
+        st.download_button(
+            " Descargar Detalle en CSV",
+            data=f,
+            file_name=nombre_csv,
+            mime="text/csv"
+        )
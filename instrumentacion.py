@@ -0,0 +1,253 @@
+"""
+Módulo de instrumentación de rendimiento
+Mide tiempo real, tiempo de CPU y volumen procesado por cada etapa del proceso,
+y opcionalmente picos de memoria y sitios de asignación
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+# Traza activa en el contexto actual (None = instrumentación desactivada)
+_traza_activa: ContextVar = ContextVar("traza_activa", default=None)
+_nivel_actual: ContextVar = ContextVar("nivel_actual", default=0)
+_marco_memoria: ContextVar = ContextVar("marco_memoria", default=None)
+
+# Sitios de asignación reportados por etapa en el perfil de memoria
+SITIOS_POR_ETAPA = 5
+
+# Perfiles de memoria en curso en todo el proceso (de cualquier sesión o hilo).
+# tracemalloc es global: si lo inició este módulo, se detiene solo cuando
+# termina el último perfil activo
+_perfiles_activos = 0
+_tracemalloc_propio = False
+_lock_memoria = threading.Lock()
+
+class Traza:
+    """
+    Registro de las etapas medidas durante una ejecución
+
+    Con memoria=True cada etapa registra además el pico de memoria (tracemalloc),
+    la variación de RSS del proceso y los principales sitios de asignación.
+    Es más lento y, como tracemalloc es global al proceso, con varias sesiones
+    simultáneas los valores incluyen las asignaciones de las demás.
+    """
+
+    def __init__(self, memoria: bool = False):
+        self.memoria = memoria
+        self.creada = datetime.now()
+        self.inicio = time.perf_counter()
+        self.etapas: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa: Dict):
+        with self._lock:
+            self.etapas.append(etapa)
+
+    def a_dict(self) -> Dict:
+        with self._lock:
+            etapas = sorted(self.etapas, key=lambda etapa: etapa["inicio_s"])
+        return {
+            "creada": self.creada.isoformat(timespec="seconds"),
+            "memoria": self.memoria,
+            "etapas": etapas,
+        }
+
+    def a_json(self) -> str:
+        """Exporta la traza como JSON para comparaciones fuera de línea"""
+        return json.dumps(self.a_dict(), ensure_ascii=False, indent=2)
+
+class Medicion:
+    """Permite a la etapa medida informar contadores (filas, páginas, ...)"""
+
+    def __init__(self):
+        self.contadores: Dict[str, int] = {}
+
+    def contar(self, **contadores: int):
+        self.contadores.update(contadores)
+
+def obtener_traza() -> Optional[Traza]:
+    """Devuelve la traza activa en el contexto actual, si hay una"""
+    return _traza_activa.get()
+
+def establecer_traza(traza: Optional[Traza]):
+    """Activa (o desactiva con None) una traza para el resto de la ejecución actual"""
+    _traza_activa.set(traza)
+
+@contextmanager
+def activar_traza(traza: Traza):
+    """Activa una traza para el código ejecutado dentro del bloque"""
+    token = _traza_activa.set(traza)
+    try:
+        yield traza
+    finally:
+        _traza_activa.reset(token)
+
+@contextmanager
+def medir_etapa(nombre: str, **contadores: int):
+    """
+    Mide una etapa si hay una traza activa; si no, no hace nada
+
+    Uso:
+        with medir_etapa("pdf.extraer_texto") as medicion:
+            paginas = extraer(...)
+            medicion.contar(paginas=len(paginas))
+
+    Args:
+        nombre: Nombre de la etapa ("modulo.etapa")
+        contadores: Contadores conocidos de antemano
+    """
+    medicion = Medicion()
+    medicion.contar(**contadores)
+    traza = _traza_activa.get()
+
+    if traza is None:
+        yield medicion
+        return
+
+    nivel = _nivel_actual.get()
+    token = _nivel_actual.set(nivel + 1)
+    perfil = _PerfilMemoria() if traza.memoria else None
+    inicio = time.perf_counter()
+    inicio_cpu = time.thread_time()
+    try:
+        yield medicion
+    finally:
+        segundos = time.perf_counter() - inicio
+        cpu_segundos = time.thread_time() - inicio_cpu
+        _nivel_actual.reset(token)
+
+        etapa = {
+            "nombre": nombre,
+            "nivel": nivel,
+            "hilo": threading.current_thread().name,
+            "inicio_s": round(inicio - traza.inicio, 6),
+            "segundos": round(segundos, 6),
+            "cpu_segundos": round(cpu_segundos, 6),
+            "contadores": dict(medicion.contadores),
+            "por_segundo": {
+                clave: round(valor / segundos, 1)
+                for clave, valor in medicion.contadores.items() if segundos > 0
+            },
+        }
+        if perfil is not None:
+            etapa["memoria"] = perfil.terminar()
+        traza.registrar(etapa)
+
+def medido(nombre: str, contar: Optional[Callable] = None):
+    """
+    Decorador que mide cada llamada a la función como una etapa
+
+    Args:
+        nombre: Nombre de la etapa
+        contar: Función opcional resultado -> dict de contadores
+    """
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir_etapa(nombre) as medicion:
+                resultado = funcion(*args, **kwargs)
+                if contar is not None and _traza_activa.get() is not None:
+                    medicion.contar(**contar(resultado))
+                return resultado
+        return envoltura
+    return decorador
+
+class _PerfilMemoria:
+    """
+    Mide la memoria de una etapa. Las etapas anidadas se encadenan para que
+    reiniciar el pico de tracemalloc en una etapa interna no pierda el pico
+    de la etapa que la contiene.
+    """
+
+    def __init__(self):
+        global _perfiles_activos, _tracemalloc_propio
+
+        with _lock_memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_propio = True
+            _perfiles_activos += 1
+
+        self.padre = _marco_memoria.get()
+        actual, pico = tracemalloc.get_traced_memory()
+        if self.padre is not None:
+            self.padre.pico = max(self.padre.pico, pico)
+        tracemalloc.reset_peak()
+
+        self.base = actual
+        self.pico = actual
+        self.rss_inicio = _rss_actual()
+        self.instantanea = _tomar_instantanea()
+        self._token = _marco_memoria.set(self)
+
+    def terminar(self) -> Dict:
+        try:
+            return self._resumen()
+        finally:
+            _liberar_tracemalloc()
+
+    def _resumen(self) -> Dict:
+        actual, pico = tracemalloc.get_traced_memory()
+        self.pico = max(self.pico, pico)
+        _marco_memoria.reset(self._token)
+        if self.padre is not None:
+            self.padre.pico = max(self.padre.pico, self.pico)
+
+        rss_fin = _rss_actual()
+        diferencias = _tomar_instantanea().compare_to(self.instantanea, "lineno")
+        sitios = [
+            {
+                "sitio": f"{diferencia.traceback[0].filename}:{diferencia.traceback[0].lineno}",
+                "kb": round(diferencia.size_diff / 1024, 1),
+                "bloques": diferencia.count_diff,
+            }
+            for diferencia in diferencias[:SITIOS_POR_ETAPA] if diferencia.size_diff > 0
+        ]
+
+        return {
+            "pico_mb": _a_mb(self.pico),
+            "pico_etapa_mb": _a_mb(self.pico - self.base),
+            "neto_mb": _a_mb(actual - self.base),
+            "rss_delta_mb": _a_mb(rss_fin - self.rss_inicio) if rss_fin is not None and self.rss_inicio is not None else None,
+            "sitios": sitios,
+        }
+
+def _liberar_tracemalloc():
+    """Descuenta un perfil activo y detiene tracemalloc si era el último y lo inició este módulo"""
+    global _perfiles_activos, _tracemalloc_propio
+
+    with _lock_memoria:
+        _perfiles_activos -= 1
+        if _perfiles_activos == 0 and _tracemalloc_propio:
+            tracemalloc.stop()
+            _tracemalloc_propio = False
+
+def _tomar_instantanea():
+    """Instantánea de tracemalloc sin las asignaciones del propio módulo de medición"""
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+def _rss_actual() -> Optional[int]:
+    """Memoria residente del proceso en bytes (psutil si está instalado, si no /proc)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _a_mb(cantidad_bytes: int) -> float:
+    return round(cantidad_bytes / (1024 * 1024), 2)
@@ -183,3 +183,112 @@ def mostrar_progreso_con_porcentaje(porcentaje, texto="Procesando"):
         </div>
     </div>
     """, unsafe_allow_html=True)
+
+def iniciar_tarea_en_sesion(nombre, clave, funcion, *args, **kwargs):
+    """
+    Devuelve la tarea en segundo plano guardada en la sesión para esta clave,
+    o inicia una nueva si la clave cambió. Así la tarea sobrevive a los
+    reruns de Streamlit y su resultado se reutiliza.
+    
+    Args:
+        nombre: Nombre de la tarea en st.session_state
+        clave: Identifica los datos de entrada (por ejemplo, los archivos subidos)
+        funcion: Función a ejecutar; recibe el argumento progreso
+        
+    Returns:
+        TareaEnSegundoPlano: Tarea en curso o terminada
+    """
+    from tareas import TareaEnSegundoPlano
+    
+    guardada = st.session_state.get(nombre)
+    if guardada and guardada[0] == clave:
+        return guardada[1]
+    
+    if guardada:
+        guardada[1].cancelar()
+    
+    tarea = TareaEnSegundoPlano(funcion, *args, **kwargs).iniciar()
+    st.session_state[nombre] = (clave, tarea)
+    return tarea
+
+def resultado_en_sesion(nombre, clave, funcion, *args, **kwargs):
+    """
+    Devuelve el resultado guardado en la sesión para esta clave, o ejecuta la
+    función y lo guarda si la clave cambió. Para pasos rápidos que no
+    justifican una tarea en segundo plano.
+    
+    Args:
+        nombre: Nombre del resultado en st.session_state
+        clave: Identifica los datos de entrada
+        funcion: Función a ejecutar
+        
+    Returns:
+        Resultado de la función
+    """
+    guardado = st.session_state.get(nombre)
+    if guardado and guardado[0] == clave:
+        return guardado[1]
+    
+    resultado = funcion(*args, **kwargs)
+    st.session_state[nombre] = (clave, resultado)
+    return resultado
+
+def clave_archivo(archivo):
+    """
+    Identifica un archivo subido para reutilizar lo calculado a partir de él.
+    El nombre y el tamaño no alcanzan: otro archivo con el mismo nombre y
+    tamaño devolvería el resultado anterior.
+    
+    Args:
+        archivo: Archivo subido
+        
+    Returns:
+        str: file_id de Streamlit (distinto en cada subida) o, si el archivo
+        no lo tiene, la huella de su contenido
+    """
+    file_id = getattr(archivo, "file_id", None)
+    if file_id:
+        return file_id
+    
+    from almacen import huella_contenido
+    return huella_contenido(archivo.getvalue())
+
+def mostrar_progreso_tarea(tarea, nombre, texto="Procesando"):
+    """
+    Muestra el avance real de una tarea en segundo plano (porcentaje, etapa y
+    tiempo restante) con un botón para cancelarla sin cerrar la sesión.
+    Detiene el script si la tarea se canceló o falló.
+    
+    Args:
+        tarea: TareaEnSegundoPlano en curso
+        nombre: Nombre de la tarea en st.session_state
+        texto: Texto a mostrar
+    """
+    if not tarea.terminada:
+        progreso_placeholder = st.empty()
+        boton_placeholder = st.empty()
+        
+        # Un clic provoca un rerun: la tarea sigue viva en la sesión y se cancela aquí
+        if boton_placeholder.button("Cancelar", key=f"cancelar_{nombre}"):
+            tarea.cancelar()
+        
+        while not tarea.terminada:
+            eta = tarea.eta_segundos
+            detalle = f" · quedan ~{int(eta)} s" if eta is not None else ""
+            with progreso_placeholder.container():
+                mostrar_progreso_con_porcentaje(tarea.porcentaje, f"{texto}: {tarea.etapa}{detalle}")
+            time.sleep(0.25)
+        
+        progreso_placeholder.empty()
+        boton_placeholder.empty()
+    
+    if tarea.cancelada:
+        st.warning(" Proceso cancelado.")
+        if st.button("Reintentar", key=f"reintentar_{nombre}"):
+            del st.session_state[nombre]
+            st.rerun()
+        st.stop()
+    
+    if tarea.error:
+        st.error(f" Error en el proceso: {str(tarea.error)}")
+        st.stop()
@@ -2,33 +2,46 @@
 Aplicación principal para cálculo de sueldos
 Versión modularizada para mejor organización del código
 """
+import os
+import tempfile
 import streamlit as st
-import pandas as pd
+# Solo lo que necesita la primera pantalla: pandas y los módulos de procesamiento
+# se importan al subir un archivo y se precalientan en segundo plano (ver arranque.py)
+from arranque import precalentar_modulos
 from ui_components import (
     mostrar_descarga_plantilla, 
     mostrar_input_valor_hora, 
     configurar_feriados, 
-    mostrar_subida_archivo
-)
-from data_processor import (
-    validar_archivo_excel, 
-    procesar_datos_excel, 
-    mostrar_resultados
+    mostrar_subida_archivo,
+    mostrar_panel_diagnostico,
+    mostrar_periodos_guardados,
+    fragmento,
+    publicar_entradas
 )
+from instrumentacion import Traza, establecer_traza
 from loading_components import (
     mostrar_loading_excel,
     mostrar_loading_pdf,
     mostrar_loading_calculos,
     mostrar_loading_validacion,
-    loading_context
+    loading_context,
+    iniciar_tarea_en_sesion,
+    resultado_en_sesion,
+    clave_archivo,
+    mostrar_progreso_tarea
 )
 
 # Función para cargar CSS
+@st.cache_resource(show_spinner=False)
+def _leer_css() -> str:
+    """Lee styles.css una sola vez por proceso y lo comparte entre sesiones"""
+    with open("styles.css", encoding='utf-8') as f:
+        return f.read()
+
 def load_css():
     """Carga los estilos CSS personalizados"""
     try:
-        with open("styles.css", encoding='utf-8') as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        st.markdown(f"<style>{_leer_css()}</style>", unsafe_allow_html=True)
     except FileNotFoundError:
         st.warning(" Archivo de estilos no encontrado. Usando estilos por defecto.")
     except UnicodeDecodeError:
@@ -77,6 +90,199 @@ if st.session_state.exit_app:
     """, unsafe_allow_html=True)
     st.stop()
 
+# Secciones de la página como fragmentos: interactuar con sus widgets solo
+# vuelve a ejecutar la sección. Los valores que usan las demás secciones se
+# publican en session_state y, si cambian, se vuelve a ejecutar la página completa
+@fragmento
+def seccion_configuracion():
+    """Valor por hora, diagnóstico de rendimiento y feriados"""
+    # Sección de configuración
+    st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
+    st.markdown('<div class="section-header"> Configuración</div>', unsafe_allow_html=True)
+    
+    # Input para valor por hora
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        valor_por_hora = mostrar_input_valor_hora()
+    with col2:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-label">Valor por Hora</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">${valor_por_hora:,.0f}</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Diagnóstico opcional: medir el tiempo de cada etapa de esta ejecución
+    diagnostico_activo = st.checkbox(
+        "Mostrar diagnóstico de rendimiento",
+        help="Mide el tiempo y el volumen procesado en cada etapa y permite descargar la traza en JSON"
+    )
+    perfil_memoria = diagnostico_activo and st.checkbox(
+        "Perfilar memoria por etapa (más lento)",
+        help="Registra picos de memoria, variación de RSS y los principales sitios de asignación de cada etapa"
+    )
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Sección de feriados
+    st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
+    st.markdown('<div class="section-header"> Configuración de Feriados</div>', unsafe_allow_html=True)
+    opcion_feriados, dias_feriados, cantidad_feriados = configurar_feriados()
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    publicar_entradas("configuracion", {
+        "valor_por_hora": valor_por_hora,
+        "diagnostico_activo": diagnostico_activo,
+        "perfil_memoria": perfil_memoria,
+        "opcion_feriados": opcion_feriados,
+        "dias_feriados": dias_feriados,
+        "cantidad_feriados": cantidad_feriados,
+    })
+
+@fragmento
+def seccion_subida():
+    """Selector de tipo de archivo y subida de archivos"""
+    st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
+    st.markdown('<div class="section-header"> Subir Archivo</div>', unsafe_allow_html=True)
+    uploaded_file, tipo_archivo = mostrar_subida_archivo()
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Los archivos se comparan con clave_archivo, como las tareas en segundo plano
+    archivos = uploaded_file if isinstance(uploaded_file, list) else [uploaded_file] if uploaded_file else []
+    publicar_entradas(
+        "subida",
+        (uploaded_file, tipo_archivo),
+        clave=(tipo_archivo, tuple(clave_archivo(archivo) for archivo in archivos))
+    )
+
+@fragmento
+def seccion_correcciones(df_incompletos, df_referencia, clave):
+    """Editor de registros incompletos: editar una hora solo vuelve a ejecutar el editor"""
+    from ui_components import mostrar_editor_registros_incompletos
+    
+    if mostrar_editor_registros_incompletos(df_incompletos, df_referencia, clave):
+        st.session_state.correcciones_confirmadas = clave
+        st.rerun()
+
+@fragmento
+def seccion_resultados(resultados, total_horas, total_sueldos, valor_por_hora, dias_feriados,
+                       nombre_archivo=None, totales_sucursal=None, tipadas=None):
+    """Resultados y descarga: la descarga no vuelve a ejecutar el cálculo"""
+    from data_processor import mostrar_resultados
+    
+    mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora, dias_feriados,
+                       nombre_archivo, totales_sucursal=totales_sucursal, tipadas=tipadas)
+
+@fragmento
+def seccion_guardar_periodo(df_marcaciones, resultados, valor_por_hora, dias_feriados, tipadas=None):
+    """Guardado del período en la base local: escribir el nombre no vuelve a ejecutar el cálculo"""
+    from ui_components import mostrar_guardar_periodo
+    
+    mostrar_guardar_periodo(df_marcaciones, resultados, valor_por_hora, dias_feriados, tipadas)
+
+def depurar_registros(df):
+    """
+    Excluye los registros sin asistencia y pide completar los incompletos.
+    Detiene el script hasta que se confirmen las correcciones.
+    
+    Args:
+        df: DataFrame con los registros leídos
+        
+    Returns:
+        DataFrame: Registros con asistencia y correcciones aplicadas
+    """
+    from data_processor import huella_dataframe
+    from pdf_processor import detectar_registros_incompletos, filtrar_registros_sin_asistencia
+    from ui_components import aplicar_correcciones_a_dataframe
+    
+    # Primero, filtrar registros sin asistencia (sin entrada ni salida = no trabajó)
+    df_con_asistencia, df_sin_asistencia = filtrar_registros_sin_asistencia(df)
+    
+    # Mostrar información de registros excluidos
+    if not df_sin_asistencia.empty:
+        st.markdown(f"""
+        <div class="custom-alert alert-info">
+            ℹ️ <strong>{len(df_sin_asistencia)} registro(s) excluido(s) automáticamente</strong><br>
+            Empleados sin entrada ni salida (día libre o falta). No se incluirán en el cálculo.
+        </div>
+        """, unsafe_allow_html=True)
+        
+        with st.expander(" Ver registros excluidos", expanded=False):
+            st.dataframe(df_sin_asistencia[['Empleado', 'Fecha']], use_container_width=True)
+    
+    # Ahora detectar registros que necesitan corrección (falta solo entrada o solo salida)
+    df_incompletos = detectar_registros_incompletos(df_con_asistencia)
+    
+    if df_incompletos.empty:
+        return df_con_asistencia
+    
+    clave_correcciones = huella_dataframe(df_incompletos)
+    if st.session_state.get("correcciones_confirmadas") != clave_correcciones:
+        # Mostrar interfaz de corrección y detener la ejecución hasta que se apliquen
+        seccion_correcciones(df_incompletos, df_con_asistencia, clave_correcciones)
+        st.warning(" Completa los datos faltantes y presiona 'Aplicar Correcciones' para continuar")
+        st.stop()
+    
+    # Las correcciones quedan en la sesión para volver a aplicarlas en los reruns siguientes
+    st.success(f"✅ {len(df_incompletos)} registro(s) corregido(s) exitosamente")
+    # df_con_asistencia ya es una copia propia: corregir en el lugar
+    return aplicar_correcciones_a_dataframe(df_con_asistencia, df_incompletos, copiar=False)
+
+def calcular_sueldos(df, valor_por_hora, dias_feriados):
+    """
+    Calcula los sueldos en segundo plano. Las filas ya calculadas en la sesión
+    con el mismo valor por hora y feriados se reutilizan: al agregar un archivo
+    o cambiar las correcciones solo se calculan las filas nuevas o corregidas.
+    La sesión conserva solo las filas del último cálculo.
+    
+    Args:
+        df: Registros con asistencia y correcciones aplicadas
+        valor_por_hora: Valor por hora
+        dias_feriados: Fechas de feriados
+        
+    Returns:
+        tuple: (resultados, total_horas, total_sueldos, tipadas)
+    """
+    from data_processor import calcular_lote_incremental, huella_dataframe
+    
+    configuracion_calculo = (valor_por_hora, tuple(sorted(dias_feriados)))
+    if st.session_state.get("filas_calculadas", (None,))[0] != configuracion_calculo:
+        st.session_state.filas_calculadas = (configuracion_calculo, {})
+    calculados = st.session_state.filas_calculadas[1]
+    
+    tarea_calculo = iniciar_tarea_en_sesion(
+        "tarea_calculo", (huella_dataframe(df), *configuracion_calculo),
+        calcular_lote_incremental, df, valor_por_hora, dias_feriados, calculados
+    )
+    mostrar_progreso_tarea(tarea_calculo, "tarea_calculo", "Calculando sueldos")
+    
+    resultados, horas_por_fila, sueldos_por_fila, errores_calculo, _, tipadas = tarea_calculo.resultado
+    for error in errores_calculo:
+        st.error(error)
+    return resultados, sum(horas_por_fila), sum(sueldos_por_fila), tipadas
+
+def calcular_por_lotes(archivo, valor_por_hora, dias_feriados):
+    """
+    Procesa un Excel por lotes escribiendo el detalle en el directorio
+    temporal de la sesión. El directorio se borra solo cuando termina la
+    sesión (o el proceso), y cada cálculo reemplaza el detalle anterior.
+    
+    Args:
+        archivo: Archivo Excel subido
+        valor_por_hora: Valor por hora
+        dias_feriados: Fechas de feriados
+        
+    Returns:
+        tuple: (resumen de procesar_excel_por_lotes, ruta del CSV de detalle)
+    """
+    from data_processor import procesar_excel_por_lotes
+    
+    if "directorio_lotes" not in st.session_state:
+        st.session_state.directorio_lotes = tempfile.TemporaryDirectory(prefix="sueldos_lotes_")
+    ruta_detalle = os.path.join(st.session_state.directorio_lotes.name, "detalle.csv")
+    
+    with open(ruta_detalle, "w", newline="", encoding="utf-8-sig") as destino:
+        resumen = procesar_excel_por_lotes(archivo, destino, valor_por_hora, dias_feriados)
+    return resumen, ruta_detalle
+
 # Mostrar header personalizado
 show_custom_header()
 
@@ -86,40 +292,58 @@ st.markdown('<div class="section-header"> Plantilla de Excel</div>', unsafe_allo
 mostrar_descarga_plantilla()
 st.markdown('</div>', unsafe_allow_html=True)
 
-# Sección de configuración
-st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
-st.markdown('<div class="section-header"> Configuración</div>', unsafe_allow_html=True)
-
-# Input para valor por hora
-col1, col2 = st.columns([1, 1])
-with col1:
-    valor_por_hora = mostrar_input_valor_hora()
-with col2:
-    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    st.markdown(f'<div class="metric-label">Valor por Hora</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="metric-value">${valor_por_hora:,.0f}</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-
-st.markdown('</div>', unsafe_allow_html=True)
+seccion_configuracion()
+configuracion = st.session_state.configuracion
+valor_por_hora = configuracion["valor_por_hora"]
+opcion_feriados = configuracion["opcion_feriados"]
+dias_feriados = configuracion["dias_feriados"]
+cantidad_feriados = configuracion["cantidad_feriados"]
 
-# Sección de feriados
-st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
-st.markdown('<div class="section-header"> Configuración de Feriados</div>', unsafe_allow_html=True)
-opcion_feriados, dias_feriados, cantidad_feriados = configurar_feriados()
-st.markdown('</div>', unsafe_allow_html=True)
+traza = Traza(memoria=configuracion["perfil_memoria"]) if configuracion["diagnostico_activo"] else None
+establecer_traza(traza)
 
-# Sección de subida de archivo
-st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
-st.markdown('<div class="section-header"> Subir Archivo</div>', unsafe_allow_html=True)
-uploaded_file, tipo_archivo = mostrar_subida_archivo()
-st.markdown('</div>', unsafe_allow_html=True)
+seccion_subida()
+uploaded_file, tipo_archivo = st.session_state.subida
 
 # Procesamiento de datos
 if uploaded_file:
+    import pandas as pd
+    from data_processor import (
+        huella_dataframe,
+        leer_archivo_asistencia,
+        validar_archivo_excel, 
+        procesar_sucursales_en_paralelo,
+        mostrar_resultados_por_lotes
+    )
+    
     st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"> Procesamiento de Datos</div>', unsafe_allow_html=True)
     
-    if tipo_archivo == "excel":
+    # Modo por lotes: memoria constante para libros Excel muy grandes
+    modo_lotes = tipo_archivo == "excel" and uploaded_file.name.lower().endswith(".xlsx") and st.checkbox(
+        "Procesar por lotes (archivos muy grandes)",
+        help="Calcula el archivo en bloques de filas y descarga el detalle en CSV. Los registros incompletos se excluyen en lugar de corregirse."
+    )
+    
+    if modo_lotes:
+        calc_placeholder = st.empty()
+        with calc_placeholder:
+            mostrar_loading_calculos()
+        
+        try:
+            # Se reutiliza mientras no cambien el archivo ni la configuración
+            resumen_lotes, ruta_detalle = resultado_en_sesion(
+                "calculo_lotes", (clave_archivo(uploaded_file), valor_por_hora, tuple(sorted(dias_feriados))),
+                calcular_por_lotes, uploaded_file, valor_por_hora, dias_feriados
+            )
+            calc_placeholder.empty()
+            
+            mostrar_resultados_por_lotes(resumen_lotes, ruta_detalle, uploaded_file.name)
+        except Exception as e:
+            calc_placeholder.empty()
+            st.error(f" Error al procesar el archivo: {str(e)}")
+    
+    elif tipo_archivo == "excel":
         # Procesamiento tradicional de Excel
         # Mostrar loading mientras se lee el archivo
         loading_placeholder = st.empty()
@@ -127,7 +351,10 @@ if uploaded_file:
             mostrar_loading_excel()
         
         try:
-            df = pd.read_excel(uploaded_file)
+            # La lectura se reutiliza mientras no cambie el archivo
+            df = resultado_en_sesion(
+                "lectura_excel", clave_archivo(uploaded_file), leer_archivo_asistencia, uploaded_file
+            )
             loading_placeholder.empty()  # Limpiar loading
             
             # Mostrar loading de validación
@@ -139,69 +366,56 @@ if uploaded_file:
             validation_placeholder.empty()  # Limpiar loading de validación
 
             if not es_valido:
-                st.markdown(f'<div class="custom-alert alert-error">El archivo Excel no contiene las siguientes columnas necesarias: {", ".join(columnas_faltantes)}</div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="custom-alert alert-error">El archivo no contiene las siguientes columnas necesarias: {", ".join(columnas_faltantes)}</div>', unsafe_allow_html=True)
             else:
-                # NUEVA FUNCIONALIDAD: Detectar y corregir registros incompletos en Excel
-                from pdf_processor import detectar_registros_incompletos, filtrar_registros_sin_asistencia
-                from ui_components import mostrar_editor_registros_incompletos, aplicar_correcciones_a_dataframe
-                
-                # Primero, filtrar registros sin asistencia (sin entrada ni salida = no trabajó)
-                df_con_asistencia, df_sin_asistencia = filtrar_registros_sin_asistencia(df)
-                
-                # Mostrar información de registros excluidos
-                if not df_sin_asistencia.empty:
+                if "Sucursal" in df.columns:
+                    sucursales = df["Sucursal"].unique()
                     st.markdown(f"""
                     <div class="custom-alert alert-info">
-                        ℹ️ <strong>{len(df_sin_asistencia)} registro(s) excluido(s) automáticamente</strong><br>
-                        Empleados sin entrada ni salida (día libre o falta). No se incluirán en el cálculo.
+                        ℹ️ <strong>{len(sucursales)} sucursales detectadas:</strong> {", ".join(map(str, sucursales))}
                     </div>
                     """, unsafe_allow_html=True)
-                    
-                    with st.expander(" Ver registros excluidos", expanded=False):
-                        st.dataframe(df_sin_asistencia[['Empleado', 'Fecha']], use_container_width=True)
-                
-                # Ahora detectar registros que necesitan corrección (falta solo entrada o solo salida)
-                df_incompletos_excel = detectar_registros_incompletos(df_con_asistencia)
-                
-                if not df_incompletos_excel.empty:
-                    # Mostrar interfaz de corrección
-                    correcciones_aplicadas_excel = mostrar_editor_registros_incompletos(df_incompletos_excel)
-                    
-                    if correcciones_aplicadas_excel:
-                        # Aplicar correcciones al DataFrame
-                        df_con_asistencia = aplicar_correcciones_a_dataframe(df_con_asistencia, df_incompletos_excel)
-                        
-                        st.success(f"✅ {len(df_incompletos_excel)} registro(s) corregido(s) exitosamente")
-                        
-                        # Limpiar session state de correcciones
-                        if 'correcciones_horarios' in st.session_state:
-                            del st.session_state.correcciones_horarios
-                    else:
-                        # Detener ejecución hasta que se apliquen las correcciones
-                        st.warning(" Completa los datos faltantes y presiona 'Aplicar Correcciones' para continuar")
-                        st.stop()
+                if df.attrs.get("hojas_omitidas"):
+                    st.warning(f" Hojas omitidas por no tener las columnas necesarias: {', '.join(df.attrs['hojas_omitidas'])}")
                 
-                # Usar el DataFrame con asistencia para los cálculos
-                df = df_con_asistencia
+                # Excluir registros sin asistencia y corregir los incompletos
+                df = depurar_registros(df)
                 
-                # Mostrar loading de cálculos
-                calc_placeholder = st.empty()
-                with calc_placeholder:
-                    mostrar_loading_calculos()
-                
-                resultados, total_horas, total_sueldos = procesar_datos_excel(
-                    df, valor_por_hora, opcion_feriados, dias_feriados, cantidad_feriados
-                )
-                calc_placeholder.empty()  # Limpiar loading de cálculos
+                totales_sucursal = None
+                if "Sucursal" in df.columns:
+                    # Libro con una hoja por sucursal: calcular cada sucursal (en procesos si es grande).
+                    # El cálculo se reutiliza mientras no cambien los datos ni la configuración
+                    clave_calculo = (huella_dataframe(df), valor_por_hora, tuple(sorted(dias_feriados)))
+                    calc_placeholder = st.empty()
+                    with calc_placeholder:
+                        mostrar_loading_calculos()
+                    resultados, total_horas, total_sueldos, errores_calculo, totales_sucursal, tipadas = resultado_en_sesion(
+                        "calculo_sucursales", clave_calculo, procesar_sucursales_en_paralelo,
+                        df, valor_por_hora, dias_feriados
+                    )
+                    calc_placeholder.empty()  # Limpiar loading de cálculos
+                    # Los errores viajan con el resultado memorizado: se muestran en cada ejecución
+                    for error in errores_calculo:
+                        st.error(error)
+                else:
+                    resultados, total_horas, total_sueldos, tipadas = calcular_sueldos(
+                        df, valor_por_hora, dias_feriados
+                    )
                 
-                mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora, dias_feriados)
+                seccion_resultados(resultados, total_horas, total_sueldos, valor_por_hora, dias_feriados,
+                                   totales_sucursal=totales_sucursal, tipadas=tipadas)
+                seccion_guardar_periodo(df, resultados, valor_por_hora, dias_feriados, tipadas)
         except Exception as e:
             loading_placeholder.empty()
             st.error(f" Error al procesar el archivo: {str(e)}")
     
     elif tipo_archivo == "pdf":
         # Procesamiento inteligente de PDF (soporta múltiples archivos)
-        from pdf_processor import procesar_pdf_a_dataframe, validar_datos_pdf
+        from pdf_processor import (
+            combinar_marcaciones,
+            procesar_pdfs_incremental,
+            validar_datos_pdf
+        )
         
         # Verificar si uploaded_file es una lista (múltiples archivos) o un solo archivo
         archivos_pdf = uploaded_file if isinstance(uploaded_file, list) else [uploaded_file] if uploaded_file else []
@@ -209,20 +423,25 @@ if uploaded_file:
         if not archivos_pdf:
             st.markdown('<div class="custom-alert alert-warning"> No se han cargado archivos PDF.</div>', unsafe_allow_html=True)
         else:
-            # Mostrar loading de PDFs
-            pdf_loading_placeholder = st.empty()
-            with pdf_loading_placeholder:
-                mostrar_loading_pdf(len(archivos_pdf))
+            # Procesar los PDFs en segundo plano con progreso real por página y etapa;
+            # los PDFs ya procesados antes se cargan de la base local sin volver a leerlos
+            clave_pdfs = tuple(clave_archivo(archivo) for archivo in archivos_pdf)
+            tarea_pdf = iniciar_tarea_en_sesion("tarea_pdf", clave_pdfs, procesar_pdfs_incremental, archivos_pdf)
+            mostrar_progreso_tarea(tarea_pdf, "tarea_pdf", f"Procesando {len(archivos_pdf)} PDF{'s' if len(archivos_pdf) > 1 else ''}")
             
             # Lista para almacenar todos los DataFrames y nombres de archivos
             dataframes_list = []
             nombres_archivos_pdf = []
             
-            # Procesar cada PDF
-            for idx, archivo_pdf in enumerate(archivos_pdf, 1):
-                df_temp = procesar_pdf_a_dataframe(archivo_pdf)
+            # Validar cada PDF procesado
+            for idx, (archivo_pdf, df_temp) in enumerate(zip(archivos_pdf, tarea_pdf.resultado), 1):
+                # Los PDFs se procesan en otro hilo: sus advertencias y errores se muestran acá
+                for advertencia in df_temp.attrs.get('advertencias', []):
+                    st.warning(f"PDF {idx} ({archivo_pdf.name}):{advertencia}")
                 
-                if df_temp.empty:
+                if df_temp.attrs.get('error'):
+                    st.error(f" Error procesando PDF {idx} ({archivo_pdf.name}): {df_temp.attrs['error']}")
+                elif df_temp.empty:
                     st.warning(f" No se pudieron extraer datos del PDF {idx}: {archivo_pdf.name}")
                 else:
                     # Validar datos extraídos
@@ -238,28 +457,30 @@ if uploaded_file:
                         for error in errores:
                             st.markdown(f'<div class="custom-alert alert-warning">• {error}</div>', unsafe_allow_html=True)
                     else:
-                        st.success(f"✅ PDF {idx} procesado: {archivo_pdf.name} ({len(df_temp)} registros)")
+                        lineas_omitidas = df_temp.attrs.get('lineas_omitidas', 0)
+                        detalle_omitidas = f", {lineas_omitidas} líneas de encabezado/pie omitidas" if lineas_omitidas else ""
+                        estado = "cargado de la base (ya procesado)" if df_temp.attrs.get('reutilizado') else "procesado"
+                        st.success(f"✅ PDF {idx} {estado}: {archivo_pdf.name} ({len(df_temp)} registros{detalle_omitidas})")
                         dataframes_list.append(df_temp)
                         nombres_archivos_pdf.append(archivo_pdf.name)
             
-            # Limpiar loading de PDFs
-            pdf_loading_placeholder.empty()
-            
             # Combinar todos los DataFrames
             if not dataframes_list:
                 st.markdown('<div class="custom-alert alert-error">No se pudieron extraer datos de ningún PDF. Verifica que los archivos contengan información de asistencia.</div>', unsafe_allow_html=True)
             else:
-                # Concatenar todos los DataFrames
-                df_combinado = pd.concat(dataframes_list, ignore_index=True)
-                
-                # Asegurar que las fechas estén en formato datetime
-                df_combinado['Fecha'] = pd.to_datetime(df_combinado['Fecha'], errors='coerce')
-                
-                # Ordenar por Fecha primero (ascendente) y luego por Empleado
-                df_combinado = df_combinado.sort_values(['Fecha', 'Empleado'], ascending=[True, True])
-                
-                # Reiniciar el índice después de ordenar
-                df_combinado = df_combinado.reset_index(drop=True)
+                # Mezclar los PDFs en orden; solo los días que aparecen en más de un PDF
+                # se vuelven a agrupar, sin las marcaciones repetidas entre PDFs.
+                # La combinación se reutiliza en los reruns mientras no cambien los archivos
+                df_combinado, cantidad_duplicadas = resultado_en_sesion(
+                    "pdfs_combinados", (clave_pdfs, tuple(nombres_archivos_pdf)),
+                    combinar_marcaciones, dataframes_list
+                )
+                if cantidad_duplicadas:
+                    st.markdown(f"""
+                    <div class="custom-alert alert-info">
+                        ℹ️ <strong>{cantidad_duplicadas} marcación(es) repetida(s) entre PDFs descartada(s)</strong>
+                    </div>
+                    """, unsafe_allow_html=True)
                 
                 # Mostrar información de período combinado
                 fecha_minima = df_combinado['Fecha'].min()
@@ -272,58 +493,13 @@ if uploaded_file:
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # NUEVA FUNCIONALIDAD: Detectar y corregir registros incompletos
-                from pdf_processor import detectar_registros_incompletos, filtrar_registros_sin_asistencia
-                from ui_components import mostrar_editor_registros_incompletos, aplicar_correcciones_a_dataframe
-                
-                # Primero, filtrar registros sin asistencia (sin entrada ni salida = no trabajó)
-                df_con_asistencia, df_sin_asistencia = filtrar_registros_sin_asistencia(df_combinado)
-                
-                # Mostrar información de registros excluidos
-                if not df_sin_asistencia.empty:
-                    st.markdown(f"""
-                    <div class="custom-alert alert-info">
-                        ℹ️ <strong>{len(df_sin_asistencia)} registro(s) excluido(s) automáticamente</strong><br>
-                        Empleados sin entrada ni salida (día libre o falta). No se incluirán en el cálculo.
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    with st.expander(" Ver registros excluidos", expanded=False):
-                        st.dataframe(df_sin_asistencia[['Empleado', 'Fecha']], use_container_width=True)
+                # Excluir registros sin asistencia y corregir los incompletos
+                df_combinado = depurar_registros(df_combinado)
                 
-                # Ahora detectar registros que necesitan corrección (falta solo entrada o solo salida)
-                df_incompletos = detectar_registros_incompletos(df_con_asistencia)
-                
-                if not df_incompletos.empty:
-                    # Mostrar interfaz de corrección
-                    correcciones_aplicadas = mostrar_editor_registros_incompletos(df_incompletos)
-                    
-                    if correcciones_aplicadas:
-                        # Aplicar correcciones al DataFrame
-                        df_con_asistencia = aplicar_correcciones_a_dataframe(df_con_asistencia, df_incompletos)
-                        
-                        st.success(f"✅ {len(df_incompletos)} registro(s) corregido(s) exitosamente")
-                        
-                        # Limpiar session state de correcciones
-                        if 'correcciones_horarios' in st.session_state:
-                            del st.session_state.correcciones_horarios
-                    else:
-                        # Detener ejecución hasta que se apliquen las correcciones
-                        st.warning(" Completa los datos faltantes y presiona 'Aplicar Correcciones' para continuar")
-                        st.stop()
-                
-                # Usar el DataFrame con asistencia para los cálculos
-                df_combinado = df_con_asistencia
-                
-                # Procesar con la lógica existente
-                calc_pdf_placeholder = st.empty()
-                with calc_pdf_placeholder:
-                    mostrar_loading_calculos()
-                
-                resultados, total_horas, total_sueldos = procesar_datos_excel(
-                    df_combinado, valor_por_hora, opcion_feriados, dias_feriados, cantidad_feriados
+                # Calcular en segundo plano con la lógica existente
+                resultados, total_horas, total_sueldos, tipadas = calcular_sueldos(
+                    df_combinado, valor_por_hora, dias_feriados
                 )
-                calc_pdf_placeholder.empty()  # Limpiar loading
                 
                 # Generar nombre para el archivo Excel (usar el primer PDF o combinar nombres)
                 if len(nombres_archivos_pdf) == 1:
@@ -334,10 +510,38 @@ if uploaded_file:
                 else:
                     nombre_excel = None
                 
-                mostrar_resultados(resultados, total_horas, total_sueldos, valor_por_hora, dias_feriados, nombre_excel)
+                seccion_resultados(resultados, total_horas, total_sueldos, valor_por_hora, dias_feriados, nombre_excel,
+                                   tipadas=tipadas)
+                seccion_guardar_periodo(df_combinado, resultados, valor_por_hora, dias_feriados, tipadas)
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+else:
+    # Sin archivos subidos: consultar y volver a cargar períodos guardados
+    st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
+    st.markdown('<div class="section-header"> Períodos Guardados</div>', unsafe_allow_html=True)
+    # Consultar la base importa pandas: solo cuando se pide, para no demorar la primera pantalla
+    periodo = None
+    if st.toggle("Ver períodos guardados", key="periodos_visibles"):
+        periodo = mostrar_periodos_guardados()
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    if periodo is not None:
+        # Resultados del período tal como se guardaron, sin reprocesar sus archivos
+        _, df_periodo, datos_periodo = periodo
+        seccion_resultados(
+            df_periodo.to_dict("records"),
+            datos_periodo["total_horas"],
+            datos_periodo["total_sueldos"],
+            datos_periodo["valor_por_hora"],
+            datos_periodo["feriados"],
+            datos_periodo["nombre"]
+        )
+
+# Panel de diagnóstico de rendimiento
+if traza:
+    mostrar_panel_diagnostico(traza)
+
 # Botón para salir de la app
 st.markdown("---")
 st.markdown('<div class="section-card fade-in-up">', unsafe_allow_html=True)
@@ -347,3 +551,6 @@ with col2:
         st.session_state.exit_app = True
         st.experimental_rerun()
 st.markdown('</div>', unsafe_allow_html=True)
+
+# Con la primera pantalla ya dibujada, importar los módulos pesados en segundo plano
+precalentar_modulos()
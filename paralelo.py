@@ -0,0 +1,44 @@
+"""
+Módulo de ejecución en paralelo
+Reparte tareas independientes en un pool de hilos o de procesos
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pickle import PicklingError
+from typing import Callable, Iterable, List, Optional
+
+def mapear_en_paralelo(funcion: Callable, elementos: Iterable, usar_procesos: bool = False,
+                       max_workers: Optional[int] = None) -> List:
+    """
+    Aplica una función a cada elemento en un pool de trabajadores, conservando el orden
+
+    Con usar_procesos se usa un pool de procesos "spawn" (seguro dentro del
+    servidor de Streamlit, que tiene varios hilos); si el pool no se puede
+    crear o falla, se vuelve automáticamente a un pool de hilos.
+
+    Args:
+        funcion: Función de nivel de módulo (debe poder serializarse para procesos)
+        elementos: Argumento de cada tarea
+        usar_procesos: True para tareas de CPU pesadas
+        max_workers: Cantidad máxima de trabajadores (por defecto según CPUs)
+
+    Returns:
+        List: Resultados en el mismo orden que los elementos
+    """
+    elementos = list(elementos)
+
+    # Una sola tarea no justifica el costo de un pool
+    if len(elementos) <= 1:
+        return [funcion(elemento) for elemento in elementos]
+
+    if usar_procesos:
+        try:
+            contexto = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto) as pool:
+                return list(pool.map(funcion, elementos))
+        except (BrokenProcessPool, PicklingError, OSError):
+            pass
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(funcion, elementos))
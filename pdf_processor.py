@@ -5,65 +5,344 @@ Convierte PDFs con formatos diversos a estructura estándar para cálculo de sue
 import pandas as pd
 import re
 from datetime import datetime, timedelta
+import math
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 import streamlit as st
+from instrumentacion import medir_etapa
+from tareas import TareaCancelada
 
-def procesar_pdf_a_dataframe(archivo_pdf) -> pd.DataFrame:
+# Patrones de detección de nombres de empleados (compilados una sola vez)
+_PATRON_PREFIJO_NOMBRE = re.compile(r'(Empleado|Nombre):', re.IGNORECASE)
+_PATRON_NOMBRE_COMPLETO = re.compile(r'^[A-ZÁÉÍÓÚ][a-záéíóú]+ [A-ZÁÉÍÓÚ][a-záéíóú]+.*$')
+_PATRON_NOMBRE_SIMPLE = re.compile(r'^[A-ZÁÉÍÓÚ][a-záéíóúñ]+$')
+_PATRON_DIGITOS = re.compile(r'\d+')
+
+# Orden de las marcaciones de cada PDF y del período combinado
+CLAVES_ORDEN = ['Fecha', 'Empleado']
+
+# Versión del parser: cambiarla al corregir la extracción para que los PDFs
+# guardados en la base se vuelvan a procesar en lugar de reutilizar su resultado
+VERSION_PARSER = 3
+
+# Campos de cada marcación extraída que se conservan en df.attrs['marcaciones']
+CAMPOS_MARCACION = ('empleado', 'fecha', 'hora', 'confianza')
+
+# Confianza mínima de una marcación para agruparla (si el PDF tiene alguna así)
+CONFIANZA_MINIMA = 0.6
+
+# Palabras de una sola palabra que no deben tomarse como nombres
+PALABRAS_NO_NOMBRE = frozenset(['Hora', 'Fecha', 'Entrada', 'Salida', 'Total', 'Reporte', 'Asistencia'])
+
+def procesar_pdf_a_dataframe(archivo_pdf, progreso=None) -> pd.DataFrame:
     """
     Procesa un archivo PDF y extrae datos de empleados y horarios
     
     Args:
         archivo_pdf: Archivo PDF subido
+        progreso: Callback opcional progreso(etapa, fraccion) con el avance del documento
         
     Returns:
         DataFrame: Datos procesados en formato estándar
     """
     try:
-        # Aquí necesitaremos una librería como PyPDF2 o pdfplumber
-        # Por ahora simulo la extracción
-        texto_pdf = extraer_texto_pdf(archivo_pdf)
-        lineas = texto_pdf.split('\n')
+        datos = archivo_pdf
+        for etapa in ETAPAS_PDF:
+            datos = etapa(datos, progreso)
+        return datos
         
-        # Identificar estructura del PDF
+    except TareaCancelada:
+        raise
+    except Exception as e:
+        return dataframe_con_error(e)
+
+def dataframe_con_error(error: Exception) -> pd.DataFrame:
+    """
+    Resultado de un PDF que no se pudo procesar: DataFrame vacío con el error
+    en attrs, para que lo muestre quien lo recibe (el procesamiento puede
+    correr en otro hilo, donde st.error no llega a la página)
+    """
+    df_error = pd.DataFrame()
+    df_error.attrs['error'] = str(error)
+    return df_error
+
+# Etapas del procesamiento de un PDF: cada una recibe la salida de la anterior
+# y el callback de progreso del documento (ver también pipeline_async.py).
+# Pueden correr fuera del hilo de la página: las advertencias viajan con los
+# datos hasta df.attrs['advertencias'] en lugar de mostrarse con st.warning
+
+def etapa_extraer_texto(archivo_pdf, progreso=None) -> Tuple[List[str], List[str]]:
+    """Texto de cada página (60% del avance del documento)"""
+    advertencias = []
+    with medir_etapa("pdf.extraer_texto") as medicion:
+        paginas = extraer_paginas_pdf(archivo_pdf, _escalar_progreso(progreso, 0.0, 0.6), advertencias)
+        medicion.contar(paginas=len(paginas))
+    return paginas, advertencias
+
+def etapa_analizar(texto: Tuple[List[str], List[str]], progreso=None) -> Tuple[List[str], int, Dict, List[str]]:
+    """Descarta encabezados y pies de página repetidos e identifica la estructura del PDF"""
+    paginas, advertencias = texto
+    with medir_etapa("pdf.descartar_repetidas") as medicion:
+        lineas, lineas_omitidas = descartar_lineas_repetidas(paginas)
+        medicion.contar(lineas=len(lineas), omitidas=lineas_omitidas)
+    
+    with medir_etapa("pdf.analizar_estructura", lineas=len(lineas)):
         estructura = analizar_estructura_pdf(lineas)
-        
-        # Extraer datos según la estructura identificada
+    
+    if progreso:
+        progreso("Analizando líneas", 0.6)
+    return lineas, lineas_omitidas, estructura, advertencias
+
+def etapa_extraer_marcaciones(analisis: Tuple[List[str], int, Dict, List[str]], progreso=None) -> Tuple[List[Dict], int, List[str]]:
+    """Marcaciones encontradas según la estructura identificada"""
+    lineas, lineas_omitidas, estructura, advertencias = analisis
+    with medir_etapa("pdf.extraer_marcaciones", lineas=len(lineas)) as medicion:
         datos_brutos = extraer_datos_segun_estructura(lineas, estructura)
-        
-        # Procesar datos inteligentemente
-        datos_procesados = procesar_datos_inteligente(datos_brutos)
-        
-        # Convertir a DataFrame estándar
+        medicion.contar(marcaciones=len(datos_brutos))
+    
+    if progreso:
+        progreso("Agrupando registros", 0.9)
+    return datos_brutos, lineas_omitidas, advertencias
+
+def etapa_agrupar(marcaciones: Tuple[List[Dict], int, List[str]], progreso=None) -> pd.DataFrame:
+    """Agrupa las marcaciones por empleado y fecha y arma el DataFrame estándar"""
+    datos_brutos, lineas_omitidas, advertencias = marcaciones
+    with medir_etapa("pdf.agrupar", marcaciones=len(datos_brutos)):
+        datos_procesados = procesar_datos_inteligente(datos_brutos, advertencias)
+    
+    with medir_etapa("pdf.convertir_dataframe", filas=len(datos_procesados)):
         df_final = convertir_a_dataframe_estandar(datos_procesados)
+    df_final.attrs['lineas_omitidas'] = lineas_omitidas
+    df_final.attrs['advertencias'] = advertencias
+    # Marcaciones sin agrupar, para combinar PDFs que se superponen (ver combinar_marcaciones)
+    df_final.attrs['marcaciones'] = [tuple(d[campo] for campo in CAMPOS_MARCACION) for d in datos_brutos]
+    
+    if progreso:
+        progreso("Registros listos", 1.0)
+    return df_final
+
+ETAPAS_PDF = [etapa_extraer_texto, etapa_analizar, etapa_extraer_marcaciones, etapa_agrupar]
+
+def procesar_pdfs_con_progreso(archivos_pdf: List, progreso=None) -> List[pd.DataFrame]:
+    """
+    Procesa varios PDFs en orden informando el avance global
+    
+    Args:
+        archivos_pdf: Archivos PDF subidos
+        progreso: Callback opcional progreso(etapa, fraccion) con el avance total
         
-        return df_final
-        
-    except Exception as e:
-        st.error(f" Error procesando PDF: {str(e)}")
-        return pd.DataFrame()
+    Returns:
+        List[DataFrame]: Un DataFrame por PDF (vacío si no se pudo procesar)
+    """
+    total = len(archivos_pdf)
+    dataframes = []
+    
+    for i, archivo_pdf in enumerate(archivos_pdf):
+        progreso_pdf = None
+        if progreso:
+            progreso_pdf = _escalar_progreso(
+                lambda etapa, fraccion, i=i: progreso(f"PDF {i + 1}/{total} - {etapa}", fraccion),
+                i / total, 1 / total
+            )
+        with medir_etapa("pdf.procesar_documento") as medicion:
+            df_pdf = procesar_pdf_a_dataframe(archivo_pdf, progreso_pdf)
+            medicion.contar(filas=len(df_pdf))
+        dataframes.append(df_pdf)
+    
+    return dataframes
+
+def procesar_pdfs_incremental(archivos_pdf: List, progreso=None) -> List[pd.DataFrame]:
+    """
+    Procesa solo los PDFs nuevos: los ya procesados (identificados por la
+    huella de su contenido y VERSION_PARSER) se cargan de la base local, y los
+    nuevos se procesan y se guardan para la próxima vez
+
+    Args:
+        archivos_pdf: Archivos PDF subidos
+        progreso: Callback opcional progreso(etapa, fraccion) con el avance de los PDFs nuevos
+
+    Returns:
+        List[DataFrame]: Un DataFrame por PDF, en el orden recibido; los cargados
+        de la base tienen df.attrs['reutilizado'] = True
+    """
+    import sqlite3
+    from almacen import cargar_archivos, guardar_archivo, huella_contenido
+
+    # Con otra versión del parser la clave cambia y el PDF se vuelve a procesar
+    huellas = [f"{huella_contenido(archivo.getvalue())}-v{VERSION_PARSER}" for archivo in archivos_pdf]
+    try:
+        guardados = cargar_archivos(huellas)
+    except sqlite3.Error:
+        # Sin base disponible se procesan todos los archivos
+        guardados = {}
+
+    nuevos = [archivo for archivo, huella in zip(archivos_pdf, huellas) if huella not in guardados]
+    if len(nuevos) > 1:
+        # Varios PDFs nuevos: etapas superpuestas entre documentos
+        from pipeline_async import procesar_pdfs_en_pipeline
+        procesados = iter(procesar_pdfs_en_pipeline(nuevos, progreso))
+    else:
+        procesados = iter(procesar_pdfs_con_progreso(nuevos, progreso))
+
+    dataframes = []
+    for archivo, huella in zip(archivos_pdf, huellas):
+        if huella in guardados:
+            df_pdf = guardados[huella].copy()
+            df_pdf.attrs['reutilizado'] = True
+        else:
+            df_pdf = next(procesados)
+            if not df_pdf.attrs.get('error') and not df_pdf.empty:
+                try:
+                    guardar_archivo(huella, archivo.name, df_pdf)
+                except sqlite3.Error:
+                    pass
+        dataframes.append(df_pdf)
+
+    return dataframes
+
+def combinar_ordenados(dataframes: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Combina las marcaciones de varios PDFs, cada una ya ordenada por
+    CLAVES_ORDEN y con la fecha como datetime, sin volver a interpretar la
+    fecha ni reordenar el período completo.
+    
+    Cada PDF es un tramo ordenado de una clave entera (fecha, empleado), y el
+    ordenamiento estable de numpy (timsort) detecta esos tramos y los mezcla
+    de a pares: es una mezcla de k vías en O(n log k), hecha en C.
+    Con claves iguales se conserva el orden de los archivos.
+
+    Args:
+        dataframes: Marcaciones de cada PDF, ordenadas
+
+    Returns:
+        DataFrame: Marcaciones de todos los PDFs en orden, con índice nuevo
+    """
+    import numpy as np
+
+    combinado = pd.concat(dataframes, ignore_index=True)
+    if len(dataframes) < 2:
+        return combinado
+
+    # Rango de cada fecha y cada empleado entre los valores distintos (faltantes al final, como en sort_values)
+    codigos_fecha, fechas = pd.factorize(combinado['Fecha'], sort=True)
+    codigos_empleado, empleados = pd.factorize(combinado['Empleado'], sort=True)
+    codigos_fecha = np.where(codigos_fecha < 0, len(fechas), codigos_fecha).astype('int64')
+    codigos_empleado = np.where(codigos_empleado < 0, len(empleados), codigos_empleado).astype('int64')
+
+    clave = codigos_fecha * (len(empleados) + 1) + codigos_empleado
+    orden = np.argsort(clave, kind='stable')
+    return combinado.take(orden).reset_index(drop=True)
+
+def combinar_marcaciones(dataframes: List[pd.DataFrame]) -> Tuple[pd.DataFrame, int]:
+    """
+    Combina varios PDFs que pueden superponerse. Solo se vuelven a agrupar
+    los días (empleado, fecha) que aparecen en más de un PDF: sus marcaciones
+    sin agrupar (df.attrs['marcaciones']) se juntan sin las que ya trajo un
+    PDF anterior (mismo empleado, fecha y hora), así un día incompleto en un
+    PDF y completo en otro queda en un solo registro con su entrada y su
+    salida. Las demás filas de cada PDF se usan tal cual, y todo se mezcla en
+    orden con combinar_ordenados.
+
+    Args:
+        dataframes: Marcaciones de cada PDF, como las devuelve procesar_pdf_a_dataframe
+
+    Returns:
+        tuple: (marcaciones ordenadas por CLAVES_ORDEN, cantidad de marcaciones repetidas entre PDFs descartadas)
+    """
+    from smart_parser import DataGrouper
+
+    # Vistas sin attrs: pandas copia attrs (con todas las marcaciones) en cada filtro y concat
+    marcaciones_por_pdf = [df.attrs.get('marcaciones', []) for df in dataframes]
+    dataframes = [pd.DataFrame(df, copy=False) for df in dataframes]
+    if len(dataframes) == 1:
+        return dataframes[0].reset_index(drop=True), 0
+
+    # Días que aparecen en más de un PDF
+    vistos, superpuestos = set(), set()
+    for marcaciones in marcaciones_por_pdf:
+        dias = {marcacion[:2] for marcacion in marcaciones}
+        superpuestos |= dias & vistos
+        vistos |= dias
+    if not superpuestos:
+        return combinar_ordenados(dataframes), 0
+
+    with medir_etapa("pdf.combinar", dias_superpuestos=len(superpuestos)) as medicion:
+        # Marcaciones de los días superpuestos, con el filtro de confianza que se
+        # aplicó a cada PDF al agruparlo. Las repetidas dentro de un mismo PDF se
+        # conservan (como al agruparlo solo); se descartan las que trajo uno anterior
+        brutas, anteriores, descartadas = [], set(), 0
+        for marcaciones in marcaciones_por_pdf:
+            con_confianza = any((marcacion[3] or 0) > CONFIANZA_MINIMA for marcacion in marcaciones)
+            propias = set()
+            for marcacion in marcaciones:
+                if marcacion[:2] not in superpuestos or (con_confianza and not (marcacion[3] or 0) > CONFIANZA_MINIMA):
+                    continue
+                if marcacion[:3] in anteriores:
+                    descartadas += 1
+                    continue
+                brutas.append(dict(zip(CAMPOS_MARCACION, marcacion)))
+                propias.add(marcacion[:3])
+            anteriores |= propias
+
+        # Las filas de esos días salen de cada PDF y entran reagrupadas; el resto sigue ordenado
+        empleados, fechas = zip(*superpuestos)
+        claves = pd.MultiIndex.from_arrays([list(empleados), pd.to_datetime(list(fechas))])
+        partes = [df[~pd.MultiIndex.from_arrays([df['Empleado'], df['Fecha']]).isin(claves)] for df in dataframes]
+        if brutas:
+            partes.append(convertir_a_dataframe_estandar(DataGrouper().agrupar_por_empleado_fecha(brutas)))
+        medicion.contar(marcaciones=len(brutas), descartadas=descartadas)
+
+    return combinar_ordenados(partes), descartadas
+
+def _escalar_progreso(progreso, inicio: float, peso: float):
+    """Adapta un callback de progreso para que una sub-etapa ocupe [inicio, inicio + peso]"""
+    if progreso is None:
+        return None
+    return lambda etapa, fraccion: progreso(etapa, inicio + peso * fraccion)
 
 def extraer_texto_pdf(archivo_pdf) -> str:
     """
     Extrae texto del PDF usando pdfplumber
     """
+    return "".join(texto_pagina + "\n" for texto_pagina in extraer_paginas_pdf(archivo_pdf))
+
+def extraer_paginas_pdf(archivo_pdf, progreso=None, advertencias: Optional[List[str]] = None) -> List[str]:
+    """
+    Extrae el texto de cada página del PDF usando pdfplumber
+    
+    Args:
+        archivo_pdf: Archivo PDF subido
+        progreso: Callback opcional progreso(etapa, fraccion) llamado por cada página
+        advertencias: Lista opcional donde dejar las advertencias en lugar de
+            mostrarlas (para llamarla fuera del hilo de la página)
+        
+    Returns:
+        List[str]: Texto de cada página con contenido
+        
+    Raises:
+        Exception: Si el PDF no se puede leer
+    """
     try:
         # Importar pdfplumber dinámicamente
         import pdfplumber
         
-        texto_completo = ""
+        paginas = []
         
         with pdfplumber.open(archivo_pdf) as pdf:
-            for pagina in pdf.pages:
+            total_paginas = len(pdf.pages)
+            for numero, pagina in enumerate(pdf.pages, 1):
                 texto_pagina = pagina.extract_text()
                 if texto_pagina:
-                    texto_completo += texto_pagina + "\n"
+                    paginas.append(texto_pagina)
+                if progreso:
+                    progreso(f"Extrayendo texto (página {numero} de {total_paginas})", numero / total_paginas)
         
-        return texto_completo
+        return paginas
         
     except ImportError:
-        st.warning(" pdfplumber no está instalado. Usando datos de ejemplo.")
+        _advertir(" pdfplumber no está instalado. Usando datos de ejemplo.", advertencias)
         # Fallback con datos de ejemplo
-        return """
+        return ["""
         REPORTE DE ASISTENCIA - OCTUBRE 2024
         
         Empleado: Juan Pérez
@@ -81,11 +360,97 @@ def extraer_texto_pdf(archivo_pdf) -> str:
         Empleado: Carlos López
         01/10/2024 08:15 - Entrada
         01/10/2024 17:15 - Salida
-        """
+        """]
+
+def _advertir(mensaje: str, advertencias: Optional[List[str]]):
+    """Agrega la advertencia a la lista dada o, sin lista, la muestra en la página"""
+    if advertencias is None:
+        st.warning(mensaje)
+    else:
+        advertencias.append(mensaje)
+
+def descartar_lineas_repetidas(paginas: List[str], lineas_borde: int = 6,
+                               proporcion_minima: float = 0.6) -> Tuple[List[str], int]:
+    """
+    Aprende las líneas que se repiten en la misma posición de varias páginas
+    (encabezado, títulos de columnas, pie) y las descarta antes de parsear.
+    Se conserva la primera aparición de cada una.
+    
+    Nunca se descartan líneas con fecha y hora ni líneas que el parser toma
+    como nombre de empleado ("Empleado:"/"Nombre:", nombre completo o simple):
+    en los reportes por día los empleados se listan en el mismo orden en todas
+    las páginas, y descartar sus nombres pasaría sus marcaciones al anterior.
+    
+    Args:
+        paginas: Texto de cada página
+        lineas_borde: Líneas no vacías a revisar al inicio y al final de cada página
+        proporcion_minima: Proporción mínima de páginas en que debe repetirse
         
-    except Exception as e:
-        st.error(f" Error extrayendo texto del PDF: {str(e)}")
-        return ""
+    Returns:
+        Tuple[List[str], int]: (lineas_resultantes, cantidad_de_lineas_omitidas)
+    """
+    lineas_por_pagina = [texto.split('\n') for texto in paginas]
+    lineas_todas = [linea for lineas in lineas_por_pagina for linea in lineas]
+    
+    if len(paginas) < 2:
+        return lineas_todas, 0
+    
+    # Clave de posición: desde arriba o desde abajo, con los dígitos normalizados
+    # para que "Página 1 de 5" y "Página 2 de 5" cuenten como la misma línea
+    def claves_de_pagina(lineas: List[str]) -> List[Tuple[int, List[Tuple]]]:
+        # [(indice_linea, [claves de posición de la línea]), ...]
+        no_vacias = [(i, linea.strip()) for i, linea in enumerate(lineas) if linea.strip()]
+        total = len(no_vacias)
+        claves = []
+        for posicion, (i, linea) in enumerate(no_vacias):
+            normalizada = _PATRON_DIGITOS.sub('#', linea)
+            claves_linea = []
+            if posicion < lineas_borde:
+                claves_linea.append(('inicio', posicion, normalizada))
+            if total - posicion <= lineas_borde:
+                claves_linea.append(('fin', total - posicion, normalizada))
+            if claves_linea:
+                claves.append((i, claves_linea))
+        return claves
+    
+    claves_paginas = [claves_de_pagina(lineas) for lineas in lineas_por_pagina]
+    
+    apariciones = {}
+    for claves in claves_paginas:
+        for clave in {clave for _, claves_linea in claves for clave in claves_linea}:
+            apariciones[clave] = apariciones.get(clave, 0) + 1
+    
+    minimo_paginas = max(2, math.ceil(len(paginas) * proporcion_minima))
+    repetidas = {clave for clave, cantidad in apariciones.items() if cantidad >= minimo_paginas}
+    
+    if not repetidas:
+        return lineas_todas, 0
+    
+    from smart_parser import obtener_parsers
+    
+    parser = obtener_parsers()[0]
+    vistas = set()
+    resultado = []
+    omitidas = 0
+    
+    for lineas, claves in zip(lineas_por_pagina, claves_paginas):
+        descartar = set()
+        for i, claves_linea in claves:
+            clave_repetida = next((clave for clave in claves_linea if clave in repetidas), None)
+            if clave_repetida is None:
+                continue
+            linea = lineas[i].strip()
+            if _clasificar_linea_nombre(linea) or parser.extraer_fecha_hora(linea):
+                continue
+            if clave_repetida in vistas:
+                descartar.add(i)
+            else:
+                vistas.add(clave_repetida)
+        
+        omitidas += len(descartar)
+        resultado.extend(linea for i, linea in enumerate(lineas) if i not in descartar)
+    
+    return resultado, omitidas
 
 def analizar_estructura_pdf(lineas: List[str]) -> Dict:
     """
@@ -137,10 +502,9 @@ def extraer_datos_segun_estructura(lineas: List[str], estructura: Dict) -> List[
     """
     Extrae datos según la estructura identificada usando el parser inteligente
     """
-    from smart_parser import SmartTimeParser, EntradaSalidaDetector
+    from smart_parser import obtener_parsers
     
-    parser = SmartTimeParser()
-    detector = EntradaSalidaDetector()
+    parser, detector = obtener_parsers()
     
     datos = []
     empleado_actual = None
@@ -153,29 +517,11 @@ def extraer_datos_segun_estructura(lineas: List[str], estructura: Dict) -> List[
         if not linea:
             continue
             
-        # Detectar nombre de empleado (varios patrones)
-        if re.match(r'Empleado:', linea, re.IGNORECASE):
-            empleado_actual = linea.split(':', 1)[1].strip()
-            continue
-        elif re.match(r'Nombre:', linea, re.IGNORECASE):
-            empleado_actual = linea.split(':', 1)[1].strip()
+        # Detectar nombre de empleado (prefijo, nombre completo o nombre simple)
+        clasificacion = _clasificar_linea_nombre(linea)
+        if clasificacion:
+            empleado_actual = clasificacion[1]
             continue
-        elif re.match(r'^[A-ZÁÉÍÓÚ][a-záéíóú]+ [A-ZÁÉÍÓÚ][a-záéíóú]+.*$', linea):
-            # Patrón de nombre completo (Nombre Apellido)
-            if not any(char.isdigit() for char in linea) and len(linea.split()) >= 2:
-                empleado_actual = linea.strip()
-                continue
-        elif re.match(r'^[A-ZÁÉÍÓÚ][a-záéíóúñ]+$', linea):
-            # Patrón de nombre simple (solo una palabra, como "Paz")
-            if len(linea.strip()) >= 2 and linea.strip().isalpha():
-                empleado_actual = linea.strip()
-                continue
-        elif re.match(r'^[A-ZÁÉÍÓÚ][a-záéíóúñ]+\s*$', linea.strip()):
-            # Patrón de nombre con posibles espacios al final
-            nombre_limpio = linea.strip()
-            if len(nombre_limpio) >= 2 and nombre_limpio.isalpha():
-                empleado_actual = nombre_limpio
-                continue
         
         # Extraer fechas y horas de la línea
         fechas_horas = parser.extraer_fecha_hora(linea)
@@ -206,34 +552,59 @@ def _buscar_nombres_en_documento(lineas: List[str]) -> List[str]:
     """
     Busca posibles nombres de empleados en todo el documento
     """
-    nombres_encontrados = []
+    # Diccionario como conjunto ordenado: búsqueda O(1) conservando el orden de aparición
+    nombres_encontrados = {}
     
     for linea in lineas:
         linea = linea.strip()
         if not linea:
             continue
-            
-        # Buscar patrones de nombres
-        # Nombre con "Nombre:" o "Empleado:"
-        if re.match(r'(Nombre|Empleado):', linea, re.IGNORECASE):
-            nombre = linea.split(':', 1)[1].strip()
-            if nombre and nombre not in nombres_encontrados:
-                nombres_encontrados.append(nombre)
         
-        # Nombre simple (una palabra alfabética, primera letra mayúscula)
-        elif re.match(r'^[A-ZÁÉÍÓÚ][a-záéíóúñ]+$', linea):
-            if len(linea) >= 2 and linea not in nombres_encontrados:
-                # Evitar palabras que claramente no son nombres
-                palabras_excluir = ['Hora', 'Fecha', 'Entrada', 'Salida', 'Total', 'Reporte', 'Asistencia']
-                if linea not in palabras_excluir:
-                    nombres_encontrados.append(linea)
+        clasificacion = _clasificar_linea_nombre(linea)
+        if not clasificacion:
+            continue
         
-        # Nombre completo (dos o más palabras)
-        elif re.match(r'^[A-ZÁÉÍÓÚ][a-záéíóú]+ [A-ZÁÉÍÓÚ][a-záéíóú]+.*$', linea):
-            if not any(char.isdigit() for char in linea) and linea not in nombres_encontrados:
-                nombres_encontrados.append(linea)
+        tipo, nombre = clasificacion
+        # Nombre con "Nombre:" o "Empleado:" vacío no aporta nada
+        if tipo == "prefijo" and not nombre:
+            continue
+        # Evitar palabras sueltas que claramente no son nombres
+        if tipo == "simple" and nombre in PALABRAS_NO_NOMBRE:
+            continue
+        
+        nombres_encontrados.setdefault(nombre, None)
+    
+    return list(nombres_encontrados)
+
+@lru_cache(maxsize=4096)
+def _clasificar_linea_nombre(linea: str) -> Optional[Tuple[str, str]]:
+    """
+    Clasifica una línea (ya sin espacios en los extremos) como nombre de empleado.
+    El resultado se memoriza por contenido: los encabezados y pies que se repiten
+    en cada página cuestan una sola búsqueda en el caché.
+    
+    Args:
+        linea: Línea de texto sin espacios al inicio ni al final
+        
+    Returns:
+        Tuple[str, str]: (tipo, nombre) con tipo "prefijo", "completo" o "simple",
+        o None si la línea no es un nombre
+    """
+    # Nombre con "Empleado:" o "Nombre:"
+    if _PATRON_PREFIJO_NOMBRE.match(linea):
+        return "prefijo", linea.split(':', 1)[1].strip()
+    
+    # Nombre completo (Nombre Apellido), sin dígitos
+    if _PATRON_NOMBRE_COMPLETO.match(linea):
+        if not any(char.isdigit() for char in linea):
+            return "completo", linea
+        return None
+    
+    # Nombre simple (solo una palabra, como "Paz")
+    if _PATRON_NOMBRE_SIMPLE.match(linea) and len(linea) >= 2 and linea.isalpha():
+        return "simple", linea
     
-    return nombres_encontrados
+    return None
 
 def validar_datos_pdf(df: pd.DataFrame) -> Tuple[bool, List[str]]:
     """
@@ -282,9 +653,10 @@ def _calcular_confianza(linea: str, fecha_hora: Dict) -> float:
     
     return min(confianza, 1.0)
 
-def procesar_datos_inteligente(datos_brutos: List[Dict]) -> List[Dict]:
+def procesar_datos_inteligente(datos_brutos: List[Dict], advertencias: Optional[List[str]] = None) -> List[Dict]:
     """
     Procesa los datos de manera inteligente usando el DataGrouper
+    (advertencias: lista opcional donde dejarlas en lugar de mostrarlas)
     """
     from smart_parser import DataGrouper
     
@@ -292,10 +664,10 @@ def procesar_datos_inteligente(datos_brutos: List[Dict]) -> List[Dict]:
         return []
     
     # Filtrar datos por confianza
-    datos_confiables = [d for d in datos_brutos if d.get('confianza', 0) > 0.6]
+    datos_confiables = [d for d in datos_brutos if d.get('confianza', 0) > CONFIANZA_MINIMA]
     
     if not datos_confiables:
-        st.warning(" Datos extraídos tienen baja confianza. Usando todos los datos disponibles.")
+        _advertir(" Datos extraídos tienen baja confianza. Usando todos los datos disponibles.", advertencias)
         datos_confiables = datos_brutos
     
     # Usar DataGrouper para agrupar inteligentemente
@@ -333,10 +705,11 @@ def convertir_a_dataframe_estandar(datos_procesados: List[Dict]) -> pd.DataFrame
     df['Descuento Caja'] = 0
     df['Retiro'] = 0
     
-    # Convertir tipos de datos
+    # Convertir tipos de datos (la única vez que se interpreta la fecha)
     df['Fecha'] = pd.to_datetime(df['Fecha'])
     
-    return df
+    # Ordenado por fecha y empleado (CLAVES_ORDEN)
+    return df.sort_values(CLAVES_ORDEN, kind='stable').reset_index(drop=True)
 
 def validar_datos_pdf(df: pd.DataFrame) -> Tuple[bool, List[str]]:
     """
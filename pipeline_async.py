@@ -0,0 +1,140 @@
+"""
+Pipeline asíncrono para procesar varios PDFs
+Cada etapa de pdf_processor.ETAPAS_PDF tiene sus propios trabajadores y las
+etapas se conectan con colas acotadas: mientras un PDF se agrupa, el siguiente
+ya se analiza y otro se está leyendo. Si una etapa se atrasa, su cola se llena
+y las anteriores esperan en lugar de acumular documentos en memoria.
+"""
+import asyncio
+import contextvars
+import io
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Optional
+
+import pandas as pd
+
+from instrumentacion import medir_etapa
+from pdf_processor import ETAPAS_PDF, dataframe_con_error
+from tareas import TareaCancelada
+
+class _Documento:
+    """Un PDF en tránsito por el pipeline"""
+
+    def __init__(self, posicion: int, datos):
+        self.posicion = posicion
+        self.datos = datos
+        self.error: Optional[Exception] = None
+
+async def procesar_pdfs_async(archivos_pdf: List, progreso=None, max_en_cola: int = 2,
+                              lectores: int = 2, executor: Optional[Executor] = None) -> List[pd.DataFrame]:
+    """
+    Procesa varios PDFs con las etapas superpuestas
+
+    Args:
+        archivos_pdf: Archivos PDF subidos
+        progreso: Callback opcional progreso(etapa, fraccion) con el avance total
+        max_en_cola: Documentos que pueden esperar entre una etapa y la siguiente
+        lectores: Trabajadores de la extracción de texto, la etapa más lenta
+        executor: Executor para el trabajo de CPU; por defecto un pool de hilos propio.
+            Con un pool de procesos las etapas no informan progreso ni se registran
+            en la traza, y la cancelación se aplica entre etapas
+
+    Returns:
+        List[DataFrame]: Un DataFrame por PDF en el orden recibido (vacío si no se pudo procesar)
+    """
+    total = len(archivos_pdf)
+    if total == 0:
+        return []
+
+    propio = executor is None
+    if propio:
+        executor = ThreadPoolExecutor(max_workers=lectores + len(ETAPAS_PDF) - 1,
+                                      thread_name_prefix="pipeline_pdf")
+    en_hilos = isinstance(executor, ThreadPoolExecutor)
+    loop = asyncio.get_running_loop()
+    avance = [0.0] * total
+
+    def progreso_documento(posicion: int):
+        def informar(etapa: str, fraccion: float):
+            avance[posicion] = fraccion
+            progreso(f"PDF {posicion + 1}/{total} - {etapa}", sum(avance) / total)
+        return informar
+
+    async def ejecutar(etapa, documento: _Documento):
+        if not en_hilos:
+            # El callback de progreso no cruza procesos: verificar la cancelación entre etapas
+            if progreso:
+                progreso(f"PDF {documento.posicion + 1}/{total} - {etapa.__name__}", sum(avance) / total)
+            return await loop.run_in_executor(executor, etapa, documento.datos)
+        informar = progreso_documento(documento.posicion) if progreso else None
+        # Cada llamada corre en una copia del contexto para conservar la traza activa
+        contexto = contextvars.copy_context()
+        return await loop.run_in_executor(executor, contexto.run, etapa, documento.datos, informar)
+
+    async def alimentar(salida: asyncio.Queue):
+        for posicion, archivo in enumerate(archivos_pdf):
+            # Un BytesIO propio por documento: los lectores no comparten la posición
+            # del archivo subido, y se puede enviar a otro proceso
+            await salida.put(_Documento(posicion, io.BytesIO(archivo.getvalue())))
+
+    async def trabajar(etapa, entrada: asyncio.Queue, salida: asyncio.Queue):
+        while True:
+            documento = await entrada.get()
+            if documento.error is None:
+                try:
+                    documento.datos = await ejecutar(etapa, documento)
+                except TareaCancelada:
+                    raise
+                except Exception as e:
+                    # El documento sigue hasta el final sin pasar por las etapas restantes
+                    documento.error = e
+            await salida.put(documento)
+
+    async def recolectar(entrada: asyncio.Queue) -> List[pd.DataFrame]:
+        dataframes = [None] * total
+        for _ in range(total):
+            documento = await entrada.get()
+            if documento.error is not None:
+                dataframes[documento.posicion] = dataframe_con_error(documento.error)
+            else:
+                dataframes[documento.posicion] = documento.datos
+        return dataframes
+
+    colas = [asyncio.Queue(maxsize=max_en_cola) for _ in range(len(ETAPAS_PDF) + 1)]
+    tareas = [asyncio.create_task(alimentar(colas[0]))]
+    for i, etapa in enumerate(ETAPAS_PDF):
+        trabajadores = lectores if i == 0 else 1
+        tareas += [asyncio.create_task(trabajar(etapa, colas[i], colas[i + 1])) for _ in range(trabajadores)]
+    recolector = asyncio.create_task(recolectar(colas[-1]))
+
+    try:
+        with medir_etapa("pdf.pipeline", documentos=total, lectores=lectores):
+            # Los trabajadores solo terminan por un error (por ejemplo, TareaCancelada)
+            pendientes = {recolector, *tareas}
+            while not recolector.done():
+                listas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in listas:
+                    if tarea.exception() is not None:
+                        raise tarea.exception()
+            return recolector.result()
+    finally:
+        for tarea in [recolector, *tareas]:
+            tarea.cancel()
+        await asyncio.gather(recolector, *tareas, return_exceptions=True)
+        if propio:
+            # Sin esperar: si se canceló, las etapas en curso se detienen en su próximo reporte
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def procesar_pdfs_en_pipeline(archivos_pdf: List, progreso=None, **opciones) -> List[pd.DataFrame]:
+    """
+    Versión sincrónica de procesar_pdfs_async, para llamarla desde una tarea en segundo plano
+
+    Args:
+        archivos_pdf: Archivos PDF subidos
+        progreso: Callback opcional progreso(etapa, fraccion) con el avance total
+        **opciones: max_en_cola, lectores o executor de procesar_pdfs_async
+
+    Returns:
+        List[DataFrame]: Un DataFrame por PDF en el orden recibido
+    """
+    return asyncio.run(procesar_pdfs_async(archivos_pdf, progreso, **opciones))
@@ -0,0 +1,237 @@
+"""
+Módulo de recibos de sueldo
+Genera un recibo HTML por empleado a partir de la tabla de resultados,
+en paralelo, y los empaqueta en un zip
+
+Los recibos se arman en un pool de procesos: este módulo solo importa la
+biblioteca estándar para que los procesos hijos arranquen rápido; pandas se
+usa únicamente en el proceso principal para preparar los datos.
+"""
+import html
+import io
+import re
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from paralelo import mapear_en_paralelo
+
+# Recibos por tarea del pool (repartir de a uno cuesta más en serialización que en armado)
+RECIBOS_POR_TAREA = 200
+
+# A partir de esta cantidad de empleados los recibos se arman en procesos en lugar de hilos
+UMBRAL_PROCESOS_RECIBOS = 500
+
+COLUMNAS_DETALLE_RECIBO = [
+    "Fecha", "Entrada", "Salida", "Feriado",
+    "Horas Trabajadas (h:mm)", "Horas Normales", "Horas Especiales", "Sueldo Final",
+]
+
+def generar_recibos(df_result, valor_por_hora: Optional[float] = None, periodo: Optional[str] = None,
+                    max_workers: Optional[int] = None) -> bytes:
+    """
+    Genera los recibos de sueldo de todos los empleados y los devuelve en un zip
+
+    Args:
+        df_result (DataFrame): Resultados del cálculo (una fila por registro)
+        valor_por_hora: Valor por hora usado en el cálculo (opcional, se muestra en el recibo)
+        periodo: Texto del período (por defecto, primera y última fecha de los resultados)
+        max_workers: Cantidad máxima de trabajadores del pool
+
+    Returns:
+        bytes: Zip con un archivo HTML por empleado
+    """
+    recibos = preparar_recibos(df_result, valor_por_hora, periodo)
+    lotes = [recibos[inicio:inicio + RECIBOS_POR_TAREA] for inicio in range(0, len(recibos), RECIBOS_POR_TAREA)]
+
+    armados = mapear_en_paralelo(
+        renderizar_lote_recibos,
+        lotes,
+        usar_procesos=len(recibos) >= UMBRAL_PROCESOS_RECIBOS,
+        max_workers=max_workers,
+    )
+
+    # Nombres distintos pueden quedar iguales al sanearlos ("Juan Pérez" y "Juan. Pérez");
+    # los lotes se arman por separado, así que se desambiguan al empaquetar
+    output = io.BytesIO()
+    usados = set()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        for lote in armados:
+            for nombre_archivo, contenido in lote:
+                nombre_archivo = nombre_unico(nombre_archivo, usados)
+                usados.add(nombre_archivo)
+                archivo_zip.writestr(nombre_archivo, contenido)
+    return output.getvalue()
+
+def preparar_recibos(df_result, valor_por_hora: Optional[float] = None, periodo: Optional[str] = None) -> List[Dict]:
+    """
+    Agrupa los resultados por empleado en datos simples (serializables) para
+    armar los recibos: totales de horas por categoría, días feriados,
+    descuentos, bruto, neto y el detalle de cada día
+
+    Args:
+        df_result (DataFrame): Resultados del cálculo
+        valor_por_hora: Valor por hora usado en el cálculo
+        periodo: Texto del período
+
+    Returns:
+        List[Dict]: Datos de cada recibo
+    """
+    import pandas as pd
+    from data_processor import COLUMNAS_DESCUENTO, resumenes_nomina
+    from reglas_pago import plan_para_sucursal
+
+    if df_result.empty:
+        return []
+
+    if periodo is None:
+        fechas = pd.to_datetime(df_result["Fecha"], errors="coerce")
+        periodo = f"{fechas.min():%d/%m/%Y} - {fechas.max():%d/%m/%Y}"
+
+    # Totales por empleado, del total y de los días feriados, con los mismos resúmenes del libro de nómina
+    claves = [columna for columna in ("Sucursal", "Empleado") if columna in df_result.columns]
+    totales = resumenes_nomina(df_result)["Por Empleado"]
+    resumen_feriados = resumenes_nomina(df_result[df_result["Feriado"] == "Sí"])
+    feriados = resumen_feriados["Por Empleado"] if resumen_feriados else totales.iloc[0:0]
+    feriados = {tuple(clave): fila for clave, fila in zip(
+        feriados[claves].itertuples(index=False, name=None), feriados.to_dict("records")
+    )}
+
+    # Detalle de todos los empleados convertido una sola vez y repartido por posición
+    columnas_detalle = [columna for columna in COLUMNAS_DETALLE_RECIBO if columna in df_result.columns]
+    ordenado = df_result.sort_values(claves, kind="stable")
+    detalle = ordenado[columnas_detalle].astype(object)
+    filas = list(detalle.where(detalle.notna(), "").itertuples(index=False, name=None))
+    # Días distintos trabajados (y feriados) por empleado: un día con varios turnos cuenta una vez
+    grupos = ordenado.assign(
+        _fecha_feriado=ordenado["Fecha"].where(ordenado["Feriado"] == "Sí")
+    ).groupby(claves, sort=True)
+    tamanos = grupos.size().tolist()
+    dias = grupos["Fecha"].nunique().tolist()
+    dias_feriados = grupos["_fecha_feriado"].nunique().tolist()
+
+    emitido = datetime.now().strftime("%d/%m/%Y")
+    recibos = []
+    inicio = 0
+
+    for total, tamano, dias_empleado, dias_feriados_empleado in zip(
+        totales.to_dict("records"), tamanos, dias, dias_feriados
+    ):
+        clave = tuple(total[columna] for columna in claves)
+        feriado = feriados.get(clave)
+        recargos = plan_para_sucursal(total.get("Sucursal")).descripcion_especiales
+
+        recibos.append({
+            "empleado": str(total["Empleado"]),
+            "sucursal": str(total["Sucursal"]) if "Sucursal" in total else None,
+            "periodo": periodo,
+            "emitido": emitido,
+            "valor_por_hora": valor_por_hora,
+            "dias": int(dias_empleado),
+            "dias_feriados": int(dias_feriados_empleado),
+            "horas": {
+                "Horas normales": total["Horas Normales"],
+                f"Horas especiales ({recargos})" if recargos else "Horas especiales": total["Horas Especiales"],
+                "Horas en feriados": feriado["Horas Trabajadas (h:mm)"] if feriado is not None else "0:00",
+                "Total horas trabajadas": total["Horas Trabajadas (h:mm)"],
+            },
+            "bruto": float(total["Sueldo Bruto"]),
+            "descuentos": {columna: float(total[columna]) for columna in COLUMNAS_DESCUENTO},
+            "neto": float(total["Sueldo Final"]),
+            "columnas": columnas_detalle,
+            "detalle": filas[inicio:inicio + tamano],
+        })
+        inicio += tamano
+
+    return recibos
+
+def renderizar_lote_recibos(recibos: List[Dict]) -> List[Tuple[str, str]]:
+    """Arma un lote de recibos (tarea del pool): lista de (nombre de archivo, HTML)"""
+    return [(nombre_archivo_recibo(recibo), renderizar_recibo(recibo)) for recibo in recibos]
+
+def nombre_archivo_recibo(recibo: Dict) -> str:
+    """Nombre de archivo seguro para el recibo de un empleado"""
+    partes = [recibo["sucursal"], recibo["empleado"]] if recibo["sucursal"] else [recibo["empleado"]]
+    nombre = "_".join(re.sub(r"[^\w\-]+", "_", parte).strip("_") or "empleado" for parte in partes)
+    return f"recibo_{nombre}.html"
+
+def nombre_unico(nombre_archivo: str, usados: set) -> str:
+    """Agrega un sufijo (_2, _3, ...) al nombre de archivo si ya está en usados"""
+    if nombre_archivo not in usados:
+        return nombre_archivo
+    base, extension = nombre_archivo.rsplit(".", 1)
+    numero = 2
+    while f"{base}_{numero}.{extension}" in usados:
+        numero += 1
+    return f"{base}_{numero}.{extension}"
+
+def renderizar_recibo(recibo: Dict) -> str:
+    """
+    Arma el HTML del recibo de un empleado
+
+    Args:
+        recibo: Datos del recibo (ver preparar_recibos)
+
+    Returns:
+        str: Documento HTML autocontenido, listo para imprimir
+    """
+    e = html.escape
+
+    filas_horas = "".join(
+        f"<tr><td>{e(concepto)}</td><td class='num'>{e(str(valor))}</td></tr>"
+        for concepto, valor in recibo["horas"].items()
+    )
+    filas_descuentos = "".join(
+        f"<tr><td>{e(concepto)}</td><td class='num'>-{_moneda(valor)}</td></tr>"
+        for concepto, valor in recibo["descuentos"].items()
+    )
+    encabezado_detalle = "".join(f"<th>{e(columna)}</th>" for columna in recibo["columnas"])
+    filas_detalle = "".join(
+        "<tr>" + "".join(f"<td>{e(str(valor))}</td>" for valor in fila) + "</tr>"
+        for fila in recibo["detalle"]
+    )
+    sucursal = f"<p><strong>Sucursal:</strong> {e(recibo['sucursal'])}</p>" if recibo["sucursal"] else ""
+    valor_hora = (
+        f"<p><strong>Valor por hora:</strong> {_moneda(recibo['valor_por_hora'])}</p>"
+        if recibo["valor_por_hora"] is not None else ""
+    )
+
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Recibo de sueldo - {e(recibo['empleado'])}</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 2rem; color: #222; }}
+h1 {{ font-size: 1.4rem; margin-bottom: 0.2rem; }}
+table {{ border-collapse: collapse; width: 100%; margin: 0.8rem 0 1.4rem; }}
+th, td {{ border: 1px solid #ccc; padding: 0.3rem 0.5rem; font-size: 0.9rem; text-align: left; }}
+th {{ background: #f0f0f0; }}
+.num {{ text-align: right; }}
+.neto td {{ font-weight: bold; font-size: 1.05rem; }}
+@media print {{ body {{ margin: 0; }} }}
+</style>
+</head>
+<body>
+<h1>Recibo de sueldo</h1>
+<p><strong>Empleado:</strong> {e(recibo['empleado'])}</p>
+{sucursal}
+<p><strong>Período:</strong> {e(recibo['periodo'])} &middot; <strong>Emitido:</strong> {e(recibo['emitido'])}</p>
+<p><strong>Días trabajados:</strong> {recibo['dias']} &middot; <strong>Días feriados:</strong> {recibo['dias_feriados']}</p>
+{valor_hora}
+<h2>Horas</h2>
+<table>{filas_horas}</table>
+<h2>Liquidación</h2>
+<table>
+<tr><td>Sueldo bruto</td><td class='num'>{_moneda(recibo['bruto'])}</td></tr>
+{filas_descuentos}
+<tr class='neto'><td>Neto a cobrar</td><td class='num'>{_moneda(recibo['neto'])}</td></tr>
+</table>
+<h2>Detalle por día</h2>
+<table><tr>{encabezado_detalle}</tr>{filas_detalle}</table>
+</body>
+</html>
+"""
+
+def _moneda(valor: float) -> str:
+    return f"${valor:,.2f}"
@@ -0,0 +1,234 @@
+"""
+Módulo de reglas de pago
+Lee las reglas de recargo declaradas en reglas_pago.json y las compila una sola
+vez en un plan que se evalúa sobre columnas completas (intervalos y
+multiplicadores con numpy): agregar reglas no agrega trabajo por fila.
+
+Tipos de regla:
+- franja: {"desde": "20:00", "hasta": "22:00", "multiplicador": 1.3}
+  Horas del turno dentro del horario. Cuenta la franja que empieza el día de
+  entrada y, si cruza la medianoche (por ejemplo 22:00-06:00), también la que
+  empezó el día anterior.
+- horas_extra: {"despues_de": 8, "multiplicador": 1.5}
+  Horas del turno después de las primeras N.
+- feriado: {"multiplicador": 2}
+  Todo el turno, si la fecha de entrada es feriado.
+- domingo: {"multiplicador": 1.5}
+  Todo el turno, si la fecha de entrada es domingo.
+
+Si varias reglas por hora coinciden se aplica el mayor multiplicador, y lo
+mismo entre feriado y domingo; el multiplicador del día se aplica sobre el
+sueldo bruto del turno. El archivo tiene las reglas generales en "reglas" y,
+opcionalmente, un juego propio por sucursal en "sucursales" que reemplaza a las
+generales para esa sucursal. Los cambios en el archivo se toman al reiniciar.
+"""
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Archivo de reglas (se puede cambiar con la variable de entorno SUELDOS_REGLAS)
+RUTA_REGLAS = Path(os.environ.get("SUELDOS_REGLAS", Path(__file__).with_name("reglas_pago.json")))
+
+# Reglas si no hay archivo: las históricas de la aplicación
+REGLAS_PREDETERMINADAS = [
+    {"tipo": "franja", "desde": "20:00", "hasta": "22:00", "multiplicador": 1.3},
+    {"tipo": "feriado", "multiplicador": 2},
+]
+
+TIPOS_REGLA = ("franja", "horas_extra", "feriado", "domingo")
+
+NS_POR_HORA = 3_600_000_000_000
+NS_POR_DIA = 24 * NS_POR_HORA
+
+class ReglasInvalidas(ValueError):
+    """El archivo de reglas de pago tiene una regla mal declarada"""
+
+class PlanPago:
+    """
+    Reglas de pago compiladas: intervalos por hora (relativos al día de
+    entrada o al inicio del turno) con su multiplicador, y multiplicadores
+    por día. Se construye con compilar_reglas.
+    """
+
+    def __init__(self, franjas: List[Tuple[int, int, float]], extras: List[Tuple[int, float]],
+                 factor_feriado: Optional[float], factor_domingo: Optional[float], descripcion: List[str]):
+        self.franjas = franjas
+        self.extras = extras
+        self.factor_feriado = factor_feriado
+        self.factor_domingo = factor_domingo
+        self.descripcion = descripcion
+        # Multiplicadores por hora distintos, para separar las horas de cada uno
+        # (una regla con multiplicador 1 no genera horas especiales)
+        self.multiplicadores = sorted(({m for *_, m in franjas} | {m for _, m in extras}) - {1})
+
+    @property
+    def descripcion_especiales(self) -> str:
+        """Texto corto de las horas con recargo, por ejemplo "20:00-22:00" """
+        return ", ".join(self.descripcion)
+
+    def liquidar(self, dias: np.ndarray, entradas: np.ndarray, salidas: np.ndarray,
+                 feriados: np.ndarray, valor_por_hora: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Evalúa el plan sobre un lote de turnos
+
+        Args:
+            dias: Inicio del día de entrada de cada turno (ns desde 1970)
+            entradas: Entrada de cada turno (ns desde 1970)
+            salidas: Salida de cada turno (ns desde 1970, posterior a la entrada)
+            feriados: True en los turnos cuya fecha es feriado
+            valor_por_hora: Valor por hora de trabajo
+
+        Returns:
+            tuple: (horas_trabajadas, horas_normales, horas_especiales, sueldo_bruto), arrays por turno
+        """
+        horas = (salidas - entradas) / NS_POR_HORA
+
+        # Intervalos con recargo de cada turno, en ns absolutos
+        intervalos = [(dias + desde, dias + hasta, m) for desde, hasta, m in self.franjas]
+        intervalos += [(entradas + despues_de, salidas, m) for despues_de, m in self.extras]
+
+        horas_por_multiplicador = []
+        if intervalos:
+            # Los límites de los intervalos parten cada turno en tramos donde
+            # ninguna regla cambia; el punto medio de cada tramo decide su multiplicador
+            limites = np.column_stack([entradas, salidas] + [
+                np.clip(limite, entradas, salidas) for inicio, fin, _ in intervalos for limite in (inicio, fin)
+            ])
+            limites.sort(axis=1)
+            largos = np.diff(limites, axis=1)
+            medios = limites[:, :-1] + largos // 2
+
+            multiplicador = np.ones(largos.shape)
+            for inicio, fin, m in intervalos:
+                dentro = (medios >= inicio[:, None]) & (medios < fin[:, None])
+                multiplicador = np.where(dentro, np.maximum(multiplicador, m), multiplicador)
+
+            horas_por_multiplicador = [
+                (m, np.where(multiplicador == m, largos, 0).sum(axis=1)) for m in self.multiplicadores
+            ]
+
+        especiales_ns = sum((ns for _, ns in horas_por_multiplicador), np.zeros(len(entradas), dtype="int64"))
+        horas_especiales = especiales_ns / NS_POR_HORA
+        horas_normales = horas - horas_especiales
+
+        sueldo = horas_normales * valor_por_hora
+        for m, ns in horas_por_multiplicador:
+            sueldo = sueldo + ns / NS_POR_HORA * valor_por_hora * m
+
+        # Multiplicador del día: el mayor entre feriado y domingo
+        factor = np.ones(len(entradas))
+        if self.factor_feriado is not None:
+            factor = np.where(feriados, np.maximum(factor, self.factor_feriado), factor)
+        if self.factor_domingo is not None:
+            domingos = (dias // NS_POR_DIA + 3) % 7 == 6  # el 1/1/1970 fue jueves
+            factor = np.where(domingos, np.maximum(factor, self.factor_domingo), factor)
+
+        return horas, horas_normales, horas_especiales, sueldo * factor
+
+def compilar_reglas(reglas: List[Dict]) -> PlanPago:
+    """
+    Valida una lista de reglas y la compila en un plan de pago
+
+    Args:
+        reglas: Reglas como en reglas_pago.json
+
+    Returns:
+        PlanPago: Plan listo para evaluar
+
+    Raises:
+        ReglasInvalidas: Si alguna regla está mal declarada
+    """
+    franjas, extras, descripcion = [], [], []
+    factores = {"feriado": None, "domingo": None}
+
+    for posicion, regla in enumerate(reglas, start=1):
+        tipo = regla.get("tipo") if isinstance(regla, dict) else None
+        if tipo not in TIPOS_REGLA:
+            raise ReglasInvalidas(f"Regla {posicion}: tipo desconocido {tipo!r} (válidos: {', '.join(TIPOS_REGLA)})")
+        multiplicador = regla.get("multiplicador")
+        if isinstance(multiplicador, bool) or not isinstance(multiplicador, (int, float)) or multiplicador < 1:
+            raise ReglasInvalidas(f"Regla {posicion} ({tipo}): el multiplicador debe ser un número mayor o igual a 1")
+
+        if tipo == "franja":
+            desde = _hora_en_ns(regla.get("desde"), posicion)
+            hasta = _hora_en_ns(regla.get("hasta"), posicion)
+            if desde == hasta:
+                raise ReglasInvalidas(f"Regla {posicion} (franja): 'desde' y 'hasta' no pueden ser iguales")
+            if hasta < desde:
+                # Cruza la medianoche: la franja del día de entrada y la del día anterior
+                franjas.append((desde - NS_POR_DIA, hasta, multiplicador))
+                hasta += NS_POR_DIA
+            franjas.append((desde, hasta, multiplicador))
+            descripcion.append(f"{regla['desde']}-{regla['hasta']}")
+        elif tipo == "horas_extra":
+            despues_de = regla.get("despues_de")
+            if isinstance(despues_de, bool) or not isinstance(despues_de, (int, float)) or not 0 <= despues_de < 24:
+                raise ReglasInvalidas(f"Regla {posicion} (horas_extra): 'despues_de' debe ser una cantidad de horas entre 0 y 24")
+            extras.append((int(round(despues_de * NS_POR_HORA)), multiplicador))
+            descripcion.append(f"más de {despues_de:g} h")
+        else:
+            if factores[tipo] is not None:
+                raise ReglasInvalidas(f"Regla {posicion}: la regla '{tipo}' está repetida")
+            factores[tipo] = multiplicador
+
+    return PlanPago(franjas, extras, factores["feriado"], factores["domingo"], descripcion)
+
+def _hora_en_ns(texto, posicion: int) -> int:
+    """Convierte "HH:MM" a nanosegundos desde el inicio del día"""
+    try:
+        hora = datetime.strptime(texto, "%H:%M")
+    except (TypeError, ValueError):
+        raise ReglasInvalidas(f"Regla {posicion} (franja): {texto!r} no es una hora HH:MM") from None
+    return (hora.hour * 60 + hora.minute) * 60 * 1_000_000_000
+
+@lru_cache(maxsize=None)
+def cargar_planes(ruta: Path = RUTA_REGLAS) -> Tuple[PlanPago, Dict[str, PlanPago]]:
+    """
+    Lee y compila el archivo de reglas una vez por proceso
+
+    Args:
+        ruta: Archivo JSON de reglas; si no existe se usan REGLAS_PREDETERMINADAS
+
+    Returns:
+        tuple: (plan_general, {sucursal: plan})
+
+    Raises:
+        ReglasInvalidas: Si el archivo no es JSON válido o tiene reglas mal declaradas
+    """
+    if not Path(ruta).exists():
+        return compilar_reglas(REGLAS_PREDETERMINADAS), {}
+
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            configuracion = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ReglasInvalidas(f"{Path(ruta).name}: JSON inválido ({e})") from None
+
+    general = compilar_reglas(configuracion.get("reglas", REGLAS_PREDETERMINADAS))
+    por_sucursal = {}
+    for sucursal, reglas in configuracion.get("sucursales", {}).items():
+        try:
+            por_sucursal[sucursal] = compilar_reglas(reglas)
+        except ReglasInvalidas as e:
+            raise ReglasInvalidas(f"Sucursal {sucursal}: {e}") from None
+    return general, por_sucursal
+
+def plan_para_sucursal(sucursal=None) -> PlanPago:
+    """
+    Plan de pago de una sucursal (el general si no tiene reglas propias)
+
+    Args:
+        sucursal: Nombre de la sucursal, o None para el plan general
+
+    Returns:
+        PlanPago: Plan compilado
+    """
+    general, por_sucursal = cargar_planes()
+    if sucursal is None:
+        return general
+    return por_sucursal.get(sucursal, general)
@@ -0,0 +1,361 @@
+"""
+Servicio HTTP local del motor de cálculo
+Expone el cálculo de sueldos y el procesamiento de PDF sin pasar por la
+interfaz de Streamlit, para integraciones como el reloj de fichadas
+
+Uso:
+    python servicio_http.py                                  # http://127.0.0.1:8765
+    python servicio_http.py --puerto 9000 --trabajadores 4 --max-mb 10
+
+Endpoints:
+    GET  /salud      Estado del servicio
+    POST /calcular   Registros de asistencia en JSON, CSV o Parquet -> sueldos calculados
+    POST /pdf        Un PDF de asistencia -> sueldos calculados a partir de sus marcaciones
+
+Parámetros de cálculo en la query string: valor_por_hora y feriados (fechas
+AAAA-MM-DD separadas por coma). En JSON también pueden ir en el cuerpo:
+    {"valor_por_hora": 13937, "feriados": ["2024-10-12"], "registros": [{...}, ...]}
+
+Los registros sin asistencia y los incompletos (falta la entrada o la salida)
+se excluyen del cálculo y se informan en la respuesta. Cada respuesta incluye
+el encabezado Server-Timing con la duración de cada etapa.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as TiempoAgotado
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from instrumentacion import Traza, activar_traza, medir_etapa
+
+# Valor por hora si la solicitud no indica uno (el mismo que propone la interfaz)
+VALOR_POR_HORA_DEFECTO = 13937.0
+
+# Tamaño máximo del cuerpo de una solicitud
+MAX_BYTES_DEFECTO = 20 * 1024 * 1024
+
+# Segundos máximos de espera del trabajo en el pool por solicitud. Al vencer se
+# responde 504 y se cancela el trabajo si todavía no empezó; uno que ya corre
+# en un proceso del pool no se puede interrumpir y lo ocupa hasta terminar
+TIMEOUT_DEFECTO = 120
+
+TIPOS_REGISTROS = {
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/octet-stream": "parquet",
+}
+
+class ErrorSolicitud(Exception):
+    """Error atribuible a la solicitud: se responde con su código HTTP y el mensaje"""
+
+    def __init__(self, codigo: int, mensaje: str):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+class ServidorCalculo(ThreadingHTTPServer):
+    """
+    Servidor con un hilo por conexión y un pool de procesos compartido para
+    el trabajo de CPU (extracción de PDF y cálculo), de modo que las
+    solicitudes simultáneas no compiten por el GIL
+    """
+
+    daemon_threads = True
+
+    def __init__(self, direccion: Tuple[str, int], trabajadores: Optional[int] = None,
+                 max_bytes: int = MAX_BYTES_DEFECTO, timeout: float = TIMEOUT_DEFECTO):
+        super().__init__(direccion, ManejadorCalculo)
+        self.max_bytes = max_bytes
+        self.timeout_trabajo = timeout
+        try:
+            self.pool = ProcessPoolExecutor(max_workers=trabajadores, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError):
+            # Sin soporte de procesos, el trabajo se hace en hilos
+            self.pool = ThreadPoolExecutor(max_workers=trabajadores)
+
+        # Arrancar los procesos e importar el motor (también aquí) antes de la primera solicitud
+        for _ in range(trabajadores or os.cpu_count() or 1):
+            self.pool.submit(_precalentar)
+        _precalentar()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+class ManejadorCalculo(BaseHTTPRequestHandler):
+    server_version = "CalculadoraSueldos/1.0"
+
+    def do_GET(self):
+        self._atender({"/salud": self._salud})
+
+    def do_POST(self):
+        self._atender({"/calcular": self._calcular, "/pdf": self._pdf})
+
+    def _atender(self, rutas: Dict):
+        """Ejecuta el endpoint pedido midiendo sus etapas y responde en JSON"""
+        inicio = time.perf_counter()
+        traza = Traza()
+        url = urlsplit(self.path)
+
+        try:
+            endpoint = rutas.get(url.path)
+            if endpoint is None:
+                conocido = url.path in ("/salud", "/calcular", "/pdf")
+                raise ErrorSolicitud(405 if conocido else 404, "Método no permitido" if conocido else "Ruta inexistente")
+            with activar_traza(traza):
+                codigo, respuesta = 200, endpoint(parse_qs(url.query))
+        except ErrorSolicitud as e:
+            codigo, respuesta = e.codigo, {"error": str(e)}
+        except TiempoAgotado:
+            codigo, respuesta = 504, {"error": f"El procesamiento superó {self.server.timeout_trabajo:g} s"}
+        except Exception:
+            # El detalle queda en el log del servidor, no en la respuesta
+            self.log_error("Error interno en %s %s", self.command, url.path)
+            traceback.print_exc()
+            codigo, respuesta = 500, {"error": "Error interno del servidor"}
+
+        cuerpo = json.dumps(respuesta, ensure_ascii=False, default=_a_json).encode("utf-8")
+        etapas = [etapa for etapa in traza.a_dict()["etapas"] if etapa["nivel"] == 0]
+        tiempos = [f"{etapa['nombre']};dur={etapa['segundos'] * 1000:.1f}" for etapa in etapas]
+        tiempos.append(f"total;dur={(time.perf_counter() - inicio) * 1000:.1f}")
+
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("Server-Timing", ", ".join(tiempos))
+        if codigo == 413:
+            # El cuerpo no se leyó: no reutilizar la conexión
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _salud(self, _parametros) -> Dict:
+        return {"estado": "ok"}
+
+    def _calcular(self, parametros) -> Dict:
+        from data_processor import leer_csv_asistencia, leer_parquet_asistencia, aplicar_esquema_asistencia
+        import pandas as pd
+
+        tipo = TIPOS_REGISTROS.get(self._tipo_contenido())
+        if tipo is None:
+            raise ErrorSolicitud(415, f"Tipo de contenido no soportado. Se acepta: {', '.join(TIPOS_REGISTROS)}")
+        cuerpo = self._leer_cuerpo()
+
+        with medir_etapa("leer") as medicion:
+            try:
+                if tipo == "json":
+                    datos = json.loads(cuerpo)
+                    if isinstance(datos, dict):
+                        parametros = {**parametros, **{
+                            clave: [datos[clave]] for clave in ("valor_por_hora", "feriados") if clave in datos
+                        }}
+                        datos = datos.get("registros", [])
+                    df = aplicar_esquema_asistencia(pd.DataFrame(datos))
+                elif tipo == "csv":
+                    df = leer_csv_asistencia(io.BytesIO(cuerpo))
+                else:
+                    df = leer_parquet_asistencia(io.BytesIO(cuerpo))
+            except (ValueError, TypeError) as e:
+                raise ErrorSolicitud(400, f"No se pudieron leer los registros: {e}")
+            medicion.contar(filas=len(df))
+
+        return self._liquidar(df, parametros)
+
+    def _pdf(self, parametros) -> Dict:
+        if self._tipo_contenido() not in ("application/pdf", "application/octet-stream"):
+            raise ErrorSolicitud(415, "Se espera un PDF (application/pdf)")
+        cuerpo = self._leer_cuerpo()
+
+        with medir_etapa("pdf") as medicion:
+            df, error, lineas_omitidas = self._en_pool(_extraer_pdf, cuerpo)
+            if df is not None:
+                medicion.contar(filas=len(df))
+        if error:
+            raise ErrorSolicitud(422, f"No se pudo procesar el PDF: {error}")
+        if df.empty:
+            raise ErrorSolicitud(422, "No se encontraron marcaciones en el PDF")
+
+        respuesta = self._liquidar(df, parametros)
+        respuesta["lineas_omitidas"] = lineas_omitidas
+        return respuesta
+
+    def _liquidar(self, df, parametros) -> Dict:
+        """Valida, depura y calcula los registros en el pool, y arma la respuesta"""
+        from data_processor import resultados_tipados, validar_archivo_excel
+        from pdf_processor import detectar_registros_incompletos, filtrar_registros_sin_asistencia
+        import pandas as pd
+
+        valor_por_hora, fechas_feriados = _parametros_calculo(parametros)
+
+        es_valido, columnas_faltantes = validar_archivo_excel(df)
+        if not es_valido:
+            raise ErrorSolicitud(400, f"Faltan las columnas: {', '.join(columnas_faltantes)}")
+
+        with medir_etapa("depurar"):
+            df_con_asistencia, df_sin_asistencia = filtrar_registros_sin_asistencia(df)
+            df_incompletos = detectar_registros_incompletos(df_con_asistencia)
+            df_completos = df_con_asistencia.drop(df_incompletos.index)
+
+        with medir_etapa("calcular", filas=len(df_completos)):
+            resultados, horas, sueldos, errores, _, tipadas = self._en_pool(
+                _calcular, df_completos, valor_por_hora, fechas_feriados
+            )
+
+        with medir_etapa("responder", filas=len(resultados)):
+            tipado = resultados_tipados(pd.DataFrame(resultados), tipadas)
+            if not tipado.empty:
+                tipado["fecha"] = tipado["fecha"].dt.strftime("%Y-%m-%d")
+
+            return {
+                "valor_por_hora": valor_por_hora,
+                "feriados": sorted(fechas_feriados),
+                "total_horas": round(sum(horas), 4),
+                "total_sueldos": round(sum(sueldos), 2),
+                "registros_calculados": len(resultados),
+                "registros_sin_asistencia": len(df_sin_asistencia),
+                "incompletos": [
+                    {"empleado": fila.Empleado, "fecha": _fecha_iso(fila.Fecha), "dato_faltante": fila.Dato_Faltante}
+                    for fila in df_incompletos.itertuples(index=False)
+                ],
+                "errores": errores,
+                "resultados": json.loads(tipado.to_json(orient="records", force_ascii=False)) if not tipado.empty else [],
+            }
+
+    def _en_pool(self, funcion, *args):
+        """
+        Ejecuta la función en el pool y espera su resultado hasta el timeout.
+        Si vence, cancela el trabajo que sigue en cola; el que ya empezó no se
+        puede detener en su proceso y termina en segundo plano (el pool acota
+        cuántos corren a la vez)
+
+        Raises:
+            TiempoAgotado: Si el trabajo no terminó a tiempo
+        """
+        futuro = self.server.pool.submit(funcion, *args)
+        try:
+            return futuro.result(timeout=self.server.timeout_trabajo)
+        except TiempoAgotado:
+            futuro.cancel()
+            raise
+
+    def _tipo_contenido(self) -> str:
+        return (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+    def _leer_cuerpo(self) -> bytes:
+        """Lee el cuerpo respetando el límite de tamaño (sin leerlo si lo excede)"""
+        longitud = self.headers.get("Content-Length")
+        if longitud is None:
+            raise ErrorSolicitud(411, "Falta el encabezado Content-Length")
+        try:
+            longitud = int(longitud)
+        except ValueError:
+            raise ErrorSolicitud(400, "Content-Length inválido")
+        if longitud > self.server.max_bytes:
+            raise ErrorSolicitud(413, f"La solicitud supera el máximo de {self.server.max_bytes / (1024 * 1024):g} MB")
+
+        with medir_etapa("recibir", bytes=longitud):
+            return self.rfile.read(longitud)
+
+def _parametros_calculo(parametros: Dict[str, List]) -> Tuple[float, set]:
+    """Valor por hora y fechas de feriados a partir de la query string (o del cuerpo JSON)"""
+    try:
+        valor_por_hora = float(parametros.get("valor_por_hora", [VALOR_POR_HORA_DEFECTO])[-1])
+    except (TypeError, ValueError):
+        raise ErrorSolicitud(400, "valor_por_hora debe ser un número")
+
+    fechas = []
+    for valor in parametros.get("feriados", []):
+        fechas.extend(valor if isinstance(valor, list) else str(valor).split(","))
+    try:
+        fechas_feriados = {date.fromisoformat(str(fecha).strip()) for fecha in fechas if str(fecha).strip()}
+    except ValueError:
+        raise ErrorSolicitud(400, "feriados debe tener fechas AAAA-MM-DD separadas por coma")
+
+    return valor_por_hora, fechas_feriados
+
+def _precalentar():
+    """Importa los módulos de cálculo (en los procesos del pool y en el servidor)"""
+    import data_processor
+    import pdf_processor
+
+def _extraer_pdf(contenido: bytes):
+    """
+    Tarea del pool: (marcaciones, error, líneas de encabezado/pie omitidas) de un PDF.
+    El error vuelve como texto en la tupla: no depende de lo que la etapa que
+    falló deje en el DataFrame ni de que sus attrs crucen al proceso del servidor
+    """
+    from pdf_processor import ETAPAS_PDF
+
+    try:
+        datos = io.BytesIO(contenido)
+        for etapa in ETAPAS_PDF:
+            datos = etapa(datos)
+    except Exception as e:
+        return None, str(e) or type(e).__name__, 0
+    return datos, None, datos.attrs.get("lineas_omitidas", 0)
+
+def _calcular(df, valor_por_hora, fechas_feriados):
+    """Tarea del pool: calcula un lote con el motor de cálculo"""
+    from data_processor import calcular_lote
+
+    return calcular_lote(df, valor_por_hora, fechas_feriados)
+
+def _fecha_iso(fecha) -> Optional[str]:
+    return fecha.strftime("%Y-%m-%d") if hasattr(fecha, "strftime") and fecha == fecha else None
+
+def _a_json(valor):
+    """Convierte a JSON los tipos de numpy/pandas y las fechas"""
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+def crear_servidor(host: str = "127.0.0.1", puerto: int = 8765, trabajadores: Optional[int] = None,
+                   max_bytes: int = MAX_BYTES_DEFECTO, timeout: float = TIMEOUT_DEFECTO) -> ServidorCalculo:
+    """
+    Crea el servidor (sin iniciarlo): servidor.serve_forever() para atender,
+    servidor.shutdown() y servidor.server_close() para detenerlo
+
+    Args:
+        host: Dirección donde escuchar (por defecto solo local)
+        puerto: Puerto (0 para uno libre, ver servidor.server_address)
+        trabajadores: Procesos del pool de cálculo (por defecto según CPUs)
+        max_bytes: Tamaño máximo del cuerpo de una solicitud
+        timeout: Segundos máximos de trabajo en el pool por solicitud
+
+    Returns:
+        ServidorCalculo: Servidor listo para atender
+    """
+    return ServidorCalculo((host, puerto), trabajadores, max_bytes, timeout)
+
+def main(argumentos: List[str] = None):
+    opciones = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    opciones.add_argument("--host", default="127.0.0.1", help="Dirección donde escuchar")
+    opciones.add_argument("--puerto", type=int, default=8765, help="Puerto")
+    opciones.add_argument("--trabajadores", type=int, default=None, help="Procesos del pool de cálculo")
+    opciones.add_argument("--max-mb", type=float, default=MAX_BYTES_DEFECTO / (1024 * 1024), help="Tamaño máximo de una solicitud en MB")
+    opciones.add_argument("--timeout", type=float, default=TIMEOUT_DEFECTO, help="Segundos máximos de trabajo por solicitud")
+    args = opciones.parse_args(argumentos)
+
+    servidor = crear_servidor(args.host, args.puerto, args.trabajadores, int(args.max_mb * 1024 * 1024), args.timeout)
+    host, puerto = servidor.server_address[:2]
+    print(f"Servicio de cálculo en http://{host}:{puerto} (Ctrl+C para detener)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
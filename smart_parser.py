@@ -4,34 +4,43 @@ Maneja automáticamente separación y agrupamiento de datos
 """
 import re
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
-import pandas as pd
+from instrumentacion import medido
+
+# Patrones compilados una sola vez por proceso y compartidos por todas las instancias
+_PATRONES_FECHA = [
+    re.compile(r'(\d{4}-\d{2}-\d{2})'),  # YYYY-MM-DD
+    re.compile(r'(\d{1,2}/\d{1,2}/\d{4})'),  # DD/MM/YYYY o MM/DD/YYYY
+    re.compile(r'(\d{1,2}-\d{1,2}-\d{4})'),  # DD-MM-YYYY
+    re.compile(r'(\d{1,2}\.\d{1,2}\.\d{4})'),  # DD.MM.YYYY
+]
+
+_PATRONES_HORA = [
+    re.compile(r'(\d{1,2}:\d{2}:\d{2})'),  # HH:MM:SS
+    re.compile(r'(\d{1,2}:\d{2})'),  # HH:MM
+    re.compile(r'(\d{1,2}\.\d{2})'),  # HH.MM
+]
+
+_PATRONES_FECHA_HORA = [
+    re.compile(r'(\d{4}-\d{2}-\d{2})\s+(\d{1,2}:\d{2}:\d{2})'),  # YYYY-MM-DD HH:MM:SS
+    re.compile(r'(\d{4}-\d{2}-\d{2})\s+(\d{1,2}:\d{2})'),  # YYYY-MM-DD HH:MM
+    re.compile(r'(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}:\d{2})'),  # DD/MM/YYYY HH:MM:SS
+    re.compile(r'(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2})'),  # DD/MM/YYYY HH:MM
+    re.compile(r'(\d{1,2}-\d{1,2}-\d{4})\s+(\d{1,2}:\d{2}:\d{2})'),  # DD-MM-YYYY HH:MM:SS
+    re.compile(r'(\d{1,2}-\d{1,2}-\d{4})\s+(\d{1,2}:\d{2})'),  # DD-MM-YYYY HH:MM
+]
+
+_FECHA_ISO, _FECHA_BARRAS, _FECHA_GUIONES, _FECHA_PUNTOS = _PATRONES_FECHA
+_HORA_SEGUNDOS, _HORA_MINUTOS, _HORA_PUNTO = _PATRONES_HORA
 
 class SmartTimeParser:
     """Clase para parsing inteligente de fechas y horas"""
     
     def __init__(self):
-        self.patrones_fecha = [
-            r'(\d{4}-\d{2}-\d{2})',  # YYYY-MM-DD
-            r'(\d{1,2}/\d{1,2}/\d{4})',  # DD/MM/YYYY o MM/DD/YYYY
-            r'(\d{1,2}-\d{1,2}-\d{4})',  # DD-MM-YYYY
-            r'(\d{1,2}\.\d{1,2}\.\d{4})',  # DD.MM.YYYY
-        ]
-        
-        self.patrones_hora = [
-            r'(\d{1,2}:\d{2}:\d{2})',  # HH:MM:SS
-            r'(\d{1,2}:\d{2})',  # HH:MM
-            r'(\d{1,2}\.\d{2})',  # HH.MM
-        ]
-        
-        self.patrones_fecha_hora = [
-            r'(\d{4}-\d{2}-\d{2})\s+(\d{1,2}:\d{2}:\d{2})',  # YYYY-MM-DD HH:MM:SS
-            r'(\d{4}-\d{2}-\d{2})\s+(\d{1,2}:\d{2})',  # YYYY-MM-DD HH:MM
-            r'(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}:\d{2})',  # DD/MM/YYYY HH:MM:SS
-            r'(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2})',  # DD/MM/YYYY HH:MM
-            r'(\d{1,2}-\d{1,2}-\d{4})\s+(\d{1,2}:\d{2}:\d{2})',  # DD-MM-YYYY HH:MM:SS
-            r'(\d{1,2}-\d{1,2}-\d{4})\s+(\d{1,2}:\d{2})',  # DD-MM-YYYY HH:MM
-        ]
+        self.patrones_fecha = _PATRONES_FECHA
+        self.patrones_hora = _PATRONES_HORA
+        self.patrones_fecha_hora = _PATRONES_FECHA_HORA
     
     def extraer_fecha_hora(self, texto: str) -> List[Dict]:
         """
@@ -47,7 +56,7 @@ class SmartTimeParser:
         
         # Buscar patrones de fecha y hora juntas
         for patron in self.patrones_fecha_hora:
-            matches = re.finditer(patron, texto)
+            matches = patron.finditer(texto)
             for match in matches:
                 fecha_str = match.group(1)
                 hora_str = match.group(2)
@@ -77,25 +86,25 @@ class SmartTimeParser:
         """
         try:
             # Formato YYYY-MM-DD (ya normalizado)
-            if re.match(r'\d{4}-\d{2}-\d{2}', fecha_str):
+            if _FECHA_ISO.match(fecha_str):
                 return fecha_str
             
             # Formato DD/MM/YYYY
-            if re.match(r'\d{1,2}/\d{1,2}/\d{4}', fecha_str):
+            if _FECHA_BARRAS.match(fecha_str):
                 partes = fecha_str.split('/')
                 if len(partes) == 3:
                     dia, mes, año = partes
                     return f"{año}-{mes.zfill(2)}-{dia.zfill(2)}"
             
             # Formato DD-MM-YYYY
-            if re.match(r'\d{1,2}-\d{1,2}-\d{4}', fecha_str):
+            if _FECHA_GUIONES.match(fecha_str):
                 partes = fecha_str.split('-')
                 if len(partes) == 3:
                     dia, mes, año = partes
                     return f"{año}-{mes.zfill(2)}-{dia.zfill(2)}"
             
             # Formato DD.MM.YYYY
-            if re.match(r'\d{1,2}\.\d{1,2}\.\d{4}', fecha_str):
+            if _FECHA_PUNTOS.match(fecha_str):
                 partes = fecha_str.split('.')
                 if len(partes) == 3:
                     dia, mes, año = partes
@@ -118,16 +127,16 @@ class SmartTimeParser:
         """
         try:
             # Formato HH:MM:SS -> HH:MM
-            if re.match(r'\d{1,2}:\d{2}:\d{2}', hora_str):
+            if _HORA_SEGUNDOS.match(hora_str):
                 return hora_str[:5]
             
             # Formato HH:MM (ya normalizado)
-            if re.match(r'\d{1,2}:\d{2}', hora_str):
+            if _HORA_MINUTOS.match(hora_str):
                 partes = hora_str.split(':')
                 return f"{partes[0].zfill(2)}:{partes[1]}"
             
             # Formato HH.MM -> HH:MM
-            if re.match(r'\d{1,2}\.\d{2}', hora_str):
+            if _HORA_PUNTO.match(hora_str):
                 return hora_str.replace('.', ':')
                 
         except Exception:
@@ -191,8 +200,8 @@ class EntradaSalidaDetector:
     def _analizar_contexto(self, context: List[str], hora: str) -> str:
         """Analiza el contexto para determinar tipo"""
         # Si hay otras horas en el contexto, comparar
+        parser = obtener_parsers()[0]
         for linea in context:
-            parser = SmartTimeParser()
             fecha_horas = parser.extraer_fecha_hora(linea)
             
             for fh in fecha_horas:
@@ -212,9 +221,22 @@ class EntradaSalidaDetector:
         
         return 'Entrada'  # Por defecto
 
+@lru_cache(maxsize=None)
+def obtener_parsers() -> Tuple["SmartTimeParser", "EntradaSalidaDetector"]:
+    """
+    Devuelve el parser y el detector compartidos por todo el proceso.
+    No guardan estado entre llamadas, así que todas las sesiones y hilos
+    pueden usar las mismas instancias.
+    
+    Returns:
+        Tuple: (SmartTimeParser, EntradaSalidaDetector)
+    """
+    return SmartTimeParser(), EntradaSalidaDetector()
+
 class DataGrouper:
     """Clase para agrupar datos por empleado y fecha"""
     
+    @medido("parser.agrupar_por_empleado_fecha", contar=lambda resultado: {"registros": len(resultado)})
     def agrupar_por_empleado_fecha(self, datos: List[Dict]) -> List[Dict]:
         """
         Agrupa datos por empleado y fecha, combinando entradas y salidas
@@ -0,0 +1,88 @@
+"""
+Módulo de tareas en segundo plano
+Ejecuta procesos largos en un hilo aparte con progreso real y cancelación
+"""
+import contextvars
+import threading
+import time
+from typing import Callable, Optional
+
+class TareaCancelada(Exception):
+    """Se lanza dentro de la tarea cuando el usuario pidió cancelarla"""
+
+class TareaEnSegundoPlano:
+    """
+    Ejecuta una función en un hilo aparte. La función recibe el argumento
+    `progreso(etapa, fraccion)` para informar su avance (fraccion de 0 a 1);
+    cada llamada también verifica si la tarea fue cancelada.
+    """
+
+    def __init__(self, funcion: Callable, *args, **kwargs):
+        self._funcion = funcion
+        self._args = args
+        self._kwargs = kwargs
+        # Copiar el contexto (por ejemplo, la traza de rendimiento activa) al hilo
+        self._contexto = contextvars.copy_context()
+        self._lock = threading.Lock()
+        self._cancelar = threading.Event()
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+
+        self.etapa = "En espera"
+        self.fraccion = 0.0
+        self.inicio = None
+        self.fin = None
+        self.resultado = None
+        self.error = None
+
+    def iniciar(self) -> "TareaEnSegundoPlano":
+        """Inicia la tarea (solo la primera vez)"""
+        if self.inicio is None:
+            self.inicio = time.perf_counter()
+            self._hilo.start()
+        return self
+
+    def cancelar(self):
+        """Pide la cancelación; la tarea se detiene en su próximo reporte de progreso"""
+        self._cancelar.set()
+
+    def progreso(self, etapa: str, fraccion: float):
+        """Callback de progreso que recibe la función de la tarea"""
+        if self._cancelar.is_set():
+            raise TareaCancelada()
+        with self._lock:
+            self.etapa = etapa
+            self.fraccion = min(max(fraccion, 0.0), 1.0)
+
+    @property
+    def terminada(self) -> bool:
+        return self.fin is not None
+
+    @property
+    def cancelada(self) -> bool:
+        return isinstance(self.error, TareaCancelada)
+
+    @property
+    def porcentaje(self) -> int:
+        return int(self.fraccion * 100)
+
+    @property
+    def eta_segundos(self) -> Optional[float]:
+        """Tiempo restante estimado a partir del avance actual"""
+        with self._lock:
+            fraccion = self.fraccion
+        if self.inicio is None or fraccion <= 0 or self.terminada:
+            return None
+        transcurrido = time.perf_counter() - self.inicio
+        return transcurrido / fraccion * (1 - fraccion)
+
+    def _ejecutar(self):
+        try:
+            self.resultado = self._contexto.run(self._funcion, *self._args, progreso=self.progreso, **self._kwargs)
+            # Sin verificar la cancelación: una tarea terminada conserva su resultado
+            with self._lock:
+                self.etapa = "Completado"
+                self.fraccion = 1.0
+        except Exception as e:
+            self.error = e
+        finally:
+            self.fin = time.perf_counter()
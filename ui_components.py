@@ -6,6 +6,31 @@ import streamlit as st
 import calendar
 from datetime import datetime
 
+# Fragmentos: secciones de la página que se vuelven a ejecutar solas al
+# interactuar con sus widgets (st.experimental_fragment en versiones anteriores)
+fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", lambda funcion: funcion)
+
+def publicar_entradas(nombre, valores, clave=None):
+    """
+    Publica en session_state los valores producidos por un fragmento para que
+    las demás secciones los lean. Si cambiaron respecto a la ejecución anterior,
+    vuelve a ejecutar la página completa para recalcular las secciones que
+    dependen de ellos; si no, el rerun queda limitado al fragmento.
+    
+    Args:
+        nombre: Nombre de los valores en st.session_state
+        valores: Valores a publicar
+        clave: Valor comparable que identifica a los valores (por defecto, los mismos valores)
+    """
+    clave = valores if clave is None else clave
+    cambiaron = f"{nombre}_clave" in st.session_state and st.session_state[f"{nombre}_clave"] != clave
+    
+    st.session_state[nombre] = valores
+    st.session_state[f"{nombre}_clave"] = clave
+    
+    if cambiaron:
+        st.rerun()
+
 def mostrar_input_valor_hora():
     """
     Muestra el input para el valor por hora con estilo mejorado
@@ -34,14 +59,19 @@ def mostrar_descarga_plantilla():
     </div>
     """, unsafe_allow_html=True)
     
+    st.download_button(
+        "Descargar Plantilla Excel", 
+        _leer_plantilla(), 
+        file_name="plantilla_sueldo.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        help="Descarga la plantilla oficial para cargar datos de empleados"
+    )
+
+@st.cache_resource(show_spinner=False)
+def _leer_plantilla() -> bytes:
+    """Lee la plantilla Excel una sola vez por proceso y la comparte entre sesiones"""
     with open("plantilla_sueldos_feriados_dias.xlsx", "rb") as f:
-        st.download_button(
-            "Descargar Plantilla Excel", 
-            f, 
-            file_name="plantilla_sueldo.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            help="Descarga la plantilla oficial para cargar datos de empleados"
-        )
+        return f.read()
 
 def configurar_feriados():
     """
@@ -50,10 +80,17 @@ def configurar_feriados():
     Returns:
         tuple: (opcion_feriados, fechas_feriados, cantidad_feriados)
     """
-    st.markdown("""
+    from reglas_pago import plan_para_sucursal
+    
+    factor_feriado = plan_para_sucursal().factor_feriado
+    recargo = (
+        f"Los días feriados se pagan ×{factor_feriado:g} automáticamente."
+        if factor_feriado else "Las reglas de pago no tienen recargo por feriado."
+    )
+    st.markdown(f"""
     <div class="custom-alert alert-info">
         <strong>📅 Selecciona hasta 3 fechas de feriados</strong><br>
-        Los días feriados reciben doble pago automáticamente.
+        {recargo}
     </div>
     """, unsafe_allow_html=True)
     
@@ -151,13 +188,14 @@ def mostrar_subida_archivo():
         <div class="custom-alert alert-info">
             <strong>Modo Excel Tradicional</strong><br>
             Sube tu archivo Excel completado con todos los datos de empleados.
+            También se aceptan archivos CSV y Parquet con las mismas columnas.
         </div>
         """, unsafe_allow_html=True)
         
         archivo = st.file_uploader(
             "Sube tu archivo Excel completado:",
-            type=["xlsx"],
-            help="Archivo Excel con columnas: Empleado, Fecha, Entrada, Salida, Descuento Inventario, Descuento Caja, Retiro",
+            type=["xlsx", "csv", "parquet"],
+            help="Archivo Excel, CSV o Parquet con columnas: Empleado, Fecha, Entrada (HH:MM), Salida (HH:MM), Descuento Inventario, Descuento Caja, Retiro",
             key="excel_uploader"
         )
         return archivo, "excel"
@@ -199,20 +237,29 @@ def mostrar_subida_archivo():
         return archivos, "pdf"
 
 
-def mostrar_editor_registros_incompletos(df_incompletos):
+# Hora válida en la grilla de correcciones (H:MM o HH:MM)
+PATRON_HORA_GRILLA = r"^([01]?\d|2[0-3]):[0-5]\d$"
+
+def mostrar_editor_registros_incompletos(df_incompletos, df_referencia=None, clave=None):
     """
-    Muestra una interfaz para completar registros con entrada o salida faltante.
+    Muestra una grilla editable para completar registros con entrada o salida faltante.
     NOTA: Solo muestra registros donde falta UNO de los dos datos.
     Si faltan ambos, se excluyen automáticamente).
     
+    Todas las filas se editan en una sola grilla y las acciones masivas se
+    calculan de forma vectorial, así que la página tarda lo mismo con 5 o con
+    500 registros incompletos. Además de la hora faltante se aplica la otra
+    hora de la fila si se editó (y se valida igual).
+    
     Args:
         df_incompletos: DataFrame con registros incompletos (falta solo entrada o solo salida)
+        df_referencia: Registros completos del período, para sugerir la mediana de cada empleado
+        clave: Huella del contenido de df_incompletos (se calcula si no se indica)
         
     Returns:
         bool: True si se aplicaron correcciones, False si aún están pendientes
     """
     import pandas as pd
-    from datetime import datetime
     
     if df_incompletos.empty:
         return df_incompletos
@@ -233,109 +280,342 @@ def mostrar_editor_registros_incompletos(df_incompletos):
     </div>
     """, unsafe_allow_html=True)
     
-    # Inicializar session_state para las correcciones si no existe
-    if 'correcciones_horarios' not in st.session_state:
-        st.session_state.correcciones_horarios = {}
-    
-    # Mostrar cada registro incompleto
-    for idx, row in df_incompletos.iterrows():
-        with st.expander(
-            f"👤 {row['Empleado']} -  {row['Fecha']} -  Falta: {row['Dato_Faltante']}", 
-            expanded=True
-        ):
-            col1, col2, col3 = st.columns([2, 2, 1])
-            
-            with col1:
-                # Input para Entrada (considerar 0:00 como faltante)
-                entrada_actual = str(row['Entrada']).strip()
-                entrada_es_valida = (
-                    pd.notna(row['Entrada']) and 
-                    entrada_actual != '' and 
-                    entrada_actual not in ['0:00', '00:00', 'nan']
-                )
-                
-                if 'Entrada' in row['Dato_Faltante']:
-                    # Necesita completar entrada
-                    st.markdown(" **Hora de Entrada** ⚠️ *Faltante*")
-                    if entrada_actual in ['0:00', '00:00']:
-                        st.caption(f"Valor actual: {entrada_actual} (inválido)")
-                    entrada_key = f"entrada_{idx}"
-                    entrada_corregida = st.time_input(
-                        "Ingresa la hora de entrada:",
-                        value=datetime.strptime("08:00", "%H:%M").time(),
-                        key=entrada_key,
-                        help="Hora aproximada en que el empleado ingresó"
-                    )
-                    st.session_state.correcciones_horarios[f"{idx}_entrada"] = entrada_corregida.strftime("%H:%M")
-                else:
-                    # Ya tiene entrada válida
-                    st.markdown(f" **Hora de Entrada:** {entrada_actual} ")
-            
-            with col2:
-                # Input para Salida (considerar 0:00 como faltante)
-                salida_actual = str(row['Salida']).strip()
-                salida_es_valida = (
-                    pd.notna(row['Salida']) and 
-                    salida_actual != '' and 
-                    salida_actual not in ['0:00', '00:00', 'nan']
-                )
-                
-                if 'Salida' in row['Dato_Faltante']:
-                    # Necesita completar salida
-                    st.markdown(" **Hora de Salida**  *Faltante*")
-                    if salida_actual in ['0:00', '00:00']:
-                        st.caption(f"Valor actual: {salida_actual} (inválido)")
-                    salida_key = f"salida_{idx}"
-                    salida_corregida = st.time_input(
-                        "Ingresa la hora de salida:",
-                        value=datetime.strptime("17:00", "%H:%M").time(),
-                        key=salida_key,
-                        help="Hora aproximada en que el empleado salió"
-                    )
-                    st.session_state.correcciones_horarios[f"{idx}_salida"] = salida_corregida.strftime("%H:%M")
-                else:
-                    # Ya tiene salida
-                    st.markdown(f" **Hora de Salida:** {salida_actual} ")
-            
-            with col3:
-                st.markdown("**Estado**")
-                if f"{idx}_entrada" in st.session_state.correcciones_horarios or f"{idx}_salida" in st.session_state.correcciones_horarios:
-                    st.success(" Listo")
-                else:
-                    st.warning(" Pendiente")
+    # La grilla vive en la sesión para que las acciones masivas y las ediciones se acumulen.
+    # Se identifica por el contenido: otro archivo con las mismas posiciones de
+    # índice no reutiliza la grilla (ni las ediciones) del anterior
+    if clave is None:
+        from data_processor import huella_dataframe
+        clave = huella_dataframe(df_incompletos)
+    clave_grilla = clave
+    guardada = st.session_state.get("grilla_correcciones")
+    if guardada is None or guardada[0] != clave_grilla:
+        grilla = pd.DataFrame({
+            "Empleado": df_incompletos["Empleado"].astype(str),
+            "Fecha": df_incompletos["Fecha"].astype(str).str[:10],
+            "Falta": df_incompletos["Dato_Faltante"],
+            # La celda faltante queda vacía (también los 0:00 inválidos)
+            "Entrada": df_incompletos["Entrada"].where(df_incompletos["Dato_Faltante"] != "Entrada", "").astype(str),
+            "Salida": df_incompletos["Salida"].where(df_incompletos["Dato_Faltante"] != "Salida", "").astype(str),
+        }, index=df_incompletos.index)
+        guardada = (clave_grilla, grilla, 0)
+        st.session_state.grilla_correcciones = guardada
+    _, grilla, version = guardada
+    
+    # Acciones masivas sobre todas las celdas faltantes
+    st.markdown("#### Completar todos los faltantes")
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    with col1:
+        entrada_defecto = st.time_input("Entrada por defecto:", value=datetime.strptime("08:00", "%H:%M").time())
+    with col2:
+        salida_defecto = st.time_input("Salida por defecto:", value=datetime.strptime("17:00", "%H:%M").time())
+    with col3:
+        st.markdown("<div style='margin-top: 1.5rem;'></div>", unsafe_allow_html=True)
+        completar_defecto = st.button("Usar hora por defecto", use_container_width=True,
+                                      help="Completa todas las celdas faltantes con la hora por defecto")
+    with col4:
+        st.markdown("<div style='margin-top: 1.5rem;'></div>", unsafe_allow_html=True)
+        completar_mediana = st.button("Usar mediana del empleado", use_container_width=True,
+                                      help="Completa con la hora mediana de los días completos de cada empleado; "
+                                           "si no tiene días completos, usa la hora por defecto")
+    
+    if completar_defecto or completar_mediana:
+        grilla = grilla.copy()
+        for columna, defecto in (("Entrada", entrada_defecto), ("Salida", salida_defecto)):
+            faltantes = (grilla["Falta"] == columna) & (grilla[columna] == "")
+            valores = pd.Series(defecto.strftime("%H:%M"), index=grilla.index)
+            if completar_mediana and df_referencia is not None:
+                medianas = _medianas_por_empleado(df_referencia, columna)
+                valores = grilla["Empleado"].map(medianas).fillna(valores)
+            grilla.loc[faltantes, columna] = valores[faltantes]
+        # Nueva versión de la grilla: el editor se vuelve a crear con los valores completados
+        version += 1
+        st.session_state.grilla_correcciones = (clave_grilla, grilla, version)
+    
+    grilla_editada = st.data_editor(
+        grilla,
+        key=f"editor_correcciones_{clave_grilla}_{version}",
+        hide_index=True,
+        use_container_width=True,
+        num_rows="fixed",
+        disabled=["Empleado", "Fecha", "Falta"],
+        column_config={
+            "Entrada": st.column_config.TextColumn("Entrada (HH:MM)", validate=PATRON_HORA_GRILLA),
+            "Salida": st.column_config.TextColumn("Salida (HH:MM)", validate=PATRON_HORA_GRILLA),
+        },
+    )
+    
+    # Celdas a aplicar: la faltante de cada fila y la otra hora si se editó
+    horas_editadas = {
+        columna: grilla_editada[columna].fillna("").astype(str).str.strip()
+        for columna in ("Entrada", "Salida")
+    }
+    a_aplicar = {
+        columna: (grilla_editada["Falta"] == columna) | (horas_editadas[columna] != grilla[columna].str.strip())
+        for columna in ("Entrada", "Salida")
+    }
+    # Celdas a aplicar que todavía no tienen una hora válida
+    pendientes = (
+        (a_aplicar["Entrada"] & ~horas_editadas["Entrada"].str.match(PATRON_HORA_GRILLA)) |
+        (a_aplicar["Salida"] & ~horas_editadas["Salida"].str.match(PATRON_HORA_GRILLA))
+    )
+    cantidad_pendientes = int(pendientes.sum())
+    
+    if cantidad_pendientes:
+        st.warning(f" {cantidad_pendientes} de {len(grilla_editada)} registro(s) pendiente(s)")
+    else:
+        st.success(f" {len(grilla_editada)} registro(s) listos")
     
     # Botón para aplicar correcciones
     st.markdown("---")
     if st.button(" Aplicar Correcciones y Continuar", type="primary", use_container_width=True):
+        if cantidad_pendientes:
+            st.error("Completa las horas faltantes (y las editadas) con el formato HH:MM antes de continuar")
+            return False
+        
+        # Una fila por celda corregida: (indice, columna, valor)
+        st.session_state.correcciones_horarios = pd.concat([
+            pd.DataFrame({
+                "indice": grilla_editada.index[a_aplicar[columna]],
+                "columna": columna,
+                "valor": horas_editadas[columna][a_aplicar[columna]].values,
+            })
+            for columna in ("Entrada", "Salida")
+        ], ignore_index=True)
         return True
     
     return False
 
 
-def aplicar_correcciones_a_dataframe(df_original, df_incompletos):
+def _medianas_por_empleado(df_referencia, columna):
+    """
+    Hora mediana (HH:MM) de una columna por empleado, calculada sobre los
+    registros que tienen entrada y salida válidas
+    
+    Args:
+        df_referencia: Registros del período
+        columna: "Entrada" o "Salida"
+        
+    Returns:
+        Series: Hora mediana indexada por empleado
+    """
+    minutos = {
+        nombre: _minutos_del_dia(df_referencia[nombre])
+        for nombre in ("Entrada", "Salida")
+    }
+    # 0:00 se considera faltante, igual que al detectar registros incompletos
+    completos = minutos["Entrada"].gt(0) & minutos["Salida"].gt(0)
+    
+    medianas = (
+        minutos[columna][completos]
+        .groupby(df_referencia.loc[completos, "Empleado"].astype(str))
+        .median()
+        .round()
+        .astype(int)
+    )
+    return (medianas // 60).map("{:02d}".format) + ":" + (medianas % 60).map("{:02d}".format)
+
+
+def _minutos_del_dia(serie):
+    """Convierte horas "H:MM", "HH:MM" o "HH:MM:SS" a minutos desde medianoche (NaN si no es una hora)"""
+    partes = serie.astype(str).str.strip().str.extract(r"^(\d{1,2}):(\d{2})")
+    return partes[0].astype(float) * 60 + partes[1].astype(float)
+
+
+def aplicar_correcciones_a_dataframe(df_original, df_incompletos, copiar=True):
     """
     Aplica las correcciones manuales al DataFrame original
     
+    Las correcciones se guardan en la sesión como una tabla (indice, columna, valor)
+    y se aplican con una sola asignación alineada por índice.
+    
     Args:
         df_original: DataFrame original con todos los datos
         df_incompletos: DataFrame con registros incompletos
+        copiar: False para corregir df_original en el lugar (si ya es una copia propia)
         
     Returns:
         DataFrame: DataFrame corregido
     """
-    import pandas as pd
+    df_corregido = df_original.copy() if copiar else df_original
     
-    df_corregido = df_original.copy()
-    
-    if 'correcciones_horarios' not in st.session_state:
+    correcciones = st.session_state.get('correcciones_horarios')
+    if correcciones is None or correcciones.empty:
         return df_corregido
     
-    # Aplicar correcciones
-    for idx in df_incompletos.index:
-        if f"{idx}_entrada" in st.session_state.correcciones_horarios:
-            df_corregido.at[idx, 'Entrada'] = st.session_state.correcciones_horarios[f"{idx}_entrada"]
-        
-        if f"{idx}_salida" in st.session_state.correcciones_horarios:
-            df_corregido.at[idx, 'Salida'] = st.session_state.correcciones_horarios[f"{idx}_salida"]
+    # Solo las correcciones de los registros incompletos actuales
+    correcciones = correcciones[correcciones["indice"].isin(df_incompletos.index)]
+    
+    # Tabla ancha indice x columna; update ignora las celdas sin corrección
+    df_corregido.update(correcciones.pivot(index="indice", columns="columna", values="valor"))
     
     return df_corregido
+
+
+def mostrar_guardar_periodo(df_marcaciones, resultados, valor_por_hora, fechas_feriados, tipadas=None):
+    """
+    Permite guardar las marcaciones y los resultados del cálculo como un
+    período en la base local, para consultarlo después sin reprocesar archivos
+
+    Args:
+        df_marcaciones: Marcaciones usadas en el cálculo (con correcciones)
+        resultados (list): Resultados del cálculo
+        valor_por_hora: Valor por hora usado
+        fechas_feriados: Fechas de feriados usadas
+        tipadas (list): Valores numéricos de los resultados según el motor de cálculo (opcional)
+    """
+    import pandas as pd
+
+    if df_marcaciones.empty:
+        return
+
+    fechas = pd.to_datetime(df_marcaciones["Fecha"], errors="coerce")
+    nombre_sugerido = f"{fechas.min():%Y-%m-%d} a {fechas.max():%Y-%m-%d}"
+
+    st.markdown("###  Guardar Período")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        nombre = st.text_input(
+            "Nombre del período:",
+            value=nombre_sugerido,
+            help="Si ya existe un período con este nombre, se reemplaza",
+            key="nombre_periodo"
+        )
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        guardar = st.button("Guardar Período", use_container_width=True, disabled=not nombre.strip())
+
+    if guardar:
+        from almacen import guardar_periodo
+
+        try:
+            guardar_periodo(nombre.strip(), df_marcaciones, pd.DataFrame(resultados), valor_por_hora, fechas_feriados,
+                            tipadas=tipadas)
+            st.success(f"✅ Período '{nombre.strip()}' guardado ({len(resultados)} registros)")
+        except Exception as e:
+            st.error(f" Error al guardar el período: {str(e)}")
+
+def mostrar_periodos_guardados():
+    """
+    Muestra los períodos guardados en la base local, compara sus totales por
+    empleado y permite volver a cargar uno
+
+    Returns:
+        tuple: (df_marcaciones, df_result, datos del período) del período cargado, o None
+    """
+    from almacen import cargar_periodo, eliminar_periodo, listar_periodos, totales_por_empleado
+
+    periodos = listar_periodos()
+    if periodos.empty:
+        st.info("Todavía no hay períodos guardados. Después de calcular los sueldos puedes guardarlos para consultarlos más tarde.")
+        return None
+
+    nombres = dict(zip(periodos["id"], periodos["nombre"]))
+    st.dataframe(
+        periodos.drop(columns=["id", "feriados"]).rename(columns={
+            "nombre": "Período", "fecha_inicio": "Desde", "fecha_fin": "Hasta",
+            "valor_por_hora": "Valor por Hora", "creado": "Guardado",
+            "empleados": "Empleados", "registros": "Registros",
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    # Totales por empleado calculados en la base, sin cargar los períodos completos
+    seleccionados = st.multiselect(
+        "Comparar totales por empleado:",
+        list(nombres),
+        default=list(nombres)[:2],
+        format_func=nombres.get,
+        key="periodos_comparados"
+    )
+    if seleccionados:
+        totales = totales_por_empleado(seleccionados)
+        # Con sucursales, el mismo nombre en dos sucursales son dos filas
+        claves = ["sucursal", "empleado"] if totales["sucursal"].notna().any() else ["empleado"]
+        totales["sucursal"] = totales["sucursal"].fillna("")
+        comparacion = totales.pivot_table(
+            index=claves, columns="periodo", values=["sueldo_final", "minutos_trabajados"], aggfunc="sum"
+        )
+        comparacion.columns = [
+            f"{'Sueldo' if valor == 'sueldo_final' else 'Horas'} {periodo}" for valor, periodo in comparacion.columns
+        ]
+        for columna in [columna for columna in comparacion.columns if columna.startswith("Horas ")]:
+            comparacion[columna] = comparacion[columna].map(
+                lambda minutos: f"{int(minutos) // 60}:{int(minutos) % 60:02d}" if minutos == minutos else ""
+            )
+        st.dataframe(
+            comparacion.rename_axis([clave.capitalize() for clave in claves]).reset_index(),
+            use_container_width=True, hide_index=True
+        )
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        periodo_id = st.selectbox("Período:", list(nombres), format_func=nombres.get, key="periodo_elegido")
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("Cargar Período", use_container_width=True):
+            st.session_state.periodo_cargado = periodo_id
+    with col3:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("Eliminar Período", use_container_width=True):
+            eliminar_periodo(periodo_id)
+            if st.session_state.get("periodo_cargado") == periodo_id:
+                del st.session_state.periodo_cargado
+            st.rerun()
+
+    periodo_cargado = st.session_state.get("periodo_cargado")
+    if periodo_cargado not in nombres:
+        return None
+    return cargar_periodo(int(periodo_cargado))
+
+def mostrar_panel_diagnostico(traza):
+    """
+    Muestra el panel de diagnóstico con el tiempo (y, si se perfiló, la memoria)
+    de cada etapa medida y permite descargar la traza en JSON
+    
+    Args:
+        traza: Traza de instrumentación de la ejecución actual
+    """
+    import pandas as pd
+    
+    datos_traza = traza.a_dict()
+    
+    with st.expander(" Diagnóstico de rendimiento", expanded=False):
+        if not datos_traza["etapas"]:
+            st.info("No se midieron etapas en esta ejecución.")
+            return
+        
+        filas = []
+        for etapa in datos_traza["etapas"]:
+            filas.append({
+                "Etapa": "  " * etapa["nivel"] + etapa["nombre"],
+                "Tiempo (s)": etapa["segundos"],
+                "CPU (s)": etapa["cpu_segundos"],
+                "Volumen": ", ".join(f"{clave}: {valor}" for clave, valor in etapa["contadores"].items()),
+                "Por segundo": ", ".join(f"{clave}: {valor:,.0f}" for clave, valor in etapa["por_segundo"].items()),
+                "Hilo": etapa["hilo"],
+            })
+            if "memoria" in etapa:
+                filas[-1].update({
+                    "Pico (MB)": etapa["memoria"]["pico_mb"],
+                    "Pico etapa (MB)": etapa["memoria"]["pico_etapa_mb"],
+                    "Neto (MB)": etapa["memoria"]["neto_mb"],
+                    "RSS Δ (MB)": etapa["memoria"]["rss_delta_mb"],
+                })
+        
+        st.dataframe(pd.DataFrame(filas), use_container_width=True, hide_index=True)
+        
+        if datos_traza["memoria"]:
+            st.markdown("#### Principales sitios de asignación por etapa")
+            for etapa in datos_traza["etapas"]:
+                sitios = etapa.get("memoria", {}).get("sitios")
+                if sitios:
+                    st.markdown(f"**{etapa['nombre']}**")
+                    st.dataframe(pd.DataFrame(sitios), use_container_width=True, hide_index=True)
+        
+        st.download_button(
+            "Descargar traza (JSON)",
+            data=traza.a_json(),
+            file_name=f"traza_{traza.creada.strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json"
+        )
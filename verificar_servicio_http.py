@@ -0,0 +1,210 @@
+"""
+Verificación del servicio HTTP del motor de cálculo
+Levanta servicio_http en un puerto libre, recorre sus endpoints (/salud,
+/calcular con JSON y CSV, /pdf) y los errores de la solicitud (404, 400, 411,
+413, 415, 422) y compara cada respuesta con la esperada.
+
+Uso:
+    python verificar_servicio_http.py
+    python verificar_servicio_http.py --trabajadores 1
+
+Termina con código 1 si alguna verificación falla, para usarlo como control
+antes de aceptar un cambio en el servicio o en el motor de cálculo.
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+from typing import Callable, Dict, List, Optional, Tuple
+
+from servicio_http import crear_servidor
+
+# Tamaño máximo de solicitud del servidor de prueba (para provocar el 413)
+MAX_BYTES_PRUEBA = 256 * 1024
+
+VALOR_POR_HORA = 1000
+
+# Un turno diurno sin feriado (9 h, con un retiro de 100) y un registro sin entrada
+REGISTROS = [
+    {"Empleado": "Ana", "Fecha": "2024-01-03", "Entrada": "08:00", "Salida": "17:00",
+     "Descuento Inventario": 0, "Descuento Caja": 0, "Retiro": 100},
+    {"Empleado": "Luis", "Fecha": "2024-01-03", "Entrada": "", "Salida": "15:00",
+     "Descuento Inventario": 0, "Descuento Caja": 0, "Retiro": 0},
+]
+
+# Dos días de 08:00 a 17:00 de un empleado, como los exporta el reloj de fichadas
+LINEAS_PDF = [
+    "Reporte de Asistencia",
+    "Empleado: Juan Perez",
+    "01/10/2024 08:00 Entrada",
+    "01/10/2024 17:00 Salida",
+    "02/10/2024 08:00 Entrada",
+    "02/10/2024 17:00 Salida",
+]
+
+def pdf_de_ejemplo(lineas: List[str]) -> bytes:
+    """
+    Arma un PDF mínimo de una página con las líneas dadas (texto ASCII con la
+    fuente Helvetica), sin depender de una biblioteca para generar PDFs
+
+    Args:
+        lineas: Líneas de texto, de arriba hacia abajo
+
+    Returns:
+        bytes: Contenido del PDF
+    """
+    contenido = "BT /F1 11 Tf 14 TL 50 800 Td " + " ".join(f"({linea}) Tj T*" for linea in lineas) + " ET"
+    objetos = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Length {len(contenido)} >>\nstream\n{contenido}\nendstream",
+    ]
+
+    pdf = b"%PDF-1.4\n"
+    posiciones = []
+    for numero, objeto in enumerate(objetos, 1):
+        posiciones.append(len(pdf))
+        pdf += f"{numero} 0 obj\n{objeto}\nendobj\n".encode("latin-1")
+
+    inicio_xref = len(pdf)
+    pdf += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    pdf += "".join(f"{posicion:010d} 00000 n \n" for posicion in posiciones).encode("latin-1")
+    pdf += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode("latin-1")
+    return pdf
+
+def registros_csv(registros: List[Dict]) -> bytes:
+    """Los registros como CSV con encabezado"""
+    columnas = list(registros[0])
+    filas = [",".join(columnas)] + [",".join(str(registro[columna]) for columna in columnas) for registro in registros]
+    return ("\n".join(filas) + "\n").encode("utf-8")
+
+def pedir(base: str, ruta: str, datos: Optional[bytes] = None, tipo: Optional[str] = None) -> Tuple[int, Dict]:
+    """
+    Hace una solicitud al servicio
+
+    Returns:
+        tuple: (código HTTP, respuesta JSON)
+    """
+    solicitud = urllib.request.Request(base + ruta, data=datos, headers={"Content-Type": tipo} if tipo else {})
+    try:
+        with urllib.request.urlopen(solicitud, timeout=120) as respuesta:
+            return respuesta.status, json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def pedir_sin_longitud(host: str, puerto: int, ruta: str) -> Tuple[int, Dict]:
+    """POST sin el encabezado Content-Length (urllib siempre lo agrega)"""
+    conexion = http.client.HTTPConnection(host, puerto, timeout=30)
+    try:
+        conexion.putrequest("POST", ruta)
+        conexion.putheader("Content-Type", "text/csv")
+        conexion.endheaders()
+        respuesta = conexion.getresponse()
+        return respuesta.status, json.loads(respuesta.read())
+    finally:
+        conexion.close()
+
+def verificaciones(host: str, puerto: int) -> List[Tuple[str, Callable[[], Optional[str]]]]:
+    """
+    Verificaciones contra un servidor en marcha
+
+    Returns:
+        List: (descripción, función que devuelve None si pasa o el motivo si falla)
+    """
+    base = f"http://{host}:{puerto}"
+    parametros = f"?valor_por_hora={VALOR_POR_HORA}"
+
+    def esperar(codigo: int, respuesta: Tuple[int, Dict], **campos) -> Optional[str]:
+        obtenido, cuerpo = respuesta
+        if obtenido != codigo:
+            return f"código {obtenido} (se esperaba {codigo}): {cuerpo}"
+        for campo, valor in campos.items():
+            if cuerpo.get(campo) != valor:
+                return f"{campo} = {cuerpo.get(campo)!r} (se esperaba {valor!r})"
+        return None
+
+    def calculo_registros(respuesta: Tuple[int, Dict]) -> Optional[str]:
+        motivo = esperar(200, respuesta, total_horas=9.0, total_sueldos=8900.0, registros_calculados=1)
+        if motivo:
+            return motivo
+        cuerpo = respuesta[1]
+        if [fila["empleado"] for fila in cuerpo["incompletos"]] != ["Luis"]:
+            return f"incompletos = {cuerpo['incompletos']}"
+        fila = cuerpo["resultados"][0]
+        esperado = {"fecha": "2024-01-03", "entrada_minutos": 480, "salida_minutos": 1020,
+                    "minutos_trabajados": 540, "retiro_centavos": 10000, "sueldo_final_centavos": 890000}
+        diferentes = {campo: fila.get(campo) for campo, valor in esperado.items() if fila.get(campo) != valor}
+        return f"resultado distinto: {diferentes}" if diferentes else None
+
+    def pdf_valido() -> Optional[str]:
+        respuesta = pedir(base, "/pdf" + parametros, pdf_de_ejemplo(LINEAS_PDF), "application/pdf")
+        return esperar(200, respuesta, registros_calculados=2, total_horas=18.0, total_sueldos=18000.0)
+
+    def pdf_invalido() -> Optional[str]:
+        codigo, cuerpo = pedir(base, "/pdf", b"%PDF-1.4 no es un PDF", "application/pdf")
+        if codigo != 422:
+            return f"código {codigo} (se esperaba 422): {cuerpo}"
+        # El error de lectura del PDF, no el genérico de un PDF sin marcaciones
+        if not cuerpo.get("error", "").startswith("No se pudo procesar el PDF:"):
+            return f"error = {cuerpo.get('error')!r}"
+        return None
+
+    return [
+        ("GET /salud", lambda: esperar(200, pedir(base, "/salud"), estado="ok")),
+        ("GET ruta inexistente -> 404", lambda: esperar(404, pedir(base, "/nada"))),
+        ("POST /calcular JSON", lambda: calculo_registros(pedir(
+            base, "/calcular", json.dumps({"valor_por_hora": VALOR_POR_HORA, "registros": REGISTROS}).encode("utf-8"),
+            "application/json"))),
+        ("POST /calcular CSV", lambda: calculo_registros(pedir(
+            base, "/calcular" + parametros, registros_csv(REGISTROS), "text/csv"))),
+        ("POST /pdf", pdf_valido),
+        ("POST /pdf inválido -> 422 con el error de lectura", pdf_invalido),
+        ("POST /calcular sin columnas -> 400", lambda: esperar(400, pedir(
+            base, "/calcular", json.dumps([{"Empleado": "Ana"}]).encode("utf-8"), "application/json"))),
+        ("POST /calcular valor_por_hora inválido -> 400", lambda: esperar(400, pedir(
+            base, "/calcular?valor_por_hora=abc", registros_csv(REGISTROS), "text/csv"))),
+        ("POST /calcular sin Content-Length -> 411", lambda: esperar(411, pedir_sin_longitud(host, puerto, "/calcular"))),
+        ("POST /calcular demasiado grande -> 413", lambda: esperar(413, pedir(
+            base, "/calcular", b"a" * (MAX_BYTES_PRUEBA + 1), "text/csv"))),
+        ("POST /calcular tipo no soportado -> 415", lambda: esperar(415, pedir(
+            base, "/calcular", registros_csv(REGISTROS), "text/plain"))),
+        ("POST /pdf tipo no soportado -> 415", lambda: esperar(415, pedir(
+            base, "/pdf", pdf_de_ejemplo(LINEAS_PDF), "text/plain"))),
+    ]
+
+def main(argumentos: List[str] = None) -> int:
+    opciones = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    opciones.add_argument("--trabajadores", type=int, default=2, help="Procesos del pool de cálculo del servidor")
+    args = opciones.parse_args(argumentos)
+
+    servidor = crear_servidor(puerto=0, trabajadores=args.trabajadores, max_bytes=MAX_BYTES_PRUEBA)
+    host, puerto = servidor.server_address[:2]
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    fallas = 0
+    try:
+        for descripcion, verificar in verificaciones(host, puerto):
+            try:
+                motivo = verificar()
+            except Exception as e:
+                motivo = f"{type(e).__name__}: {e}"
+            if motivo:
+                fallas += 1
+                print(f"FALLA  {descripcion}: {motivo}")
+            else:
+                print(f"OK     {descripcion}")
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    print(f"\n{fallas} verificación(es) fallida(s)" if fallas else "\nTodas las verificaciones pasaron")
+    return 1 if fallas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())